@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+STDIO 协议层压测工具：测量 MCP 服务器的传输与框架开销
+
+通过 STDIO 启动服务器子进程，使用手写的 JSON-RPC 客户端完成初始化握手，
+然后按配置的比例并发发送 tools/list、tools/call 和 resources/read 请求，
+统计吞吐量、各类请求的延迟分位数，以及服务器进程的 CPU 时间和内存（RSS，读取 /proc）。
+
+内置的服务器预设：
+    seedream    mcp-server-seedream/run_server.py，使用 SEEDREAM_BACKEND=mock 的本地模拟 API
+    my-first    my-first-mcp-server/server.py
+    quickstart  tutorials/quickstart/example-server.py
+
+使用方法：
+    python benchmarks/stdio_load.py --server my-first --requests 2000 --concurrency 16
+    python benchmarks/stdio_load.py --server seedream --server quickstart --json result.json
+    python benchmarks/stdio_load.py --server my-first --mix tools/call=1 --call 'add={"a": 1, "b": 2}'
+    python benchmarks/stdio_load.py --server my-first --compare result.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROTOCOL_VERSION = "2025-06-18"
+OPERATIONS = ("tools/list", "tools/call", "resources/read")
+
+# 服务器预设：启动命令、工作目录、环境变量、默认的工具调用和资源
+SERVER_PRESETS: Dict[str, Dict[str, Any]] = {
+    "seedream": {
+        "cwd": os.path.join(REPO_ROOT, "mcp-server-seedream"),
+        "command": ["run_server.py"],
+        "env": {
+            "PYTHONPATH": "src",
+            "SEEDREAM_BACKEND": "mock",
+            # 默认不模拟生成延迟，只测量服务器自身的开销
+            "SEEDREAM_MOCK_LATENCY_MS": "fixed:0",
+            "SEEDREAM_MOCK_DOWNLOAD_LATENCY_MS": "fixed:0",
+        },
+        "calls": [
+            ("generate_image", {"input": {"prompt": "一只可爱的小猫在沙发上睡觉", "optimize_prompt": False}}),
+        ],
+        "resources": [],
+    },
+    "my-first": {
+        "cwd": os.path.join(REPO_ROOT, "my-first-mcp-server"),
+        "command": ["server.py"],
+        "env": {},
+        "calls": [("echo", {"text": "你好"}), ("add", {"a": 1, "b": 2})],
+        "resources": ["file://notes/hello.txt", "file://notes/todo.txt"],
+    },
+    "quickstart": {
+        "cwd": os.path.join(REPO_ROOT, "tutorials", "quickstart"),
+        "command": ["example-server.py"],
+        "env": {},
+        "calls": [("echo", {"text": "你好"}), ("add", {"a": 1, "b": 2})],
+        "resources": ["file://notes/hello.txt"],
+    },
+}
+
+
+class JsonRpcError(Exception):
+    """服务器返回的 JSON-RPC 错误"""
+
+
+class StdioClient:
+    """
+    最小的 MCP STDIO 客户端
+
+    按行读取服务器的标准输出；不是 JSON 的行（例如启动横幅）直接跳过，
+    通知消息被忽略，响应按 id 分发给等待中的请求。
+    """
+
+    def __init__(self, command: List[str], cwd: str, env: Dict[str, str]):
+        self.command = command
+        self.cwd = cwd
+        self.env = env
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.skipped_lines = 0
+        self.notifications = 0
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    async def start(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            cwd=self.cwd,
+            env=self.env,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            # 单条响应可能较大（例如 read_note 的一页内容）
+            limit=16 * 1024 * 1024,
+        )
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except ValueError:
+                self.skipped_lines += 1
+                continue
+            if not isinstance(message, dict):
+                self.skipped_lines += 1
+                continue
+            future = self._pending.pop(message.get("id"), None) if "id" in message else None
+            if future is None:
+                self.notifications += 1
+            elif not future.done():
+                future.set_result(message)
+        # 服务器退出：让所有等待中的请求失败
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("服务器已退出"))
+        self._pending.clear()
+
+    async def _write(self, message: Dict[str, Any]) -> None:
+        data = json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+        async with self._write_lock:
+            self.process.stdin.write(data)
+            await self.process.stdin.drain()
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 60.0) -> Any:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._write(message)
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            raise JsonRpcError(response["error"].get("message", str(response["error"])))
+        return response.get("result")
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._write(message)
+
+    async def initialize(self, timeout: float) -> Dict[str, Any]:
+        result = await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "stdio-load", "version": "1.0"},
+        }, timeout=timeout)
+        await self.notify("notifications/initialized")
+        return result
+
+    async def close(self) -> None:
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._reader is not None:
+            await self._reader
+
+
+def read_proc_stats(pid: int) -> Dict[str, float]:
+    """
+    从 /proc 读取进程的 CPU 时间（秒）和内存（MB）
+
+    非 Linux 平台返回空字典。
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # 第 2 个字段（进程名）可能包含空格，从右括号之后开始切分
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    ticks = os.sysconf("SC_CLK_TCK")
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks,
+        "rss_mb": int(status.get("VmRSS", "0 kB").split()[0]) / 1024,
+        "peak_rss_mb": int(status.get("VmHWM", "0 kB").split()[0]) / 1024,
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """线性插值的分位数，sorted_values 必须已排序"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(latencies: List[float], errors: int) -> Dict[str, Any]:
+    """汇总一组延迟（秒），结果以毫秒表示"""
+    values = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "mean_ms": ms(statistics.fmean(values)) if values else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p90_ms": ms(percentile(values, 90)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+    }
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析请求比例，例如 'tools/list=1,tools/call=4,resources/read=2'"""
+    mix: Dict[str, float] = {}
+    for part in filter(None, (item.strip() for item in text.split(","))):
+        op, _, weight = part.partition("=")
+        if op not in OPERATIONS:
+            raise ValueError(f"未知请求类型 {op}，可选：{', '.join(OPERATIONS)}")
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def parse_call(text: str) -> Tuple[str, Dict[str, Any]]:
+    """解析工具调用，例如 'add={"a": 1, "b": 2}'"""
+    name, _, arguments = text.partition("=")
+    return name, json.loads(arguments) if arguments else {}
+
+
+async def run_workload(
+    client: StdioClient,
+    mix: Dict[str, float],
+    calls: List[Tuple[str, Dict[str, Any]]],
+    resources: List[str],
+    requests: int,
+    concurrency: int,
+    timeout: float,
+    seed: int,
+) -> Tuple[Dict[str, List[float]], Dict[str, int], List[str], float]:
+    """按比例并发发送请求，返回 (各类延迟, 各类错误数, 错误样例, 总耗时)"""
+    rng = random.Random(seed)
+    ops = [op for op in OPERATIONS if mix.get(op, 0) > 0]
+    weights = [mix[op] for op in ops]
+    # 预先生成请求序列，保证相同 seed 下各次运行的请求完全一致
+    plan = []
+    for _ in range(requests):
+        op = rng.choices(ops, weights)[0]
+        if op == "tools/call":
+            name, arguments = rng.choice(calls)
+            plan.append((op, {"name": name, "arguments": arguments}))
+        elif op == "resources/read":
+            plan.append((op, {"uri": rng.choice(resources)}))
+        else:
+            plan.append((op, {}))
+
+    latencies: Dict[str, List[float]] = {op: [] for op in ops}
+    errors: Dict[str, int] = {op: 0 for op in ops}
+    samples: List[str] = []
+    cursor = iter(plan)
+
+    async def worker() -> None:
+        for op, params in cursor:
+            start = time.perf_counter()
+            try:
+                result = await client.request(op, params, timeout=timeout)
+                failed = isinstance(result, dict) and result.get("isError", False)
+                if failed and len(samples) < 5:
+                    samples.append(f"{op}: {json.dumps(result, ensure_ascii=False)[:200]}")
+            except (JsonRpcError, asyncio.TimeoutError, ConnectionError) as e:
+                failed = True
+                if len(samples) < 5:
+                    samples.append(f"{op}: {type(e).__name__}: {e}")
+            latencies[op].append(time.perf_counter() - start)
+            if failed:
+                errors[op] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, samples, time.perf_counter() - started
+
+
+async def bench_server(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """压测一个服务器并返回报告"""
+    preset = SERVER_PRESETS[name]
+    env = dict(os.environ)
+    env.update(preset["env"])
+    env.update(dict(item.split("=", 1) for item in args.env))
+    env["PYTHONUNBUFFERED"] = "1"
+    calls = [parse_call(item) for item in args.call] or preset["calls"]
+    resources = args.resource or preset["resources"]
+
+    mix = parse_mix(args.mix)
+    if not resources:
+        mix.pop("resources/read", None)
+    if not mix:
+        raise ValueError(f"{name}：请求比例为空（该服务器没有可读取的资源）")
+
+    client = StdioClient([sys.executable, *preset["command"]], preset["cwd"], env)
+    started = time.perf_counter()
+    await client.start()
+    try:
+        init = await client.initialize(args.startup_timeout)
+        startup_ms = (time.perf_counter() - started) * 1000
+        tools = await client.request("tools/list", {})
+        tool_names = {tool["name"] for tool in tools.get("tools", [])}
+        missing = sorted({call for call, _ in calls} - tool_names)
+        if missing:
+            raise ValueError(f"{name}：服务器没有这些工具：{', '.join(missing)}")
+
+        if args.warmup:
+            await run_workload(client, mix, calls, resources, args.warmup, args.concurrency, args.timeout, args.seed + 1)
+        before = read_proc_stats(client.pid)
+        latencies, errors, samples, elapsed = await run_workload(
+            client, mix, calls, resources, args.requests, args.concurrency, args.timeout, args.seed
+        )
+        after = read_proc_stats(client.pid)
+    finally:
+        await client.close()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    report = {
+        "server": name,
+        "server_info": init.get("serverInfo", {}),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "startup_ms": round(startup_ms, 1),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(all_latencies) / elapsed, 1) if elapsed else 0.0,
+        "overall": summarize(all_latencies, sum(errors.values())),
+        "operations": {op: summarize(latencies[op], errors[op]) for op in latencies},
+        "skipped_stdout_lines": client.skipped_lines,
+        "error_samples": samples,
+    }
+    if before and after:
+        cpu = after["cpu_seconds"] - before["cpu_seconds"]
+        report["process"] = {
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(cpu / elapsed * 100, 1) if elapsed else 0.0,
+            "cpu_ms_per_request": round(cpu * 1000 / len(all_latencies), 3) if all_latencies else 0.0,
+            "rss_mb_before": round(before["rss_mb"], 1),
+            "rss_mb_after": round(after["rss_mb"], 1),
+            "peak_rss_mb": round(after["peak_rss_mb"], 1),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """以表格形式打印报告；提供 baseline 时附上与基线的差异"""
+    def delta(current: float, previous: Optional[float]) -> str:
+        if not previous:
+            return ""
+        return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+    base_ops = baseline.get("operations", {}) if baseline else {}
+    print(f"\n== {report['server']} ({report['server_info'].get('name', '?')}) ==")
+    print(f"请求数 {report['requests']}，并发 {report['concurrency']}，启动耗时 {report['startup_ms']} ms")
+    print(
+        f"吞吐量 {report['throughput_rps']} req/s"
+        + delta(report["throughput_rps"], baseline and baseline.get("throughput_rps"))
+    )
+    # 表头使用与 JSON 报告相同的字段名（中文字符宽度不一，不便对齐）
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'mean_ms':>10}{'p50_ms':>10}{'p90_ms':>10}{'p99_ms':>10}{'max_ms':>10}")
+    rows = list(report["operations"].items()) + [("overall", report["overall"])]
+    for op, stats in rows:
+        base = base_ops.get(op) if op != "overall" else (baseline or {}).get("overall")
+        print(
+            f"{op:<16}{stats['count']:>8}{stats['errors']:>8}{stats['mean_ms']:>10.3f}"
+            f"{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}"
+            + (delta(stats["p99_ms"], base.get("p99_ms")) if base else "")
+        )
+    process = report.get("process")
+    if process:
+        print(
+            f"服务器进程：CPU {process['cpu_seconds']} s（{process['cpu_percent']}%，"
+            f"{process['cpu_ms_per_request']} ms/请求），RSS {process['rss_mb_before']} → "
+            f"{process['rss_mb_after']} MB，峰值 {process['peak_rss_mb']} MB"
+        )
+    if report["error_samples"]:
+        print("错误样例：")
+        for sample in report["error_samples"]:
+            print(f"  {sample}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="MCP 服务器 STDIO 压测工具")
+    parser.add_argument(
+        "--server", action="append", choices=sorted(SERVER_PRESETS),
+        help="要压测的服务器预设，可重复指定（默认 my-first）"
+    )
+    parser.add_argument("--requests", type=int, default=1000, help="每个服务器发送的请求数（默认 1000）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的请求数（默认 8）")
+    parser.add_argument(
+        "--mix", default="tools/list=1,tools/call=4,resources/read=2",
+        help="请求比例，例如 'tools/list=1,tools/call=4,resources/read=2'"
+    )
+    parser.add_argument(
+        "--call", action="append", default=[],
+        help="工具调用，格式 name=JSON参数，可重复指定（默认使用预设中的调用）"
+    )
+    parser.add_argument("--resource", action="append", default=[], help="要读取的资源 URI，可重复指定")
+    parser.add_argument("--env", action="append", default=[], help="传给服务器的环境变量 KEY=VALUE，可重复指定")
+    parser.add_argument("--warmup", type=int, default=50, help="正式计时前的预热请求数（默认 50）")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求的超时时间（秒）")
+    parser.add_argument("--startup-timeout", type=float, default=30.0, help="等待服务器完成初始化的时间（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="生成请求序列的随机种子")
+    parser.add_argument("--json", help="把报告写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 报告比较")
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    servers = args.server or ["my-first"]
+    baselines = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baselines = {report["server"]: report for report in json.load(f)["servers"]}
+
+    reports = []
+    for name in servers:
+        try:
+            report = await bench_server(name, args)
+        except Exception as e:
+            print(f"\n== {name} ==\n失败：{type(e).__name__}: {e}", file=sys.stderr)
+            return 1
+        print_report(report, baselines.get(name))
+        reports.append(report)
+
+    if args.json:
+        result = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "servers": reports,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入 {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
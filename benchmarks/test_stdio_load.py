@@ -0,0 +1,48 @@
+# 压测工具测试：解析参数、统计分位数，并对 my-first 服务器做一次小规模压测
+import argparse
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stdio_load
+
+
+def test_parse_mix_and_call():
+    assert stdio_load.parse_mix("tools/list=1, tools/call=4,resources/read") == {
+        "tools/list": 1.0, "tools/call": 4.0, "resources/read": 1.0
+    }
+    with pytest.raises(ValueError):
+        stdio_load.parse_mix("prompts/list=1")
+    assert stdio_load.parse_call('add={"a": 1, "b": 2}') == ("add", {"a": 1, "b": 2})
+    assert stdio_load.parse_call("list_notes") == ("list_notes", {})
+
+
+def test_percentile_interpolates():
+    values = [0.001 * n for n in range(1, 101)]
+    summary = stdio_load.summarize(values, errors=2)
+
+    assert stdio_load.percentile([], 50) == 0.0
+    assert stdio_load.percentile([1.0, 3.0], 50) == 2.0
+    assert summary["count"] == 100 and summary["errors"] == 2
+    assert summary["p50_ms"] == 50.5
+    assert summary["max_ms"] == 100.0
+
+
+def test_bench_my_first_server_over_stdio():
+    args = argparse.Namespace(
+        env=[], call=[], resource=[], mix="tools/list=1,tools/call=4,resources/read=2",
+        startup_timeout=60.0, warmup=0, requests=40, concurrency=4, timeout=30.0, seed=0
+    )
+
+    report = asyncio.run(stdio_load.bench_server("my-first", args))
+
+    assert report["overall"]["count"] == 40
+    assert report["overall"]["errors"] == 0, report["error_samples"]
+    assert set(report["operations"]) == {"tools/list", "tools/call", "resources/read"}
+    assert report["throughput_rps"] > 0
+    if sys.platform.startswith("linux"):
+        assert report["process"]["peak_rss_mb"] > 0
@@ -0,0 +1,18 @@
+# pytest 配置：测试默认使用离线的 mock 后端，不访问网络、不写入工作目录
+import os
+import sys
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="seedream-test-")
+
+# 配置在模块导入时读取，必须在导入 mcp_server_seedream 之前设置
+os.environ.setdefault("SEEDREAM_BACKEND", "mock")
+os.environ.setdefault("SEEDREAM_MOCK_LATENCY_MS", "fixed:5")
+os.environ.setdefault("SEEDREAM_MOCK_DOWNLOAD_LATENCY_MS", "fixed:1")
+os.environ.setdefault("SEEDREAM_API_KEY", "test-key")
+os.environ.setdefault("SEEDREAM_LOOP_MONITOR", "false")
+os.environ.setdefault("SEEDREAM_GALLERY_PATH", os.path.join(_TEST_DIR, "gallery.db"))
+os.environ.setdefault("DEFAULT_DOWNLOAD_DIR", os.path.join(_TEST_DIR, "images"))
+
+# 未安装包时直接从 src 导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 # 直接启动MCP服务器的脚本
 
+import argparse
+import os
 import sys
 from dotenv import load_dotenv
 
@@ -10,20 +12,49 @@ print("🔧 环境变量已从 .env 文件加载")
 
 from mcp_server_seedream.server import mcp
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="启动 Seedream MCP Server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http"],
+        default=os.getenv("MCP_TRANSPORT", "stdio"),
+        help="传输协议：stdio（本地模式，默认）或 http（Streamable HTTP）"
+    )
+    parser.add_argument("--host", default=None, help="HTTP 监听地址（默认 MCP_HTTP_HOST 或 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=None, help="HTTP 监听端口（默认 MCP_HTTP_PORT 或 8000）")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="HTTP worker 进程数，0 表示使用全部 CPU 核心（默认 MCP_HTTP_WORKERS 或 1）"
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     print("🚀 正在启动 Seedream MCP Server...")
     print("📋 服务器配置:")
     print(f"  - 名称: {mcp.name}")
-    print(f"  - 传输协议: STDIO (本地模式)")
+    if args.transport == "http":
+        from mcp_server_seedream import http_app
+        host = args.host or http_app.HTTP_HOST
+        port = args.port or http_app.HTTP_PORT
+        print(f"  - 传输协议: Streamable HTTP (http://{host}:{port}{http_app.HTTP_PATH})")
+    else:
+        print(f"  - 传输协议: STDIO (本地模式)")
     print(f"  - 指令: {mcp.instructions[:100]}...")
     print("\n🔧 工具已注册")
     print("✅ 服务器已准备就绪")
     print("ℹ️  按 Ctrl+C 停止服务器")
     print("\n" + "="*60)
-    
+
     try:
         # 运行服务器
-        mcp.run()
+        if args.transport == "http":
+            http_app.serve(host=host, port=port, workers=args.workers)
+        else:
+            mcp.run()
     except KeyboardInterrupt:
         print("\n🛑 服务器已停止")
     except Exception as e:
@@ -33,4 +64,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,101 @@
+"""
+Streamable HTTP 部署入口
+
+以 Streamable HTTP 传输协议提供 Seedream MCP 服务，支持多个 worker 进程共享同一端口。
+每个 worker 进程内所有客户端会话共享一个 HTTP 连接池；停机时先停止接收新请求，
+再等待进行中的生成和下载完成后退出。
+
+运行方式：
+    python run_server.py --transport http --port 8000 --workers 4
+    uvicorn mcp_server_seedream.http_app:app --workers 4 --timeout-graceful-shutdown 60
+
+uvicorn 停机时先等待进行中的 HTTP 请求完成（最长 --timeout-graceful-shutdown 秒），
+超时后取消这些请求，之后才执行 lifespan 停机。直接使用 uvicorn 命令时，
+--timeout-graceful-shutdown 必须不小于 SHUTDOWN_GRACE_SECONDS，否则进行中的工具调用会在宽限期内被取消；
+serve() 会自动设置。
+"""
+
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from mcp_server_seedream.server import mcp
+from mcp_server_seedream.utils.api_client import close_http_client
+from mcp_server_seedream.utils.storage import close_storage
+from mcp_server_seedream.utils.inflight import inflight
+
+# HTTP 部署配置
+HTTP_HOST = os.getenv("MCP_HTTP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", "8000"))
+HTTP_PATH = os.getenv("MCP_HTTP_PATH", "/mcp")
+HTTP_WORKERS = int(os.getenv("MCP_HTTP_WORKERS", "1"))
+# 停机时等待进行中任务完成的最长时间（秒）
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "60"))
+
+def graceful_shutdown_timeout() -> int:
+    """uvicorn 的 timeout_graceful_shutdown：向上取整，保证不短于 SHUTDOWN_GRACE_SECONDS"""
+    return math.ceil(SHUTDOWN_GRACE_SECONDS)
+
+def create_app() -> Starlette:
+    """
+    创建 ASGI 应用
+
+    使用无状态模式（stateless_http），每个请求独立处理，
+    因此同一客户端的连续请求可以落在任意 worker 进程上。
+    工具调用直接返回 JSON 响应（json_response）而不是 SSE 流：uvicorn 开始停机时
+    sse-starlette 会立即结束所有 SSE 流，进行中的调用即使完成也无法送达客户端；
+    普通 JSON 响应则由 uvicorn 在宽限期内等待发送完毕。
+
+    Returns:
+        挂载了 MCP 端点的 Starlette 应用
+    """
+    mcp_app = mcp.http_app(path=HTTP_PATH, stateless_http=True, json_response=True)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with mcp_app.lifespan(app):
+            try:
+                yield
+            finally:
+                # 在退出会话管理器之前等待进行中的工具调用：uvicorn 已在宽限期内等待过请求，
+                # 这里兜底等待仍未结束的调用（例如其他 ASGI 服务器不等待请求就进入 lifespan 停机）
+                await inflight.drain(SHUTDOWN_GRACE_SECONDS)
+                await close_http_client()
+                await close_storage()
+
+    return Starlette(routes=[Mount("/", app=mcp_app)], lifespan=lifespan)
+
+app = create_app()
+
+def serve(
+    host: str = HTTP_HOST,
+    port: int = HTTP_PORT,
+    workers: Optional[int] = None
+) -> None:
+    """
+    启动 HTTP 服务
+
+    Args:
+        host: 监听地址
+        port: 监听端口
+        workers: worker 进程数，0 表示使用全部 CPU 核心，默认读取 MCP_HTTP_WORKERS
+    """
+    import uvicorn
+
+    if workers is None:
+        workers = HTTP_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+
+    # 多进程模式下 uvicorn 需要通过导入字符串在每个 worker 中加载应用
+    uvicorn.run(
+        "mcp_server_seedream.http_app:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=graceful_shutdown_timeout()
+    )
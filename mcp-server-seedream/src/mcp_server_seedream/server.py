@@ -1,27 +1,62 @@
 from fastmcp import FastMCP
+from contextlib import asynccontextmanager
+import json
 import os
 
+from mcp_server_seedream.utils.loop_monitor import LOOP_MONITOR, loop_monitor
+from mcp_server_seedream.utils.resize import shutdown_resize_pool
+
+@asynccontextmanager
+async def lifespan(server):
+    """服务器生命周期：运行期间采样事件循环延迟，停机时关闭缩放进程池"""
+    if LOOP_MONITOR:
+        loop_monitor.start()
+    try:
+        yield {}
+    finally:
+        await loop_monitor.stop()
+        shutdown_resize_pool()
+
 # 创建 FastMCP 实例
 mcp = FastMCP(
     name="Seedream MCP Server",
-    instructions="即梦Seedream 4.0 MCP服务器，提供高质量图像生成服务。支持单图生成和批量生成，所有图像默认不带水印。"
+    instructions="即梦Seedream 4.0 MCP服务器，提供高质量图像生成服务。支持单图生成和批量生成，所有图像默认不带水印。",
+    lifespan=lifespan
 )
 
+@mcp.resource("seedream://stats/event-loop", mime_type="application/json")
+def event_loop_stats() -> str:
+    """
+    事件循环延迟统计
+
+    包含延迟直方图和分位数；调试模式（SEEDREAM_LOOP_DEBUG）下还包含阻塞次数和最近阻塞位置的调用栈。
+    """
+    return json.dumps(loop_monitor.snapshot(), indent=2, ensure_ascii=False)
+
 # 重新定义并注册生成图像工具
 from pydantic import BaseModel, Field
 from typing import Literal, Optional
 import datetime
 import os
-from mcp_server_seedream.utils.api_client import make_api_request, download_image
-from mcp_server_seedream.utils.formatters import format_response
+from mcp_server_seedream.utils.api_client import download_image
+from mcp_server_seedream.utils.generation import request_image, generate_group, generate_sizes, is_deadline_error
+from mcp_server_seedream.utils.models import model_registry
+from mcp_server_seedream.utils.deadline import Deadline
+from mcp_server_seedream.utils.records import GenerationResult, ImageRecord
+from mcp_server_seedream.utils.gallery import gallery
+from mcp_server_seedream.utils.lazy_images import lazy_images
+from mcp_server_seedream.utils.formatters import format_response, render_gallery_matches
 from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.inflight import inflight
+from mcp_server_seedream.utils.bulk import run_bulk_generation
+from mcp_server_seedream.utils.sizes import invalid_size_message, is_valid_size
 
 # 从环境变量获取默认下载目录
 DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
 
 class GenerateImageInput(BaseModel):
     """生成图像的输入模型"""
-    model_config = {"extra": "forbid"}
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
 
     prompt: str = Field(
         description="详细的图像描述文本，支持中英文",
@@ -36,14 +71,38 @@ class GenerateImageInput(BaseModel):
         examples=["2048x2048", "1K", "2K"]
     )
 
-    response_format: Literal["url", "b64_json", "local_file"] = Field(
+    response_format: Literal["url", "b64_json", "local_file", "resource"] = Field(
         default="local_file",
-        description="返回格式: 'url'、'b64_json'或'local_file'"
+        description="返回格式: 'url'、'b64_json'、'local_file'或'resource'（立即返回资源URI，首次读取时才下载）"
     )
     
     download_dir: Optional[str] = Field(
         default=DEFAULT_DOWNLOAD_DIR,
-        description="当response_format为'local_file'时，图片保存的目录"
+        description="当response_format为'local_file'或'resource'时，图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
     )
 
     optimize_prompt: bool = Field(
@@ -51,6 +110,18 @@ class GenerateImageInput(BaseModel):
         description="是否优化提示词"
     )
 
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位: 'fast' 使用快速提示词优化且默认时限更短，'standard' 生成质量更高"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1000,
+        le=600000,
+        description="端到端时限（毫秒），涵盖排队、API请求、重试和下载，默认使用延迟档位的时限"
+    )
+
     format: Literal["json", "markdown"] = Field(
         default="json",
         description="输出格式: 'json' 或 'markdown'"
@@ -76,61 +147,79 @@ async def generate_image(input: GenerateImageInput) -> str:
     使用此工具根据文本提示生成高质量图像，所有生成的图像默认不带水印。
     支持多种输出格式和详细程度选择。
     """
-    try:
-        # 准备API请求数据
-        api_data = {
-            "model": "doubao-seedream-4-0-250828",
-            "prompt": input.prompt,
-            "size": input.size,
-            "response_format": "url" if input.response_format == "local_file" else input.response_format,
-            "watermark": False,  # 强制不添加水印
-            "optimize_prompt": input.optimize_prompt
-        }
-
-        # 调用API
-        start_time = datetime.datetime.now()
-        response = await make_api_request(
-            endpoint="api/v3/images/generations",
-            method="POST",
-            data=api_data
-        )
-        processing_time_ms = int((datetime.datetime.now() - start_time).total_seconds() * 1000)
-
-        # 构建响应数据
-        image_url = response.get("data", [{}])[0].get("url")
-        result_data = {
-            "success": True,
-            "image_url": image_url,
-            "image_size": input.size,
-            "token_usage": response.get("usage", {}).get("total_tokens", 0),
-            "created_at": datetime.datetime.now().isoformat() + "Z",
-            "model_used": "doubao-seedream-4-0-250828",
-            "processing_time_ms": processing_time_ms,
-            "watermark": False
-        }
-        
-        # 如果需要本地文件，下载图片
-        if input.response_format == "local_file" and image_url:
-            # 下载图片到指定目录
-            local_path = await download_image(image_url, input.download_dir)
-            # 更新响应数据，添加本地文件信息
-            result_data["local_path"] = local_path
-            result_data["downloaded"] = True
-
-        # 格式化输出
-        return format_response(
-            result_data,
-            format=input.format,
-            detail=input.detail
-        )
-
-    except MCPError:
-        raise
-    except Exception as e:
-        raise MCPError(
-            message=f"图像生成失败: {str(e)}",
-            suggestion="请检查提示词和API配置，稍后重试"
-        )
+    async with inflight.track():
+        try:
+            # 整个调用（API请求、重试和下载）共享同一个截止时间
+            deadline = Deadline.for_tier(input.latency_tier, input.deadline_ms)
+
+            # 按指定模型或策略选择模型
+            model = model_registry.select(input.model, input.model_policy)
+
+            # 调用API（交互式请求优先调度）
+            start_time = datetime.datetime.now()
+            generated = await request_image(
+                input.prompt,
+                input.size,
+                input.response_format,
+                input.optimize_prompt,
+                priority="interactive",
+                latency_tier=input.latency_tier,
+                deadline=deadline,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+            processing_time_ms = int((datetime.datetime.now() - start_time).total_seconds() * 1000)
+
+            # 构建结果记录
+            record = ImageRecord(
+                index=0,
+                prompt=input.prompt,
+                image_url=generated["image_url"],
+                image_size=input.size,
+                token_usage=generated["token_usage"]
+            )
+
+            # resource 格式只登记图像，首次读取资源时再下载，生成延迟不再包含下载时间
+            if input.response_format == "resource" and record.image_url:
+                await lazy_images.defer(record, generated["model_used"], input.download_dir)
+
+            # 如果需要本地文件（或图库未启用、无法延迟下载），下载图片
+            if input.response_format in ("local_file", "resource") and record.image_url and record.resource_uri is None:
+                try:
+                    # 下载图片到指定目录
+                    record.local_path = await download_image(record.image_url, input.download_dir, deadline=deadline)
+                    record.downloaded = True
+                except MCPError as download_error:
+                    if not is_deadline_error(download_error):
+                        raise
+                    # 图像已生成但下载超出时限，返回URL作为部分结果
+                    record.downloaded = False
+                    record.download_error = str(download_error)
+                    record.deadline_exceeded = True
+
+            # 记录到图库，之后相同的提示词可以通过 find_generated_images 直接复用
+            if record.gallery_id is None:
+                record.gallery_id = await gallery.add(record, generated["model_used"], download_dir=input.download_dir)
+
+            result = GenerationResult(model_used=generated["model_used"], is_group=False, expected_images=1)
+            result.add(record)
+            result.finish(processing_time_ms)
+
+            # 格式化输出
+            return format_response(
+                result,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            raise
+        except Exception as e:
+            raise MCPError(
+                message=f"图像生成失败: {str(e)}",
+                suggestion="请检查提示词和API配置，稍后重试"
+            )
 
 # 批量生成图像工具
 from pydantic import field_validator
@@ -138,7 +227,7 @@ from typing import List
 
 class GenerateImageGroupInput(BaseModel):
     """批量生成图像的输入模型"""
-    model_config = {"extra": "forbid"}
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
 
     prompts: List[str] = Field(
         description="详细的图像描述文本列表，每个提示词支持中英文",
@@ -156,14 +245,38 @@ class GenerateImageGroupInput(BaseModel):
         examples=["2048x2048", "1K", "2K"]
     )
 
-    response_format: Literal["url", "b64_json", "local_file"] = Field(
+    response_format: Literal["url", "b64_json", "local_file", "resource"] = Field(
         default="local_file",
-        description="返回格式: 'url'、'b64_json'或'local_file'"
+        description="返回格式: 'url'、'b64_json'、'local_file'或'resource'（立即返回资源URI，首次读取时才下载）"
     )
     
     download_dir: Optional[str] = Field(
         default=DEFAULT_DOWNLOAD_DIR,
-        description="当response_format为'local_file'时，图片保存的目录"
+        description="当response_format为'local_file'或'resource'时，图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
     )
 
     optimize_prompt: bool = Field(
@@ -171,6 +284,18 @@ class GenerateImageGroupInput(BaseModel):
         description="是否优化提示词"
     )
 
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位: 'fast' 使用快速提示词优化且默认时限更短，'standard' 生成质量更高"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1000,
+        le=600000,
+        description="端到端时限（毫秒），涵盖排队、API请求、重试和下载，默认使用延迟档位的时限"
+    )
+
     format: Literal["json", "markdown"] = Field(
         default="json",
         description="输出格式: 'json' 或 'markdown'"
@@ -207,111 +332,508 @@ async def generate_image_group(input: GenerateImageGroupInput) -> str:
     使用此工具根据多个文本提示批量生成多张高质量图像，所有生成的图像默认不带水印。
     支持多种输出格式和详细程度选择。
     """
-    try:
-        # 准备结果列表和总token数
-        images_data = []
-        total_tokens = 0
-        start_time = datetime.datetime.now()
+    async with inflight.track():
+        try:
+            start_time = datetime.datetime.now()
+            deadline = Deadline.for_tier(input.latency_tier, input.deadline_ms)
+            # 同一组图像使用同一个模型
+            model = model_registry.select(input.model, input.model_policy)
+
+            # 所有提示词并发提交，由调度器以批量优先级控制实际的 API 并发
+            records = await generate_group(
+                input.prompts,
+                input.size,
+                input.response_format,
+                input.download_dir,
+                input.optimize_prompt,
+                priority="batch",
+                latency_tier=input.latency_tier,
+                deadline=deadline,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+
+            # 汇总值在添加记录时增量计算
+            result = GenerationResult(
+                model_used=model.model_id,
+                expected_images=len(input.prompts),
+                download_dir=input.download_dir if input.response_format == "local_file" else None
+            )
+            for record in records:
+                result.add(record)
+            result.finish(int((datetime.datetime.now() - start_time).total_seconds() * 1000))
+
+            # 格式化输出
+            return format_response(
+                result,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            raise
+        except Exception as e:
+            raise MCPError(
+                message=f"批量图像生成失败: {str(e)}",
+                suggestion="请检查提示词列表和API配置，稍后重试"
+            )
+
+# JSONL批量生成图像工具
+class GenerateImageBulkInput(BaseModel):
+    """JSONL批量生成图像的输入模型"""
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
+
+    input_path: str = Field(
+        description="提示词JSONL文件路径，每行一个JSON字符串或包含prompt（可选id、size）的JSON对象",
+        min_length=1,
+        examples=["./prompts.jsonl"]
+    )
+
+    output_path: Optional[str] = Field(
+        default=None,
+        description="结果JSONL文件路径，默认为输入文件同目录下的'<文件名>.results.jsonl'"
+    )
+
+    size: str = Field(
+        default="2048x2048",
+        description="默认图像尺寸，可被每行的size字段覆盖",
+        examples=["2048x2048", "1K", "2K"]
+    )
+
+    response_format: Literal["url", "b64_json", "local_file", "resource"] = Field(
+        default="local_file",
+        description="返回格式: 'url'、'b64_json'、'local_file'或'resource'（结果中记录资源URI，首次读取时才下载）"
+    )
+
+    download_dir: Optional[str] = Field(
+        default=DEFAULT_DOWNLOAD_DIR,
+        description="当response_format为'local_file'或'resource'时，图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
 
-        # 对每个提示词单独调用API
-        for i, prompt in enumerate(input.prompts):
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    optimize_prompt: bool = Field(
+        default=True,
+        description="是否优化提示词"
+    )
+
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位，每条提示词各自使用该档位的默认时限"
+    )
+
+    max_in_flight: int = Field(
+        default=8,
+        ge=1,
+        le=64,
+        description="同时处理的提示词上限，决定内存占用上限"
+    )
+
+    format: Literal["json", "markdown"] = Field(
+        default="json",
+        description="输出格式: 'json' 或 'markdown'"
+    )
+
+    detail: Literal["concise", "detailed"] = Field(
+        default="concise",
+        description="详细程度: 'concise' 或 'detailed'"
+    )
+
+    @field_validator('size')
+    @classmethod
+    def validate_size(cls, v):
+        """验证默认尺寸的格式，与每行的size字段使用相同规则"""
+        if not is_valid_size(v):
+            raise ValueError(invalid_size_message(v))
+        return v
+
+@mcp.tool(
+    annotations={
+        "readOnlyHint": False,
+        "destructiveHint": False,
+        "idempotentHint": False,
+        "openWorldHint": True
+    }
+)
+async def generate_image_bulk(input: GenerateImageBulkInput) -> str:
+    """
+    从JSONL文件批量生成大量图像，结果流式写入JSONL文件
+
+    适用于成百上千条提示词的目录类任务。提示词逐行读取并以后台优先级并发生成，
+    每完成一条立即写入输出文件，只返回任务汇总。少量提示词请使用 generate_image_group。
+
+    Args:
+        input_path: 提示词JSONL文件路径
+        output_path: 结果JSONL文件路径，默认为'<输入文件名>.results.jsonl'
+        size: 默认图像尺寸，每行可用size字段覆盖
+        response_format: 返回格式，可选'url'、'b64_json'、'local_file'或'resource'，默认为'local_file'
+        download_dir: 当response_format为'local_file'或'resource'时，图片保存的目录
+        optimize_prompt: 是否优化提示词，默认为True
+        latency_tier: 延迟档位，'fast'或'standard'
+        max_in_flight: 同时处理的提示词上限（1-64），默认为8
+        format: 输出格式，可选'json'或'markdown'，默认为'json'
+        detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
+
+    Returns:
+        任务汇总，包含成功/失败数量、token用量和结果文件路径
+
+    Examples:
+        generate_image_bulk(input_path="./catalogue.jsonl")
+        generate_image_bulk(input_path="./prompts.jsonl", output_path="./results.jsonl", size="1K", max_in_flight=16)
+
+    Error Handling:
+        - 输入文件不存在: 请检查input_path
+        - 输出文件与输入文件相同: 请指定其他output_path
+        - 某行格式错误或size无法识别: 该行在结果文件中记录error，不影响其他行
+        - 单条生成失败: 在结果文件中记录error，继续处理其他提示词
+    """
+    async with inflight.track():
+        try:
+            model = model_registry.select(input.model, input.model_policy)
+            output_path = input.output_path or f"{os.path.splitext(input.input_path)[0]}.results.jsonl"
+            summary = await run_bulk_generation(
+                input.input_path,
+                output_path,
+                input.size,
+                input.response_format,
+                input.download_dir,
+                input.optimize_prompt,
+                input.latency_tier,
+                input.max_in_flight,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+            summary["model_used"] = model.model_id
+
+            # 格式化输出（只返回汇总，逐条结果在输出文件中）
+            return format_response(
+                summary,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            # MCPError 已经包含可操作的建议，直接抛出
+            raise
+        except Exception as e:
+            # 其他异常转换为 MCPError
+            raise MCPError(
+                message=f"JSONL批量图像生成失败: {str(e)}",
+                suggestion="请检查输入文件格式和输出路径的写入权限，稍后重试"
+            )
+
+# 多尺寸生成图像工具
+class GenerateImageSizesInput(BaseModel):
+    """多尺寸生成图像的输入模型"""
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
+
+    prompt: str = Field(
+        description="详细的图像描述文本，支持中英文",
+        min_length=1,
+        max_length=600,
+        examples=["一只可爱的小猫在沙发上睡觉"]
+    )
+
+    sizes: List[str] = Field(
+        description="需要的尺寸列表，如'1K'/'2K'/'4K'或'1024x768'；只按最大的尺寸生成一次，其余尺寸在本地缩放得到",
+        min_length=1,
+        max_length=6,
+        examples=[["4K", "2K", "1K"], ["2048x2048", "1024x1024", "512x512"]]
+    )
+
+    download_dir: Optional[str] = Field(
+        default=DEFAULT_DOWNLOAD_DIR,
+        description="图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    optimize_prompt: bool = Field(
+        default=True,
+        description="是否优化提示词"
+    )
+
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位: 'fast' 使用快速提示词优化且默认时限更短，'standard' 生成质量更高"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1000,
+        le=600000,
+        description="端到端时限（毫秒），涵盖排队、API请求、下载和本地缩放，默认使用延迟档位的时限"
+    )
+
+    format: Literal["json", "markdown"] = Field(
+        default="json",
+        description="输出格式: 'json' 或 'markdown'"
+    )
+
+    detail: Literal["concise", "detailed"] = Field(
+        default="concise",
+        description="详细程度: 'concise' 或 'detailed'"
+    )
+
+    @field_validator('sizes')
+    @classmethod
+    def validate_sizes(cls, v):
+        """验证每个尺寸的格式"""
+        for size in v:
+            if not is_valid_size(size):
+                raise ValueError(invalid_size_message(size))
+        return v
+
+@mcp.tool(
+    annotations={
+        "readOnlyHint": False,
+        "destructiveHint": False,
+        "idempotentHint": False,
+        "openWorldHint": True
+    }
+)
+async def generate_image_sizes(input: GenerateImageSizesInput) -> str:
+    """
+    生成一次，得到同一张图像的多个尺寸
+
+    同一提示词需要多个尺寸时使用此工具：只按最大的尺寸调用一次 API，
+    较小的尺寸在本地用高质量重采样得到，比为每个尺寸分别调用 generate_image 更快且更省 token。
+    宽高比与源图不同的尺寸会先居中裁剪再缩放。需要安装 Pillow。
+
+    Args:
+        prompt: 图像描述文本
+        sizes: 需要的尺寸列表（1-6个）
+        download_dir: 图片保存的目录
+        optimize_prompt: 是否优化提示词，默认为True
+        latency_tier: 延迟档位，'fast'或'standard'
+        deadline_ms: 端到端时限（毫秒）
+        format: 输出格式，可选'json'或'markdown'，默认为'json'
+        detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
+
+    Returns:
+        按 sizes 顺序排列的图像列表，本地缩放得到的图像标记 derived
+
+    Examples:
+        generate_image_sizes(prompt="一只可爱的小猫在沙发上睡觉", sizes=["4K", "2K", "1K"])
+    """
+    async with inflight.track():
+        try:
+            start_time = datetime.datetime.now()
+            deadline = Deadline.for_tier(input.latency_tier, input.deadline_ms)
+            model = model_registry.select(input.model, input.model_policy)
+
+            records, model_used = await generate_sizes(
+                input.prompt,
+                input.sizes,
+                input.download_dir,
+                input.optimize_prompt,
+                priority="interactive",
+                latency_tier=input.latency_tier,
+                deadline=deadline,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+
+            result = GenerationResult(
+                model_used=model_used,
+                expected_images=len(records),
+                download_dir=input.download_dir
+            )
+            for record in records:
+                result.add(record)
+            result.finish(int((datetime.datetime.now() - start_time).total_seconds() * 1000))
+
+            # 格式化输出
+            return format_response(
+                result,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            raise
+        except Exception as e:
+            raise MCPError(
+                message=f"多尺寸图像生成失败: {str(e)}",
+                suggestion="请检查尺寸列表和API配置，稍后重试"
+            )
+
+# 查询已生成图像工具
+class FindGeneratedImagesInput(BaseModel):
+    """查询已生成图像的输入模型"""
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
+
+    query: Optional[str] = Field(
+        default=None,
+        description="提示词关键词，空格分隔，全部匹配，按相关度排序",
+        max_length=600,
+        examples=["小猫 沙发", "sunset mountains"]
+    )
+
+    prompt: Optional[str] = Field(
+        default=None,
+        description="完整提示词（精确匹配），用于判断相同的提示词是否已经生成过",
+        max_length=600
+    )
+
+    size: Optional[str] = Field(
+        default=None,
+        description="只返回该尺寸的图像，如'2048x2048'或'2K'"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="只返回该模型生成的图像: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID"
+    )
+
+    local_only: bool = Field(
+        default=False,
+        description="只返回本地文件仍然存在的图像"
+    )
+
+    limit: int = Field(
+        default=10,
+        ge=1,
+        le=100,
+        description="最多返回的图像数"
+    )
+
+    format: Literal["json", "markdown"] = Field(
+        default="json",
+        description="输出格式: 'json' 或 'markdown'"
+    )
+
+    detail: Literal["concise", "detailed"] = Field(
+        default="concise",
+        description="详细程度: 'concise' 或 'detailed'"
+    )
+
+@mcp.tool(
+    annotations={
+        "readOnlyHint": True,
+        "destructiveHint": False,
+        "idempotentHint": True,
+        "openWorldHint": False
+    }
+)
+async def find_generated_images(input: FindGeneratedImagesInput) -> str:
+    """
+    查询已经生成过的图像
+
+    每次生成都会记录到本地图库（提示词、尺寸、模型、token用量、URL、本地路径和文件摘要）。
+    生成新图像之前先用此工具查询，相同或相近的提示词可以直接复用已有图像，
+    查询只需几毫秒，无需再花费十几秒和 token 重新生成。
+
+    Args:
+        query: 提示词关键词，空格分隔，全部匹配
+        prompt: 完整提示词，精确匹配
+        size: 图像尺寸
+        model: 模型名称或完整模型ID
+        local_only: 只返回本地文件仍然存在的图像，默认为False
+        limit: 最多返回的图像数（1-100），默认为10
+        format: 输出格式，可选'json'或'markdown'，默认为'json'
+        detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
+
+    Returns:
+        匹配的图像列表，优先返回本地路径；本地文件不存在时返回原始URL（URL可能已过期）
+
+    Examples:
+        find_generated_images(prompt="一只可爱的小猫在沙发上睡觉", local_only=True)
+        find_generated_images(query="sunset mountains", size="2K", format="markdown")
+    """
+    try:
+        model = None
+        if input.model:
             try:
-                # 准备API请求数据
-                api_data = {
-                    "model": "doubao-seedream-4-0-250828",
-                    "prompt": prompt,
-            "size": input.size,
-            "response_format": "url" if input.response_format == "local_file" else input.response_format,
-            "watermark": False,  # 强制不添加水印
-            "optimize_prompt": input.optimize_prompt
-                }
-
-                # 调用API
-                response = await make_api_request(
-                    endpoint="api/v3/images/generations",
-                    method="POST",
-                    data=api_data
-                )
-
-                # 处理响应
-                image_url = response.get("data", [{}])[0].get("url")
-                tokens = response.get("usage", {}).get("total_tokens", 0)
-                total_tokens += tokens
-
-                # 创建图像数据字典
-                image_info = {
-                    "index": i,
-                    "prompt": prompt,
-                    "image_url": image_url,
-                    "image_size": input.size,
-                    "token_usage": tokens,
-                    "watermark": False,
-                    "success": True
-                }
-                
-                # 如果需要本地文件，下载图片
-                if input.response_format == "local_file" and image_url:
-                    try:
-                        # 下载图片到指定目录
-                        local_path = await download_image(image_url, input.download_dir)
-                        # 更新图像信息，添加本地文件信息
-                        image_info["local_path"] = local_path
-                        image_info["downloaded"] = True
-                    except Exception as download_error:
-                        # 下载失败不影响整体流程，只记录错误
-                        image_info["downloaded"] = False
-                        image_info["download_error"] = str(download_error)
-                
-                images_data.append(image_info)
-
-            except Exception as img_error:
-                # 单个图像生成失败，记录错误但继续处理其他图像
-                images_data.append({
-                    "index": i,
-                    "prompt": prompt,
-                    "error": str(img_error),
-                    "success": False
-                })
-
-        processing_time_ms = int((datetime.datetime.now() - start_time).total_seconds() * 1000)
-        
-        # 计算下载统计信息
-        downloaded_count = sum(1 for img in images_data if img.get("downloaded", False))
-        total_images = len(input.prompts)
-
-        # 构建完整响应数据
-        result_data = {
-            "success": len(images_data) > 0,
-            "total_images": total_images,
-            "successful_images": sum(1 for img in images_data if "error" not in img),
-            "images": images_data,
-            "total_token_usage": total_tokens,
-            "created_at": datetime.datetime.now().isoformat() + "Z",
-            "model_used": "doubao-seedream-4-0-250828",
-            "processing_time_ms": processing_time_ms
-        }
-        
-        # 添加下载汇总信息
-        if input.response_format == "local_file":
-            result_data["download_summary"] = f"成功下载 {downloaded_count}/{total_images} 张图片"
-            result_data["download_dir"] = input.download_dir
-
-        # 格式化输出
-        return format_response(
-            result_data,
-            format=input.format,
-            detail=input.detail
+                model = model_registry.get(input.model).model_id
+            except MCPError:
+                model = input.model
+        matches = await gallery.find(
+            query=input.query,
+            prompt=input.prompt,
+            size=input.size,
+            model=model,
+            local_only=input.local_only,
+            limit=input.limit
         )
+        return render_gallery_matches(matches, format=input.format, detail=input.detail)
 
     except MCPError:
         raise
     except Exception as e:
         raise MCPError(
-            message=f"批量图像生成失败: {str(e)}",
-            suggestion="请检查提示词列表和API配置，稍后重试"
+            message=f"查询已生成图像失败: {str(e)}",
+            suggestion="请检查查询条件和图库数据库路径（SEEDREAM_GALLERY_PATH），稍后重试"
         )
 
+# 已生成图像资源
+from fastmcp.resources import ResourceContent, ResourceResult
+
+@mcp.resource("seedream://images/{image_id}")
+async def generated_image(image_id: int) -> ResourceResult:
+    """
+    已生成的图像内容
+
+    image_id 为生成结果中的 gallery_id。response_format='resource' 时图像在第一次读取该资源时才下载，
+    并发读取同一张图像只下载一次；之后的读取直接使用已保存的文件。
+    """
+    async with inflight.track():
+        data, mime_type = await lazy_images.read(image_id)
+    return ResourceResult([ResourceContent(data, mime_type=mime_type)])
+
 if __name__ == "__main__":
-    # 使用 STDIO 传输协议运行服务器（默认）
-    # 这适合本地运行和Claude Desktop等环境使用
-    mcp.run()
\ No newline at end of file
+    if os.getenv("MCP_TRANSPORT", "stdio") == "http":
+        # Streamable HTTP 传输协议，适合多客户端和远程部署
+        from mcp_server_seedream.http_app import serve
+        serve()
+    else:
+        # 使用 STDIO 传输协议运行服务器（默认）
+        # 这适合本地运行和Claude Desktop等环境使用
+        mcp.run()
\ No newline at end of file
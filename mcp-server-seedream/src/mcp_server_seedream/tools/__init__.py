@@ -1,7 +1,13 @@
 from .generate_image import generate_image
 from .generate_image_group import generate_image_group
+from .generate_image_bulk import generate_image_bulk
+from .generate_image_sizes import generate_image_sizes
+from .find_generated_images import find_generated_images
 
 __all__ = [
     "generate_image",
-    "generate_image_group"
+    "generate_image_group",
+    "generate_image_bulk",
+    "generate_image_sizes",
+    "find_generated_images"
 ]
\ No newline at end of file
@@ -0,0 +1,117 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+from fastmcp import FastMCP
+from mcp_server_seedream.utils.models import model_registry
+from mcp_server_seedream.utils.gallery import gallery
+from mcp_server_seedream.utils.formatters import render_gallery_matches
+from mcp_server_seedream.utils.errors import MCPError
+
+# 创建FastMCP实例
+mcp = FastMCP("Seedream MCP Server")
+
+class FindGeneratedImagesInput(BaseModel):
+    """查询已生成图像的输入模型"""
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
+
+    query: Optional[str] = Field(
+        default=None,
+        description="提示词关键词，空格分隔，全部匹配，按相关度排序",
+        max_length=600,
+        examples=["小猫 沙发", "sunset mountains"]
+    )
+
+    prompt: Optional[str] = Field(
+        default=None,
+        description="完整提示词（精确匹配），用于判断相同的提示词是否已经生成过",
+        max_length=600
+    )
+
+    size: Optional[str] = Field(
+        default=None,
+        description="只返回该尺寸的图像，如'2048x2048'或'2K'"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="只返回该模型生成的图像: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID"
+    )
+
+    local_only: bool = Field(
+        default=False,
+        description="只返回本地文件仍然存在的图像"
+    )
+
+    limit: int = Field(
+        default=10,
+        ge=1,
+        le=100,
+        description="最多返回的图像数"
+    )
+
+    format: Literal["json", "markdown"] = Field(
+        default="json",
+        description="输出格式: 'json' 或 'markdown'"
+    )
+
+    detail: Literal["concise", "detailed"] = Field(
+        default="concise",
+        description="详细程度: 'concise' 或 'detailed'"
+    )
+
+@mcp.tool(
+    annotations={
+        "readOnlyHint": True,
+        "destructiveHint": False,
+        "idempotentHint": True,
+        "openWorldHint": False
+    }
+)
+async def find_generated_images(input: FindGeneratedImagesInput) -> str:
+    """
+    查询已经生成过的图像
+
+    每次生成都会记录到本地图库（提示词、尺寸、模型、token用量、URL、本地路径和文件摘要）。
+    生成新图像之前先用此工具查询，相同或相近的提示词可以直接复用已有图像，
+    查询只需几毫秒，无需再花费十几秒和 token 重新生成。
+
+    Args:
+        query: 提示词关键词，空格分隔，全部匹配
+        prompt: 完整提示词，精确匹配
+        size: 图像尺寸
+        model: 模型名称或完整模型ID
+        local_only: 只返回本地文件仍然存在的图像，默认为False
+        limit: 最多返回的图像数（1-100），默认为10
+        format: 输出格式，可选'json'或'markdown'，默认为'json'
+        detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
+
+    Returns:
+        匹配的图像列表，优先返回本地路径；本地文件不存在时返回原始URL（URL可能已过期）
+
+    Examples:
+        find_generated_images(prompt="一只可爱的小猫在沙发上睡觉", local_only=True)
+        find_generated_images(query="sunset mountains", size="2K", format="markdown")
+    """
+    try:
+        model = None
+        if input.model:
+            try:
+                model = model_registry.get(input.model).model_id
+            except MCPError:
+                model = input.model
+        matches = await gallery.find(
+            query=input.query,
+            prompt=input.prompt,
+            size=input.size,
+            model=model,
+            local_only=input.local_only,
+            limit=input.limit
+        )
+        return render_gallery_matches(matches, format=input.format, detail=input.detail)
+
+    except MCPError:
+        raise
+    except Exception as e:
+        raise MCPError(
+            message=f"查询已生成图像失败: {str(e)}",
+            suggestion="请检查查询条件和图库数据库路径（SEEDREAM_GALLERY_PATH），稍后重试"
+        )
\ No newline at end of file
@@ -3,9 +3,16 @@ from typing import Literal, Optional
 import datetime
 import os
 from fastmcp import FastMCP
-from mcp_server_seedream.utils.api_client import make_api_request, download_image
+from mcp_server_seedream.utils.api_client import download_image
+from mcp_server_seedream.utils.generation import request_image, is_deadline_error
+from mcp_server_seedream.utils.models import model_registry
+from mcp_server_seedream.utils.deadline import Deadline
+from mcp_server_seedream.utils.records import GenerationResult, ImageRecord
+from mcp_server_seedream.utils.gallery import gallery
+from mcp_server_seedream.utils.lazy_images import lazy_images
 from mcp_server_seedream.utils.formatters import format_response
 from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.inflight import inflight
 
 # 创建FastMCP实例
 mcp = FastMCP("Seedream MCP Server")
@@ -15,7 +22,7 @@ DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
 
 class GenerateImageInput(BaseModel):
     """生成图像的输入模型"""
-    model_config = {"extra": "forbid"}
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
 
     prompt: str = Field(
         description="详细的图像描述文本，支持中英文",
@@ -30,14 +37,38 @@ class GenerateImageInput(BaseModel):
         examples=["2048x2048", "1K", "2K"]
     )
 
-    response_format: Literal["url", "b64_json", "local_file"] = Field(
+    response_format: Literal["url", "b64_json", "local_file", "resource"] = Field(
         default="url",
-        description="返回格式: 'url'、'b64_json'或'local_file'"
+        description="返回格式: 'url'、'b64_json'、'local_file'或'resource'（立即返回资源URI，首次读取时才下载）"
     )
     
     download_dir: Optional[str] = Field(
         default=DEFAULT_DOWNLOAD_DIR,
-        description="当response_format为'local_file'时，图片保存的目录"
+        description="当response_format为'local_file'或'resource'时，图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
     )
 
     optimize_prompt: bool = Field(
@@ -45,6 +76,18 @@ class GenerateImageInput(BaseModel):
         description="是否优化提示词"
     )
 
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位: 'fast' 使用快速提示词优化且默认时限更短，'standard' 生成质量更高"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1000,
+        le=600000,
+        description="端到端时限（毫秒），涵盖排队、API请求、重试和下载，默认使用延迟档位的时限"
+    )
+
     format: Literal["json", "markdown"] = Field(
         default="json",
         description="输出格式: 'json' 或 'markdown'"
@@ -73,9 +116,11 @@ async def generate_image(input: GenerateImageInput) -> str:
     Args:
         prompt: 详细的图像描述文本，支持中英文，最长600字符
         size: 生成图像的尺寸，默认为2048x2048
-        response_format: 返回格式，可选'url'、'b64_json'或'local_file'，默认为'url'
-        download_dir: 当response_format为'local_file'时，图片保存的目录
+        response_format: 返回格式，可选'url'、'b64_json'、'local_file'或'resource'，默认为'url'
+        download_dir: 当response_format为'local_file'或'resource'时，图片保存的目录
         optimize_prompt: 是否优化提示词，默认为True
+        latency_tier: 延迟档位，'fast'（快速提示词优化，默认时限30秒）或'standard'（默认时限120秒）
+        deadline_ms: 端到端时限（毫秒），到期时未完成的步骤被中止并返回部分结果
         format: 输出格式，可选'json'或'markdown'，默认为'json'
         detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
 
@@ -94,60 +139,78 @@ async def generate_image(input: GenerateImageInput) -> str:
         - 请求过于频繁: 请稍后重试或增加请求间隔
         - 下载失败: 请检查下载目录权限和空间
     """
-    try:
-        # 准备API请求数据
-        api_data = {
-            "model": "doubao-seedream-4-0-250828",
-            "prompt": input.prompt,
-            "size": input.size,
-            "response_format": "url" if input.response_format == "local_file" else input.response_format,  # API只支持url和b64_json
-            "watermark": False,  # 强制不添加水印
-            "optimize_prompt": input.optimize_prompt
-        }
-
-        # 调用API
-        start_time = datetime.datetime.now()
-        response = await make_api_request(
-            endpoint="api/v3/images/generations",
-            method="POST",
-            data=api_data
-        )
-        processing_time_ms = int((datetime.datetime.now() - start_time).total_seconds() * 1000)
-
-        # 构建响应数据
-        image_url = response.get("data", [{}])[0].get("url")
-        result_data = {
-            "success": True,
-            "image_url": image_url,
-            "image_size": input.size,
-            "token_usage": response.get("usage", {}).get("total_tokens", 0),
-            "created_at": datetime.datetime.now().isoformat() + "Z",
-            "model_used": "doubao-seedream-4-0-250828",
-            "processing_time_ms": processing_time_ms,
-            "watermark": False
-        }
-        
-        # 如果需要本地文件，下载图片
-        if input.response_format == "local_file" and image_url:
-            # 下载图片到指定目录
-            local_path = await download_image(image_url, input.download_dir)
-            # 更新响应数据，添加本地文件信息
-            result_data["local_path"] = local_path
-            result_data["downloaded"] = True
-
-        # 格式化输出
-        return format_response(
-            result_data,
-            format=input.format,
-            detail=input.detail
-        )
-
-    except MCPError:
-        # MCPError 已经包含可操作的建议，直接抛出
-        raise
-    except Exception as e:
-        # 其他异常转换为 MCPError
-        raise MCPError(
-            message=f"图像生成失败: {str(e)}",
-            suggestion="请检查提示词和API配置，稍后重试"
-        )
\ No newline at end of file
+    async with inflight.track():
+        try:
+            # 整个调用（API请求、重试和下载）共享同一个截止时间
+            deadline = Deadline.for_tier(input.latency_tier, input.deadline_ms)
+
+            # 按指定模型或策略选择模型
+            model = model_registry.select(input.model, input.model_policy)
+
+            # 调用API（交互式请求优先调度）
+            start_time = datetime.datetime.now()
+            generated = await request_image(
+                input.prompt,
+                input.size,
+                input.response_format,
+                input.optimize_prompt,
+                priority="interactive",
+                latency_tier=input.latency_tier,
+                deadline=deadline,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+            processing_time_ms = int((datetime.datetime.now() - start_time).total_seconds() * 1000)
+
+            # 构建结果记录
+            record = ImageRecord(
+                index=0,
+                prompt=input.prompt,
+                image_url=generated["image_url"],
+                image_size=input.size,
+                token_usage=generated["token_usage"]
+            )
+
+            # resource 格式只登记图像，首次读取资源时再下载，生成延迟不再包含下载时间
+            if input.response_format == "resource" and record.image_url:
+                await lazy_images.defer(record, generated["model_used"], input.download_dir)
+
+            # 如果需要本地文件（或图库未启用、无法延迟下载），下载图片
+            if input.response_format in ("local_file", "resource") and record.image_url and record.resource_uri is None:
+                try:
+                    # 下载图片到指定目录
+                    record.local_path = await download_image(record.image_url, input.download_dir, deadline=deadline)
+                    record.downloaded = True
+                except MCPError as download_error:
+                    if not is_deadline_error(download_error):
+                        raise
+                    # 图像已生成但下载超出时限，返回URL作为部分结果
+                    record.downloaded = False
+                    record.download_error = str(download_error)
+                    record.deadline_exceeded = True
+
+            # 记录到图库，之后相同的提示词可以通过 find_generated_images 直接复用
+            if record.gallery_id is None:
+                record.gallery_id = await gallery.add(record, generated["model_used"], download_dir=input.download_dir)
+
+            result = GenerationResult(model_used=generated["model_used"], is_group=False, expected_images=1)
+            result.add(record)
+            result.finish(processing_time_ms)
+
+            # 格式化输出
+            return format_response(
+                result,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            # MCPError 已经包含可操作的建议，直接抛出
+            raise
+        except Exception as e:
+            # 其他异常转换为 MCPError
+            raise MCPError(
+                message=f"图像生成失败: {str(e)}",
+                suggestion="请检查提示词和API配置，稍后重试"
+            )
\ No newline at end of file
@@ -0,0 +1,172 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+import os
+from fastmcp import FastMCP
+from mcp_server_seedream.utils.models import model_registry
+from mcp_server_seedream.utils.bulk import run_bulk_generation
+from mcp_server_seedream.utils.formatters import format_response
+from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.inflight import inflight
+
+# 创建FastMCP实例
+mcp = FastMCP("Seedream MCP Server")
+
+# 从环境变量获取默认下载目录
+DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
+
+class GenerateImageBulkInput(BaseModel):
+    """JSONL批量生成图像的输入模型"""
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
+
+    input_path: str = Field(
+        description="提示词JSONL文件路径，每行一个JSON字符串或包含prompt（可选id、size）的JSON对象",
+        min_length=1,
+        examples=["./prompts.jsonl"]
+    )
+
+    output_path: Optional[str] = Field(
+        default=None,
+        description="结果JSONL文件路径，默认为输入文件同目录下的'<文件名>.results.jsonl'"
+    )
+
+    size: str = Field(
+        default="2048x2048",
+        description="默认图像尺寸，可被每行的size字段覆盖",
+        examples=["2048x2048", "1K", "2K"]
+    )
+
+    response_format: Literal["url", "b64_json", "local_file", "resource"] = Field(
+        default="local_file",
+        description="返回格式: 'url'、'b64_json'、'local_file'或'resource'（结果中记录资源URI，首次读取时才下载）"
+    )
+
+    download_dir: Optional[str] = Field(
+        default=DEFAULT_DOWNLOAD_DIR,
+        description="当response_format为'local_file'或'resource'时，图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    optimize_prompt: bool = Field(
+        default=True,
+        description="是否优化提示词"
+    )
+
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位，每条提示词各自使用该档位的默认时限"
+    )
+
+    max_in_flight: int = Field(
+        default=8,
+        ge=1,
+        le=64,
+        description="同时处理的提示词上限，决定内存占用上限"
+    )
+
+    format: Literal["json", "markdown"] = Field(
+        default="json",
+        description="输出格式: 'json' 或 'markdown'"
+    )
+
+    detail: Literal["concise", "detailed"] = Field(
+        default="concise",
+        description="详细程度: 'concise' 或 'detailed'"
+    )
+
+@mcp.tool(
+    annotations={
+        "readOnlyHint": False,
+        "destructiveHint": False,
+        "idempotentHint": False,
+        "openWorldHint": True
+    }
+)
+async def generate_image_bulk(input: GenerateImageBulkInput) -> str:
+    """
+    从JSONL文件批量生成大量图像，结果流式写入JSONL文件
+
+    适用于成百上千条提示词的目录类任务。提示词逐行读取并以后台优先级并发生成，
+    每完成一条立即写入输出文件，只返回任务汇总。少量提示词请使用 generate_image_group。
+
+    Args:
+        input_path: 提示词JSONL文件路径
+        output_path: 结果JSONL文件路径，默认为'<输入文件名>.results.jsonl'
+        size: 默认图像尺寸，每行可用size字段覆盖
+        response_format: 返回格式，可选'url'、'b64_json'、'local_file'或'resource'，默认为'local_file'
+        download_dir: 当response_format为'local_file'或'resource'时，图片保存的目录
+        optimize_prompt: 是否优化提示词，默认为True
+        latency_tier: 延迟档位，'fast'或'standard'
+        max_in_flight: 同时处理的提示词上限（1-64），默认为8
+        format: 输出格式，可选'json'或'markdown'，默认为'json'
+        detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
+
+    Returns:
+        任务汇总，包含成功/失败数量、token用量和结果文件路径
+
+    Examples:
+        generate_image_bulk(input_path="./catalogue.jsonl")
+        generate_image_bulk(input_path="./prompts.jsonl", output_path="./results.jsonl", size="1K", max_in_flight=16)
+
+    Error Handling:
+        - 输入文件不存在: 请检查input_path
+        - 某行格式错误: 该行在结果文件中记录error，不影响其他行
+        - 单条生成失败: 在结果文件中记录error，继续处理其他提示词
+    """
+    async with inflight.track():
+        try:
+            model = model_registry.select(input.model, input.model_policy)
+            output_path = input.output_path or f"{os.path.splitext(input.input_path)[0]}.results.jsonl"
+            summary = await run_bulk_generation(
+                input.input_path,
+                output_path,
+                input.size,
+                input.response_format,
+                input.download_dir,
+                input.optimize_prompt,
+                input.latency_tier,
+                input.max_in_flight,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+            summary["model_used"] = model.model_id
+
+            # 格式化输出（只返回汇总，逐条结果在输出文件中）
+            return format_response(
+                summary,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            # MCPError 已经包含可操作的建议，直接抛出
+            raise
+        except Exception as e:
+            # 其他异常转换为 MCPError
+            raise MCPError(
+                message=f"JSONL批量图像生成失败: {str(e)}",
+                suggestion="请检查输入文件格式和输出路径的写入权限，稍后重试"
+            )
\ No newline at end of file
@@ -3,9 +3,13 @@ from typing import Literal, List, Optional
 import datetime
 import os
 from fastmcp import FastMCP
-from mcp_server_seedream.utils.api_client import make_api_request, download_image
+from mcp_server_seedream.utils.generation import generate_group
+from mcp_server_seedream.utils.models import model_registry
+from mcp_server_seedream.utils.deadline import Deadline
+from mcp_server_seedream.utils.records import GenerationResult
 from mcp_server_seedream.utils.formatters import format_response
 from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.inflight import inflight
 
 # 创建FastMCP实例
 mcp = FastMCP("Seedream MCP Server")
@@ -15,7 +19,7 @@ DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
 
 class GenerateImageGroupInput(BaseModel):
     """批量生成图像的输入模型"""
-    model_config = {"extra": "forbid"}
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
 
     prompts: List[str] = Field(
         description="详细的图像描述文本列表，每个提示词支持中英文",
@@ -33,14 +37,38 @@ class GenerateImageGroupInput(BaseModel):
         examples=["2048x2048", "1K", "2K"]
     )
 
-    response_format: Literal["url", "b64_json", "local_file"] = Field(
+    response_format: Literal["url", "b64_json", "local_file", "resource"] = Field(
         default="local_file",
-        description="返回格式: 'url'、'b64_json'或'local_file'"
+        description="返回格式: 'url'、'b64_json'、'local_file'或'resource'（立即返回资源URI，首次读取时才下载）"
     )
     
     download_dir: Optional[str] = Field(
         default=DEFAULT_DOWNLOAD_DIR,
-        description="当response_format为'local_file'时，图片保存的目录"
+        description="当response_format为'local_file'或'resource'时，图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
     )
 
     optimize_prompt: bool = Field(
@@ -48,6 +76,18 @@ class GenerateImageGroupInput(BaseModel):
         description="是否优化提示词"
     )
 
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位: 'fast' 使用快速提示词优化且默认时限更短，'standard' 生成质量更高"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1000,
+        le=600000,
+        description="端到端时限（毫秒），涵盖排队、API请求、重试和下载，默认使用延迟档位的时限"
+    )
+
     format: Literal["json", "markdown"] = Field(
         default="json",
         description="输出格式: 'json' 或 'markdown'"
@@ -87,9 +127,11 @@ async def generate_image_group(input: GenerateImageGroupInput) -> str:
     Args:
         prompts: 详细的图像描述文本列表，每个提示词支持中英文，最长600字符，最多10个
         size: 生成图像的尺寸，默认为2048x2048
-        response_format: 返回格式，可选'url'、'b64_json'或'local_file'，默认为'local_file'
-        download_dir: 当response_format为'local_file'时，图片保存的目录
+        response_format: 返回格式，可选'url'、'b64_json'、'local_file'或'resource'，默认为'local_file'
+        download_dir: 当response_format为'local_file'或'resource'时，图片保存的目录
         optimize_prompt: 是否优化提示词，默认为True
+        latency_tier: 延迟档位，'fast'（快速提示词优化，默认时限30秒）或'standard'（默认时限120秒）
+        deadline_ms: 端到端时限（毫秒），到期时未完成的步骤被中止并返回部分结果
         format: 输出格式，可选'json'或'markdown'，默认为'json'
         detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
 
@@ -110,108 +152,51 @@ async def generate_image_group(input: GenerateImageGroupInput) -> str:
         - 下载失败: 请检查下载目录权限和空间
         - 部分图像生成失败: 返回成功生成的图像，在错误信息中说明
     """
-    try:
-        # 准备结果列表和总token数
-        images_data = []
-        total_tokens = 0
-        start_time = datetime.datetime.now()
-
-        # 对每个提示词单独调用API（由于API可能不支持一次请求多个不同提示词）
-        for i, prompt in enumerate(input.prompts):
-            try:
-                # 准备API请求数据
-                api_data = {
-                    "model": "doubao-seedream-4-0-250828",
-                    "prompt": prompt,
-                    "size": input.size,
-                    "response_format": "url" if input.response_format == "local_file" else input.response_format,
-                    "watermark": False,  # 强制不添加水印
-                    "optimize_prompt": input.optimize_prompt
-                }
-
-                # 调用API
-                response = await make_api_request(
-                    endpoint="api/v3/images/generations",
-                    method="POST",
-                    data=api_data
-                )
-
-                # 处理响应
-                image_url = response.get("data", [{}])[0].get("url")
-                tokens = response.get("usage", {}).get("total_tokens", 0)
-                total_tokens += tokens
-
-                # 创建图像数据字典
-                image_info = {
-                    "index": i,
-                    "prompt": prompt,
-                    "image_url": image_url,
-                    "image_size": input.size,
-                    "token_usage": tokens,
-                    "watermark": False,
-                    "success": True
-                }
-                
-                # 如果需要本地文件，下载图片
-                if input.response_format == "local_file" and image_url:
-                    try:
-                        # 下载图片到指定目录
-                        local_path = await download_image(image_url, input.download_dir)
-                        # 更新图像信息，添加本地文件信息
-                        image_info["local_path"] = local_path
-                        image_info["downloaded"] = True
-                    except Exception as download_error:
-                        # 下载失败不影响整体流程，只记录错误
-                        image_info["downloaded"] = False
-                        image_info["download_error"] = str(download_error)
-                
-                images_data.append(image_info)
-
-            except Exception as img_error:
-                # 单个图像生成失败，记录错误但继续处理其他图像
-                images_data.append({
-                    "index": i,
-                    "prompt": prompt,
-                    "error": str(img_error),
-                    "success": False
-                })
-
-        processing_time_ms = int((datetime.datetime.now() - start_time).total_seconds() * 1000)
-        
-        # 计算下载统计信息
-        downloaded_count = sum(1 for img in images_data if img.get("downloaded", False))
-        total_images = len(input.prompts)
-
-        # 构建完整响应数据
-        result_data = {
-            "success": len(images_data) > 0,
-            "total_images": total_images,
-            "successful_images": sum(1 for img in images_data if "error" not in img),
-            "images": images_data,
-            "total_token_usage": total_tokens,
-            "created_at": datetime.datetime.now().isoformat() + "Z",
-            "model_used": "doubao-seedream-4-0-250828",
-            "processing_time_ms": processing_time_ms
-        }
-        
-        # 添加下载汇总信息
-        if input.response_format == "local_file":
-            result_data["download_summary"] = f"成功下载 {downloaded_count}/{total_images} 张图片"
-            result_data["download_dir"] = input.download_dir
-
-        # 格式化输出
-        return format_response(
-            result_data,
-            format=input.format,
-            detail=input.detail
-        )
-
-    except MCPError:
-        # MCPError 已经包含可操作的建议，直接抛出
-        raise
-    except Exception as e:
-        # 其他异常转换为 MCPError
-        raise MCPError(
-            message=f"批量图像生成失败: {str(e)}",
-            suggestion="请检查提示词列表和API配置，稍后重试"
-        )
\ No newline at end of file
+    async with inflight.track():
+        try:
+            start_time = datetime.datetime.now()
+            deadline = Deadline.for_tier(input.latency_tier, input.deadline_ms)
+            # 同一组图像使用同一个模型
+            model = model_registry.select(input.model, input.model_policy)
+
+            # 所有提示词并发提交，由调度器以批量优先级控制实际的 API 并发
+            records = await generate_group(
+                input.prompts,
+                input.size,
+                input.response_format,
+                input.download_dir,
+                input.optimize_prompt,
+                priority="batch",
+                latency_tier=input.latency_tier,
+                deadline=deadline,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+
+            # 汇总值在添加记录时增量计算
+            result = GenerationResult(
+                model_used=model.model_id,
+                expected_images=len(input.prompts),
+                download_dir=input.download_dir if input.response_format == "local_file" else None
+            )
+            for record in records:
+                result.add(record)
+            result.finish(int((datetime.datetime.now() - start_time).total_seconds() * 1000))
+
+            # 格式化输出
+            return format_response(
+                result,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            # MCPError 已经包含可操作的建议，直接抛出
+            raise
+        except Exception as e:
+            # 其他异常转换为 MCPError
+            raise MCPError(
+                message=f"批量图像生成失败: {str(e)}",
+                suggestion="请检查提示词列表和API配置，稍后重试"
+            )
\ No newline at end of file
@@ -0,0 +1,177 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Literal, List, Optional
+import datetime
+import os
+import re
+from fastmcp import FastMCP
+from mcp_server_seedream.utils.generation import generate_sizes
+from mcp_server_seedream.utils.models import model_registry
+from mcp_server_seedream.utils.deadline import Deadline
+from mcp_server_seedream.utils.records import GenerationResult
+from mcp_server_seedream.utils.formatters import format_response
+from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.inflight import inflight
+
+# 创建FastMCP实例
+mcp = FastMCP("Seedream MCP Server")
+
+# 从环境变量获取默认下载目录
+DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
+
+class GenerateImageSizesInput(BaseModel):
+    """多尺寸生成图像的输入模型"""
+    model_config = {"extra": "forbid", "protected_namespaces": ()}
+
+    prompt: str = Field(
+        description="详细的图像描述文本，支持中英文",
+        min_length=1,
+        max_length=600,
+        examples=["一只可爱的小猫在沙发上睡觉"]
+    )
+
+    sizes: List[str] = Field(
+        description="需要的尺寸列表，如'1K'/'2K'/'4K'或'1024x768'；只按最大的尺寸生成一次，其余尺寸在本地缩放得到",
+        min_length=1,
+        max_length=6,
+        examples=[["4K", "2K", "1K"], ["2048x2048", "1024x1024", "512x512"]]
+    )
+
+    download_dir: Optional[str] = Field(
+        default=DEFAULT_DOWNLOAD_DIR,
+        description="图片保存的目录"
+    )
+
+    model: Optional[str] = Field(
+        default=None,
+        description="指定模型: 'seedream-4.0'、'seedream-3.0-t2i' 或完整模型ID，指定后忽略 model_policy"
+    )
+
+    model_policy: Literal["default", "fastest"] = Field(
+        default="default",
+        description="模型选择策略: 'default' 使用默认模型，'fastest' 按实时延迟和错误率选择最快的文生图模型"
+    )
+
+    guidance_scale: Optional[float] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="文本权重，值越大与提示词越相关（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    seed: Optional[int] = Field(
+        default=None,
+        ge=-1,
+        le=2147483647,
+        description="随机数种子（仅 seedream-3.0-t2i 支持，其他模型忽略）"
+    )
+
+    optimize_prompt: bool = Field(
+        default=True,
+        description="是否优化提示词"
+    )
+
+    latency_tier: Literal["fast", "standard"] = Field(
+        default="standard",
+        description="延迟档位: 'fast' 使用快速提示词优化且默认时限更短，'standard' 生成质量更高"
+    )
+
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1000,
+        le=600000,
+        description="端到端时限（毫秒），涵盖排队、API请求、下载和本地缩放，默认使用延迟档位的时限"
+    )
+
+    format: Literal["json", "markdown"] = Field(
+        default="json",
+        description="输出格式: 'json' 或 'markdown'"
+    )
+
+    detail: Literal["concise", "detailed"] = Field(
+        default="concise",
+        description="详细程度: 'concise' 或 'detailed'"
+    )
+
+    @field_validator('sizes')
+    @classmethod
+    def validate_sizes(cls, v):
+        """验证每个尺寸的格式"""
+        for size in v:
+            if size.upper() not in ("1K", "2K", "4K") and not re.fullmatch(r"\d+[xX]\d+", size):
+                raise ValueError(f"无法识别的尺寸: {size}，请使用'1K'/'2K'/'4K'或'宽x高'")
+        return v
+
+@mcp.tool(
+    annotations={
+        "readOnlyHint": False,
+        "destructiveHint": False,
+        "idempotentHint": False,
+        "openWorldHint": True
+    }
+)
+async def generate_image_sizes(input: GenerateImageSizesInput) -> str:
+    """
+    生成一次，得到同一张图像的多个尺寸
+
+    同一提示词需要多个尺寸时使用此工具：只按最大的尺寸调用一次 API，
+    较小的尺寸在本地用高质量重采样得到，比为每个尺寸分别调用 generate_image 更快且更省 token。
+    宽高比与源图不同的尺寸会先居中裁剪再缩放。需要安装 Pillow。
+
+    Args:
+        prompt: 图像描述文本
+        sizes: 需要的尺寸列表（1-6个）
+        download_dir: 图片保存的目录
+        optimize_prompt: 是否优化提示词，默认为True
+        latency_tier: 延迟档位，'fast'或'standard'
+        deadline_ms: 端到端时限（毫秒）
+        format: 输出格式，可选'json'或'markdown'，默认为'json'
+        detail: 详细程度，可选'concise'或'detailed'，默认为'concise'
+
+    Returns:
+        按 sizes 顺序排列的图像列表，本地缩放得到的图像标记 derived
+
+    Examples:
+        generate_image_sizes(prompt="一只可爱的小猫在沙发上睡觉", sizes=["4K", "2K", "1K"])
+    """
+    async with inflight.track():
+        try:
+            start_time = datetime.datetime.now()
+            deadline = Deadline.for_tier(input.latency_tier, input.deadline_ms)
+            model = model_registry.select(input.model, input.model_policy)
+
+            records, model_used = await generate_sizes(
+                input.prompt,
+                input.sizes,
+                input.download_dir,
+                input.optimize_prompt,
+                priority="interactive",
+                latency_tier=input.latency_tier,
+                deadline=deadline,
+                model=model,
+                guidance_scale=input.guidance_scale,
+                seed=input.seed
+            )
+
+            result = GenerationResult(
+                model_used=model_used,
+                expected_images=len(records),
+                download_dir=input.download_dir
+            )
+            for record in records:
+                result.add(record)
+            result.finish(int((datetime.datetime.now() - start_time).total_seconds() * 1000))
+
+            # 格式化输出
+            return format_response(
+                result,
+                format=input.format,
+                detail=input.detail
+            )
+
+        except MCPError:
+            raise
+        except Exception as e:
+            raise MCPError(
+                message=f"多尺寸图像生成失败: {str(e)}",
+                suggestion="请检查尺寸列表和API配置，稍后重试"
+            )
\ No newline at end of file
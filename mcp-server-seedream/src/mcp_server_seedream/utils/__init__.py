@@ -1,11 +1,14 @@
 from .api_client import make_api_request
 from .errors import MCPError, handle_api_error
 from .formatters import format_response, truncate_response
+from .sync_client import SeedreamClient, get_default_client
 
 __all__ = [
     "make_api_request",
     "MCPError",
     "handle_api_error",
     "format_response",
-    "truncate_response"
+    "truncate_response",
+    "SeedreamClient",
+    "get_default_client"
 ]
\ No newline at end of file
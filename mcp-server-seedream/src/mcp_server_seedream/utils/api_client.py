@@ -1,24 +1,80 @@
+import asyncio
 import httpx
 import os
 import time
 import random
-from typing import Any, Dict, Optional
+import weakref
+from typing import Any, Callable, Dict, Optional
 from dotenv import load_dotenv
 
 # 加载 .env 文件中的环境变量
 load_dotenv()
 
-# API配置
-API_BASE_URL = os.getenv("API_BASE_URL", "https://api.seedream.ai")
-API_TOKEN = os.getenv("SEEDREAM_API_KEY")
+from .rate_limiter import rate_limiter, parse_retry_after
+from .scheduler import get_scheduler
+from .deadline import Deadline
+from .downloader import fetch_bytes
+from .storage import StorageError, get_storage
+from .backends import create_transport, requires_api_key
+from .key_pool import KeyPool, key_pool
+from .endpoints import endpoint_router, is_failover_error
+
+# API配置（基础 URL 见 endpoints.py）
 REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30.0"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "30.0"))
 DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
+# 启用主机级限流时，收到 429 后等待共享冷却结束再重试的次数
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "2"))
+
+# 连接池配置（HTTP 部署时同一进程内的所有客户端会话共享）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+# mock / replay 后端未配置密钥时使用的占位密钥
+_offline_keys = KeyPool(["offline"])
+
+# httpx.AsyncClient 绑定创建它的事件循环，因此按事件循环各保留一个连接池
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的 HTTP 客户端
+
+    API 请求与图片下载复用同一个连接池，避免每次调用重新建立 TLS 连接。
+    传输层由 SEEDREAM_BACKEND 决定（真实 API、本地模拟、回放或录制）。
+
+    Returns:
+        共享的 httpx.AsyncClient
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE
+        )
+        client = httpx.AsyncClient(
+            transport=create_transport(limits),
+            limits=limits,
+            timeout=REQUEST_TIMEOUT
+        )
+        _http_clients[loop] = client
+    return client
+
+async def close_http_client() -> None:
+    """关闭当前事件循环的共享 HTTP 客户端（停机时调用），其他事件循环的客户端不受影响"""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
 
 async def make_api_request(
     endpoint: str,
     method: str = "GET",
     params: Optional[Dict[str, Any]] = None,
-    data: Optional[Dict[str, Any]] = None
+    data: Optional[Dict[str, Any]] = None,
+    priority: str = "interactive",
+    deadline: Optional[Deadline] = None,
+    observe: Optional[Callable[[Optional[float], bool], None]] = None
 ) -> Dict[str, Any]:
     """
     发起 API 请求的通用函数
@@ -28,6 +84,10 @@ async def make_api_request(
         method: HTTP 方法
         params: URL 参数
         data: 请求体数据
+        priority: 调度优先级，interactive / batch / background
+        deadline: 端到端截止时间，排队、限流等待和重试都计入其中
+        observe: 每次 HTTP 尝试结束后的回调 (耗时秒数或 None, 是否成功)，
+            只统计服务端耗时，不含排队和限流等待；参数错误等客户端 4xx 不回调
 
     Returns:
         API 响应数据
@@ -35,83 +95,164 @@ async def make_api_request(
     Raises:
         MCPError: 当 API 请求失败时
     """
-    # 检查API密钥是否配置
-    if not API_TOKEN:
+    # 检查API密钥是否配置（mock / replay 后端不访问真实 API，不需要密钥）
+    if not key_pool and requires_api_key():
         from .errors import MCPError
         raise MCPError(
             message="API密钥未配置",
-            suggestion="请设置环境变量SEEDREAM_API_KEY或在.env文件中配置"
+            suggestion="请设置环境变量SEEDREAM_API_KEY（或多个密钥SEEDREAM_API_KEYS）或在.env文件中配置"
         )
     
-    # 准备请求头
+    # 准备请求头（Authorization 在每次尝试时按分配到的密钥填写）
     headers = {
-        "Authorization": f"Bearer {API_TOKEN}",
         "Content-Type": "application/json"
     }
     
-    # 构建完整URL
-    url = f"{API_BASE_URL}/{endpoint}"
+    async def send() -> Dict[str, Any]:
+        # 按优先级排队占用 API 并发槽位
+        async with get_scheduler().slot(priority):
+            return await _request_with_retry(method, endpoint, headers, params, data, deadline, observe)
+
+    if deadline is None:
+        return await send()
+    return await deadline.run(send(), "API请求")
 
-    async with httpx.AsyncClient() as client:
+async def _request_with_retry(
+    method: str,
+    path: str,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, Any]],
+    data: Optional[Dict[str, Any]],
+    deadline: Optional[Deadline] = None,
+    observe: Optional[Callable[[Optional[float], bool], None]] = None
+) -> Dict[str, Any]:
+    """
+    发送请求，每次尝试从密钥池分配一个密钥
+
+    某个密钥收到 429 或 401/403 后被暂时移出密钥池，还有其他可用密钥时立即换用其他密钥重试；
+    没有其他可用密钥且启用主机级限流时，在 429 后等待共享冷却并重试。
+    请求发往路由代价最低的端点，连接失败或 503（幂等请求还包括其他 5xx）时换用其他端点重试，
+    每个端点最多尝试一次
+    """
+    client = get_http_client()
+    pool = key_pool or _offline_keys
+    attempt = 0
+    failed = []
+    while True:
+        # 领取主机级共享的请求令牌（未配置限流时立即返回）
+        await rate_limiter.acquire()
+        # 分配进行中请求最少的可用密钥
+        key = await pool.acquire()
+        target = endpoint_router.acquire(failed)
+        started = time.monotonic()
         try:
             response = await client.request(
-                method, url,
-                headers=headers,
+                method, target.url(path),
+                headers={**headers, "Authorization": f"Bearer {key.token}"},
                 params=params,
                 json=data,
-                timeout=REQUEST_TIMEOUT  # 图像生成可能需要较长时间
+                # 图像生成可能需要较长时间，但不超过调用剩余的时限
+                timeout=deadline.timeout(REQUEST_TIMEOUT) if deadline else REQUEST_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if observe and (status == 429 or status >= 500):
+                observe(None, False)
+            failover = is_failover_error(e, method) and len(failed) + 1 < len(endpoint_router)
+            # 客户端 4xx 说明端点正常响应，但耗时不代表生成延迟，只更新错误率
+            endpoint_router.record(target, None, status < 500, failover)
+            if failover:
+                failed.append(target)
+                continue
+            if status == 429:
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                pool.throttled(key, retry_after)
+                if attempt < MAX_RETRIES and pool.has_available():
+                    attempt += 1
+                    continue
+                # 通知所有进程共同冷却，冷却结束后再重试
+                await rate_limiter.penalize(retry_after)
+                if rate_limiter.enabled and attempt < MAX_RETRIES:
+                    attempt += 1
+                    continue
+            elif status in (401, 403):
+                pool.rejected(key)
+                if attempt < MAX_RETRIES and pool.has_available():
+                    attempt += 1
+                    continue
+            from .errors import handle_api_error
+            raise handle_api_error(e)
         except httpx.HTTPError as e:
+            if observe:
+                observe(None, False)
+            failover = is_failover_error(e, method) and len(failed) + 1 < len(endpoint_router)
+            endpoint_router.record(target, None, False, failover)
+            if failover:
+                failed.append(target)
+                continue
             from .errors import handle_api_error
             raise handle_api_error(e)
+        finally:
+            pool.release(key)
+            endpoint_router.release(target)
+
+        endpoint_router.record(target, time.monotonic() - started, True)
+        pool.succeeded(key)
+        if observe:
+            observe(time.monotonic() - started, True)
+        usage = result.get("usage") if isinstance(result, dict) else None
+        if isinstance(usage, dict):
+            await rate_limiter.record_usage(usage.get("total_tokens", 0))
+        return result
+
+def _image_filename(extension: str, label: str = "") -> str:
+    """生成唯一文件名，label 非空时附加在时间戳之后（例如派生尺寸）"""
+    timestamp = int(time.time())
+    random_suffix = random.randint(1000, 9999)
+    label = f"_{label}" if label else ""
+    return f"seedream_image_{timestamp}_{random_suffix}{label}.{extension}"
 
-async def download_image(image_url: str, download_dir: str = DEFAULT_DOWNLOAD_DIR) -> str:
+async def download_image(
+    image_url: str,
+    download_dir: str = DEFAULT_DOWNLOAD_DIR,
+    deadline: Optional[Deadline] = None
+) -> str:
     """
-    下载图片到本地文件系统
+    下载图片到存储后端（SEEDREAM_STORAGE，默认本地文件系统）
     
     Args:
         image_url: 图片URL
-        download_dir: 下载目录路径
+        download_dir: 下载目录路径（仅本地存储使用）
+        deadline: 端到端截止时间，下载只能使用剩余的时间
         
     Returns:
-        本地文件路径
+        本地文件路径，对象存储时为 s3://bucket/key
         
     Raises:
-        MCPError: 下载失败时抛出
+        MCPError: 下载失败或超出时限时抛出
     """
+    if deadline is None:
+        return await _download_image(image_url, download_dir, DOWNLOAD_TIMEOUT)
+    return await deadline.run(
+        _download_image(image_url, download_dir, deadline.timeout(DOWNLOAD_TIMEOUT)),
+        "图片下载"
+    )
+
+async def _download_image(image_url: str, download_dir: str, timeout: float) -> str:
+    """下载图片并写入存储后端，返回图片位置"""
     from .errors import handle_download_error
     
     try:
-        # 创建下载目录
-        os.makedirs(download_dir, exist_ok=True)
-        
-        # 生成唯一文件名
-        timestamp = int(time.time())
-        random_suffix = random.randint(1000, 9999)
-        file_extension = "jpg"  # 假设所有图片都是JPG格式
-        filename = f"seedream_image_{timestamp}_{random_suffix}.{file_extension}"
+        # 生成唯一文件名（假设所有图片都是JPG格式）
+        filename = _image_filename("jpg")
         
-        # 构建完整文件路径
-        file_path = os.path.join(download_dir, filename)
-        
-        # 下载图片
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                image_url,
-                timeout=30.0,  # 下载超时设置
-                follow_redirects=True
-            )
-            response.raise_for_status()  # 检查响应状态
-            
-            # 写入文件
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-        
-        # 返回绝对路径
-        return os.path.abspath(file_path)
+        # 流式写入存储后端：本地存储大文件按 Range 并行分段，对象存储边下载边分段上传
+        return await get_storage().save(get_http_client(), image_url, download_dir, filename, timeout)
         
+    except (StorageError, ValueError) as e:
+        raise handle_download_error("STORAGE_ERROR", str(e))
     except PermissionError as e:
         raise handle_download_error("PERMISSION_ERROR", str(e))
     except IOError as e:
@@ -123,4 +264,66 @@ async def download_image(image_url: str, download_dir: str = DEFAULT_DOWNLOAD_DI
     except httpx.HTTPError as e:
         raise handle_download_error("DOWNLOAD_ERROR", f"网络错误: {str(e)}")
     except Exception as e:
-        raise handle_download_error("DOWNLOAD_ERROR", str(e))
\ No newline at end of file
+        raise handle_download_error("DOWNLOAD_ERROR", str(e))
+
+async def read_image(image_url: str, deadline: Optional[Deadline] = None) -> bytes:
+    """
+    下载图片到内存，用于本地处理（例如派生其他尺寸）
+
+    Args:
+        image_url: 图片URL
+        deadline: 端到端截止时间
+
+    Returns:
+        图片内容
+
+    Raises:
+        MCPError: 下载失败或超出时限时抛出
+    """
+    from .errors import handle_download_error
+
+    async def fetch() -> bytes:
+        try:
+            timeout = deadline.timeout(DOWNLOAD_TIMEOUT) if deadline else DOWNLOAD_TIMEOUT
+            return await fetch_bytes(get_http_client(), image_url, timeout)
+        except httpx.HTTPError as e:
+            raise handle_download_error("DOWNLOAD_ERROR", f"网络错误: {str(e)}")
+
+    if deadline is None:
+        return await fetch()
+    return await deadline.run(fetch(), "图片下载")
+
+async def save_image_bytes(
+    data: bytes,
+    extension: str,
+    download_dir: str = DEFAULT_DOWNLOAD_DIR,
+    label: str = ""
+) -> str:
+    """
+    把内存中的图片写入存储后端
+
+    Args:
+        data: 图片内容
+        extension: 文件扩展名
+        download_dir: 下载目录路径（仅本地存储使用）
+        label: 附加在文件名中的标识，例如尺寸
+
+    Returns:
+        本地文件路径，对象存储时为 s3://bucket/key
+
+    Raises:
+        MCPError: 写入失败时抛出
+    """
+    from .errors import handle_download_error
+
+    content_type = "image/jpeg" if extension == "jpg" else f"image/{extension}"
+    try:
+        return await get_storage().save_bytes(data, download_dir, _image_filename(extension, label), content_type)
+    except (StorageError, ValueError) as e:
+        raise handle_download_error("STORAGE_ERROR", str(e))
+    except PermissionError as e:
+        raise handle_download_error("PERMISSION_ERROR", str(e))
+    except OSError as e:
+        if "No space left on device" in str(e):
+            raise handle_download_error("DISK_SPACE_ERROR", str(e))
+        raise handle_download_error("DOWNLOAD_ERROR", str(e))
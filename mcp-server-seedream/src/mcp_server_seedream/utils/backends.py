@@ -0,0 +1,304 @@
+import asyncio
+import base64
+import itertools
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from .sizes import parse_image_size
+
+# 后端配置
+# live: 访问真实 API；mock: 本地模拟 API 和图片 CDN；
+# replay: 按录制的 cassette 回放；record: 访问真实 API 并录制到 cassette
+SEEDREAM_BACKEND = os.getenv("SEEDREAM_BACKEND", "live").lower()
+# 录制 / 回放使用的 cassette 文件（JSONL，每行一次交互）
+SEEDREAM_CASSETTE = os.getenv("SEEDREAM_CASSETTE", "./seedream_cassette.jsonl")
+# 模拟生成接口的延迟分布，例如 'fixed:800'、'uniform:500,1500'、'lognormal:800,0.5'（中位数毫秒, sigma）
+SEEDREAM_MOCK_LATENCY_MS = os.getenv("SEEDREAM_MOCK_LATENCY_MS", "lognormal:800,0.5")
+# 模拟图片 CDN 的首字节延迟分布
+SEEDREAM_MOCK_DOWNLOAD_LATENCY_MS = os.getenv("SEEDREAM_MOCK_DOWNLOAD_LATENCY_MS", "fixed:20")
+# 模拟图片的最小字节数（不足时用 PNG 附加块填充），0 表示不填充
+SEEDREAM_MOCK_IMAGE_BYTES = int(os.getenv("SEEDREAM_MOCK_IMAGE_BYTES", "0"))
+# 模拟生成接口返回 500 的概率
+SEEDREAM_MOCK_ERROR_RATE = float(os.getenv("SEEDREAM_MOCK_ERROR_RATE", "0"))
+# 回放速度倍数，2 表示按录制延迟的一半回放，0 表示不等待
+SEEDREAM_REPLAY_SPEED = float(os.getenv("SEEDREAM_REPLAY_SPEED", "1"))
+
+MOCK_IMAGE_HOST = "mock.seedream.local"
+
+class LatencyDistribution:
+    """
+    延迟分布
+
+    支持的格式：
+        'fixed:<毫秒>' 或直接写毫秒数
+        'uniform:<最小毫秒>,<最大毫秒>'
+        'lognormal:<中位数毫秒>,<sigma>'
+    """
+
+    def __init__(self, spec: str) -> None:
+        kind, _, args = spec.partition(":")
+        if not args:
+            kind, args = "fixed", kind
+        try:
+            values = [float(v) for v in args.split(",")]
+        except ValueError:
+            raise ValueError(f"无法解析延迟分布: {spec}")
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"不支持的延迟分布: {kind}")
+        self.kind = kind
+        self.values = values
+
+    def sample(self) -> float:
+        """采样一个延迟（秒）"""
+        if self.kind == "uniform":
+            ms = random.uniform(self.values[0], self.values[1])
+        elif self.kind == "lognormal":
+            ms = random.lognormvariate(0.0, self.values[1]) * self.values[0]
+        else:
+            ms = self.values[0]
+        return max(ms, 0.0) / 1000.0
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+_image_cache: Dict[Tuple[int, int, int], bytes] = {}
+_image_cache_lock = threading.Lock()
+
+def mock_image_bytes(width: int, height: int, min_bytes: int = 0) -> bytes:
+    """
+    生成指定尺寸的灰度渐变 PNG
+
+    每行内容相同，压缩后很小；需要模拟大文件时用私有附加块填充到 min_bytes，
+    图像解码器会忽略该块。结果按尺寸缓存。
+    """
+    key = (width, height, min_bytes)
+    with _image_cache_lock:
+        cached = _image_cache.get(key)
+    if cached is not None:
+        return cached
+
+    row = b"\x00" + bytes((x * 255 // max(width - 1, 1)) for x in range(width))
+    body = (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + _png_chunk(b"IDAT", zlib.compress(row * height, 6))
+    )
+    padding = min_bytes - len(body) - 24  # 填充块和 IEND 块的头尾开销
+    if padding > 0:
+        body += _png_chunk(b"paDd", b"\x00" * padding)
+    body += _png_chunk(b"IEND", b"")
+
+    with _image_cache_lock:
+        _image_cache[key] = body
+    return body
+
+def _serve_bytes(request: httpx.Request, content: bytes, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """返回图片内容，支持单个 Range 请求"""
+    headers = dict(headers or {})
+    headers.update({"Accept-Ranges": "bytes", "Content-Type": headers.get("Content-Type", "image/png")})
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+    if match:
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(content) - 1
+        end = min(end, len(content) - 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+        return httpx.Response(206, headers=headers, content=content[start:end + 1], request=request)
+    return httpx.Response(200, headers=headers, content=content, request=request)
+
+def _is_generation_request(request: httpx.Request) -> bool:
+    return request.method == "POST" and request.url.path.endswith("/images/generations")
+
+class MockTransport(httpx.AsyncBaseTransport):
+    """
+    本地模拟的 Seedream API 和图片 CDN
+
+    生成接口按配置的延迟分布等待后返回指向模拟 CDN 的图片地址（或 b64_json），
+    下载请求返回对应尺寸的 PNG，并支持 Range 分段下载。
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyDistribution] = None,
+        download_latency: Optional[LatencyDistribution] = None,
+        image_bytes: int = SEEDREAM_MOCK_IMAGE_BYTES,
+        error_rate: float = SEEDREAM_MOCK_ERROR_RATE
+    ) -> None:
+        self.latency = latency or LatencyDistribution(SEEDREAM_MOCK_LATENCY_MS)
+        self.download_latency = download_latency or LatencyDistribution(SEEDREAM_MOCK_DOWNLOAD_LATENCY_MS)
+        self.image_bytes = image_bytes
+        self.error_rate = error_rate
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if _is_generation_request(request):
+            await asyncio.sleep(self.latency.sample())
+            return await self._generate(request)
+        if request.method == "GET" and request.url.host == MOCK_IMAGE_HOST:
+            await asyncio.sleep(self.download_latency.sample())
+            width, height = parse_image_size(request.url.path.rsplit("_", 1)[-1].split(".")[0])
+            # 首次生成大尺寸图片需要压缩数 MB 数据，放到线程中执行
+            content = await asyncio.to_thread(mock_image_bytes, width, height, self.image_bytes)
+            return _serve_bytes(request, content)
+        return httpx.Response(404, json={"error": {"message": f"mock backend 不支持 {request.method} {request.url.path}"}}, request=request)
+
+    async def _generate(self, request: httpx.Request) -> httpx.Response:
+        if self.error_rate and random.random() < self.error_rate:
+            return httpx.Response(500, json={"error": {"code": "InternalServiceError", "message": "mock error"}}, request=request)
+        payload = json.loads(request.content or b"{}")
+        width, height = parse_image_size(str(payload.get("size", "2048x2048")))
+        if payload.get("response_format") == "b64_json":
+            content = await asyncio.to_thread(mock_image_bytes, width, height, self.image_bytes)
+            item = {"b64_json": base64.b64encode(content).decode("ascii")}
+        else:
+            item = {"url": f"https://{MOCK_IMAGE_HOST}/images/{uuid.uuid4().hex}_{width}x{height}.png"}
+        item["size"] = f"{width}x{height}"
+        return httpx.Response(200, json={
+            "model": payload.get("model"),
+            "created": int(time.time()),
+            "data": [item],
+            "usage": {"generated_images": 1, "output_tokens": width * height // 256, "total_tokens": width * height // 256}
+        }, request=request)
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    录制真实 API 流量的传输层
+
+    生成请求记录请求体、响应 JSON 和总耗时；下载请求只记录状态、响应头和首字节耗时，
+    不保存图片内容。请求头（包括 API 密钥）不会写入 cassette。
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, path: str = SEEDREAM_CASSETTE) -> None:
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        response = await self.inner.handle_async_request(request)
+        if _is_generation_request(request):
+            body = await response.aread()
+            await response.aclose()
+            entry = {
+                "kind": "generation",
+                "request": json.loads(request.content or b"{}"),
+                "status": response.status_code,
+                "body": body.decode("utf-8", errors="replace"),
+                "elapsed_ms": int((time.monotonic() - started) * 1000)
+            }
+            await asyncio.to_thread(self._append, entry)
+            return httpx.Response(response.status_code, headers=response.headers, content=body, request=request)
+
+        if request.method == "GET":
+            entry = {
+                "kind": "download",
+                "url": str(request.url),
+                "range": request.headers.get("Range"),
+                "status": response.status_code,
+                "content_length": int(response.headers.get("Content-Length", "0") or 0),
+                "content_type": response.headers.get("Content-Type"),
+                "elapsed_ms": int((time.monotonic() - started) * 1000)
+            }
+            await asyncio.to_thread(self._append, entry)
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    回放 cassette 的传输层
+
+    生成请求优先回放提示词相同的录制记录，没有时按录制顺序循环回放；
+    下载请求返回与录制文件大小相同的模拟 PNG 图片（Content-Type 为 image/png，与内容一致）。延迟取自录制的耗时，按 SEEDREAM_REPLAY_SPEED 缩放。
+    """
+
+    def __init__(self, path: str = SEEDREAM_CASSETTE, speed: float = SEEDREAM_REPLAY_SPEED) -> None:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"cassette 文件不存在: {path}，请先使用 SEEDREAM_BACKEND=record 录制")
+        generations: List[Dict[str, Any]] = []
+        downloads: List[Dict[str, Any]] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    (generations if entry.get("kind") == "generation" else downloads).append(entry)
+        if not generations:
+            raise ValueError(f"cassette 中没有生成请求记录: {path}")
+        self.speed = speed
+        self._by_prompt: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in generations:
+            self._by_prompt.setdefault(entry["request"].get("prompt", ""), []).append(entry)
+        self._generations = itertools.cycle(generations)
+        self._prompt_cursors = {prompt: itertools.cycle(entries) for prompt, entries in self._by_prompt.items()}
+        self._download_cursor = itertools.cycle(downloads) if downloads else None
+        # 同一 URL 的整体请求和各个分段必须对应同一份内容，按完整下载记录确定文件大小
+        full_downloads = [entry for entry in downloads if not entry.get("range")]
+        self._download_sizes = {entry["url"]: entry.get("content_length", 0) for entry in full_downloads}
+        self._fallback_sizes = itertools.cycle([entry.get("content_length", 0) for entry in full_downloads]) if full_downloads else None
+
+    async def _wait(self, entry: Dict[str, Any]) -> None:
+        if self.speed > 0:
+            await asyncio.sleep(entry.get("elapsed_ms", 0) / 1000.0 / self.speed)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if _is_generation_request(request):
+            prompt = json.loads(request.content or b"{}").get("prompt", "")
+            cursor = self._prompt_cursors.get(prompt, self._generations)
+            entry = next(cursor)
+            await self._wait(entry)
+            return httpx.Response(
+                entry["status"],
+                headers={"Content-Type": "application/json"},
+                content=entry["body"].encode("utf-8"),
+                request=request
+            )
+        if request.method == "GET":
+            entry = next(self._download_cursor) if self._download_cursor else {"elapsed_ms": 0}
+            await self._wait(entry)
+            url = str(request.url)
+            size = self._download_sizes.get(url)
+            if size is None:
+                size = next(self._fallback_sizes) if self._fallback_sizes else 0
+                self._download_sizes[url] = size
+            content = await asyncio.to_thread(mock_image_bytes, 64, 64, size)
+            # 回放的是模拟 PNG 而不是录制的原图，不使用录制的 Content-Type，否则按类型选择扩展名时会与内容不符
+            return _serve_bytes(request, content, {"Content-Type": "image/png"})
+        return httpx.Response(404, json={"error": {"message": f"cassette 中没有 {request.method} {request.url.path}"}}, request=request)
+
+def requires_api_key() -> bool:
+    """当前后端是否需要真实的 API 密钥"""
+    return SEEDREAM_BACKEND in ("live", "record")
+
+def create_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+    """
+    按 SEEDREAM_BACKEND 创建 HTTP 传输层
+
+    Args:
+        limits: 连接池配置（live / record 使用）
+
+    Returns:
+        传输层；live 模式返回 None，使用 httpx 默认传输层
+    """
+    if SEEDREAM_BACKEND == "live":
+        return None
+    if SEEDREAM_BACKEND == "mock":
+        return MockTransport()
+    if SEEDREAM_BACKEND == "replay":
+        return ReplayTransport()
+    if SEEDREAM_BACKEND == "record":
+        return RecordingTransport(httpx.AsyncHTTPTransport(limits=limits))
+    raise ValueError(f"不支持的 SEEDREAM_BACKEND: {SEEDREAM_BACKEND}，可选 live、mock、replay、record")
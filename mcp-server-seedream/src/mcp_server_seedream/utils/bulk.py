@@ -0,0 +1,256 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from .deadline import Deadline
+from .errors import MCPError
+from .generation import generate_group_item
+from .models import ModelSpec, model_registry
+from .records import GenerationResult, ImageRecord
+from .sizes import invalid_size_message, is_valid_size
+
+# 批量任务的文件读写配置
+# 每次在线程中读取输入文件的字节数（按整行读取）
+BULK_READ_BYTES = 64 * 1024
+# 结果在内存中累积到该条数后，在线程中一次写入输出文件
+BULK_WRITE_BATCH = int(os.getenv("BULK_WRITE_BATCH", "32"))
+# 累积的结果最多等待该时间（秒）就写入，生成较慢时结果仍能及时出现在输出文件中
+BULK_FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", "1"))
+
+def parse_prompt_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    解析 JSONL 提示词文件的一行
+
+    每行可以是 JSON 字符串（提示词本身），或包含 prompt 字段的 JSON 对象，
+    对象中的 id / size 字段会覆盖默认值并原样写入结果，size 的格式与工具参数相同。
+
+    Args:
+        line: 一行文本
+
+    Returns:
+        记录；空行返回 None，无法解析的行返回包含 error 字段的记录
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return {"error": f"JSON解析失败: {e}"}
+    if isinstance(record, str):
+        record = {"prompt": record}
+    prompt = record.get("prompt") if isinstance(record, dict) else None
+    if not isinstance(prompt, str) or not 1 <= len(prompt) <= 600:
+        return {"error": "每行必须包含1-600字符的 prompt"}
+    if "size" in record and not is_valid_size(record["size"]):
+        return {"error": invalid_size_message(record["size"])}
+    return record
+
+async def iter_prompt_records(input_path: str) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    逐行读取 JSONL 提示词文件
+
+    文件的打开、读取和关闭都在线程中执行，每次读取约 BULK_READ_BYTES 字节的整行，
+    磁盘较慢时不阻塞事件循环。空行会被跳过。
+
+    Args:
+        input_path: JSONL 文件路径
+
+    Yields:
+        (行号, 记录) 元组；无法解析的行返回包含 error 字段的记录
+    """
+    f = await asyncio.to_thread(open, input_path, "r", encoding="utf-8")
+    try:
+        line_no = 0
+        while True:
+            lines = await asyncio.to_thread(f.readlines, BULK_READ_BYTES)
+            if not lines:
+                break
+            for line in lines:
+                line_no += 1
+                record = parse_prompt_line(line)
+                if record is not None:
+                    yield line_no, record
+    finally:
+        await asyncio.to_thread(f.close)
+
+def _write_lines(out, lines: List[str]) -> None:
+    out.write("".join(lines))
+    out.flush()
+
+def _write_and_close(out, lines: List[str]) -> None:
+    try:
+        out.write("".join(lines))
+    finally:
+        out.close()
+
+async def run_bulk_generation(
+    input_path: str,
+    output_path: str,
+    size: str,
+    response_format: str,
+    download_dir: Optional[str],
+    optimize_prompt: bool,
+    latency_tier: str,
+    max_in_flight: int,
+    model: Optional[ModelSpec] = None,
+    guidance_scale: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    流式执行 JSONL 批量生成任务
+
+    提示词由生成器逐行读取，同时最多 max_in_flight 个提示词在处理中，
+    完成的结果累积到 BULK_WRITE_BATCH 条或等待超过 BULK_FLUSH_INTERVAL 秒后，
+    在线程中批量写入输出 JSONL，因此内存占用与任务规模无关，文件读写也不阻塞事件循环。
+    请求以 background 优先级调度，不影响交互式和普通批量请求。
+
+    Args:
+        input_path: 输入 JSONL 文件路径
+        output_path: 输出 JSONL 文件路径
+        size: 默认图像尺寸
+        response_format: 返回格式
+        download_dir: 下载目录
+        optimize_prompt: 是否优化提示词
+        latency_tier: 延迟档位，每条提示词各自使用该档位的时限
+        max_in_flight: 同时处理的提示词上限
+        model: 使用的模型，默认使用注册表的默认模型
+        guidance_scale: 文本权重（模型不支持时忽略）
+        seed: 随机数种子（模型不支持时忽略）
+
+    Returns:
+        任务汇总信息
+    """
+    if not await asyncio.to_thread(os.path.isfile, input_path):
+        raise MCPError(
+            message=f"输入文件不存在: {input_path}",
+            suggestion="请提供每行一个提示词的 JSONL 文件路径，例如 ./prompts.jsonl"
+        )
+    # 输出文件以写模式打开时会被清空，与输入文件相同时会在读取前丢失全部提示词
+    if os.path.realpath(output_path) == os.path.realpath(input_path):
+        raise MCPError(
+            message=f"输出文件与输入文件相同: {output_path}",
+            suggestion="请为 output_path 指定其他路径，或省略以使用默认的'<输入文件名>.results.jsonl'"
+        )
+
+    total_prompts = 0
+    invalid_lines = 0
+    # 只保留汇总计数，不保留逐条记录
+    model = model or model_registry.default
+    totals = GenerationResult(model_used=model.model_id)
+    start_time = datetime.datetime.now()
+
+    async def process(line_no: int, record: Dict[str, Any]) -> Tuple[ImageRecord, Any]:
+        image = await generate_group_item(
+            line_no,
+            record["prompt"],
+            record.get("size", size),
+            response_format,
+            download_dir,
+            optimize_prompt,
+            priority="background",
+            latency_tier=latency_tier,
+            deadline=Deadline.for_tier(latency_tier),
+            model=model,
+            guidance_scale=guidance_scale,
+            seed=seed
+        )
+        return image, record.get("id")
+
+    lines: List[str] = []
+    last_flush = time.monotonic()
+    writing: Optional["asyncio.Future[None]"] = None
+    # 完成任务时的写入和定时写入可能同时发生，同一时间只允许一个线程写文件
+    write_lock = asyncio.Lock()
+
+    def add_result(image: ImageRecord, record_id: Any) -> None:
+        result = image.to_dict()
+        result["line"] = result.pop("index")
+        if record_id is not None:
+            result["id"] = record_id
+        lines.append(json.dumps(result, ensure_ascii=False) + "\n")
+        totals.add(image, keep=False)
+
+    async def flush(out, force: bool = False) -> None:
+        # 批量写入累积的结果，写入和 flush 都在线程中执行
+        nonlocal last_flush, writing
+        async with write_lock:
+            if not lines:
+                return
+            if force or len(lines) >= BULK_WRITE_BATCH or time.monotonic() - last_flush >= BULK_FLUSH_INTERVAL:
+                batch = lines[:]
+                lines.clear()
+                last_flush = time.monotonic()
+                writing = asyncio.ensure_future(asyncio.to_thread(_write_lines, out, batch))
+                await asyncio.shield(writing)
+
+    async def flush_periodically(out) -> None:
+        # 生成较慢、长时间没有任务完成时，已累积的结果也按 BULK_FLUSH_INTERVAL 写入
+        while True:
+            await asyncio.sleep(BULK_FLUSH_INTERVAL)
+            await flush(out)
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    await asyncio.to_thread(os.makedirs, output_dir, exist_ok=True)
+    out = await asyncio.to_thread(open, output_path, "w", encoding="utf-8")
+    flusher = asyncio.ensure_future(flush_periodically(out))
+    try:
+        pending: Set["asyncio.Task[Tuple[ImageRecord, Any]]"] = set()
+
+        async def drain(limit: int) -> None:
+            # 等待处理中的任务降到 limit 以下，完成的结果按批写入
+            nonlocal pending
+            while len(pending) > limit:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    add_result(*task.result())
+                await flush(out)
+
+        try:
+            async for line_no, record in iter_prompt_records(input_path):
+                total_prompts += 1
+                if "error" in record:
+                    invalid_lines += 1
+                    lines.append(json.dumps({"line": line_no, "error": record["error"], "success": False}, ensure_ascii=False) + "\n")
+                    continue
+                pending.add(asyncio.ensure_future(process(line_no, record)))
+                await drain(max_in_flight - 1)
+            await drain(0)
+        finally:
+            # 出错或被取消时不再处理剩余提示词：取消处理中的任务并等待它们退出，
+            # 保证返回前调度槽位已归还、未完成的下载临时文件已删除
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                # 取消前已经完成的提示词照常写入结果，不浪费已消耗的 token
+                for task in pending:
+                    if not task.cancelled() and task.exception() is None:
+                        add_result(*task.result())
+    finally:
+        flusher.cancel()
+        await asyncio.wait([flusher])
+        if writing is not None and not writing.done():
+            # 被取消时上一批可能仍在写入，等它写完，避免两个线程同时写同一个文件
+            await asyncio.wait([writing])
+        # 剩余结果的写入和文件关闭在同一个线程调用中完成；被再次取消时线程仍会写完
+        await asyncio.shield(asyncio.to_thread(_write_and_close, out, lines[:]))
+
+    return {
+        "total_prompts": total_prompts,
+        "successful_images": totals.successful_images,
+        "failed_images": total_prompts - totals.successful_images,
+        "invalid_lines": invalid_lines,
+        "downloaded_images": totals.downloaded_images,
+        "token_usage": totals.total_token_usage,
+        "success": total_prompts > 0,
+        "message": (
+            f"已处理 {total_prompts} 条提示词，成功 {totals.successful_images} 条，"
+            f"结果已写入 {os.path.abspath(output_path)}"
+        ),
+        "output_path": os.path.abspath(output_path),
+        "processing_time_ms": int((datetime.datetime.now() - start_time).total_seconds() * 1000)
+    }
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 各延迟档位的默认端到端时限（毫秒）和对应的提示词优化模式
+LATENCY_TIERS: Dict[str, Dict[str, object]] = {
+    "fast": {
+        "deadline_ms": int(os.getenv("FAST_TIER_DEADLINE_MS", "30000")),
+        "optimize_mode": "fast"
+    },
+    "standard": {
+        "deadline_ms": int(os.getenv("STANDARD_TIER_DEADLINE_MS", "120000")),
+        "optimize_mode": "standard"
+    }
+}
+
+class Deadline:
+    """
+    一次工具调用的端到端截止时间
+
+    同一个 Deadline 贯穿排队、API 请求、重试和图片下载，
+    每一步只能使用剩余的时间，因此整个调用的耗时有明确上限。
+    """
+
+    def __init__(self, budget_ms: int) -> None:
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000.0
+
+    @classmethod
+    def for_tier(cls, latency_tier: str, deadline_ms: Optional[int] = None) -> "Deadline":
+        """
+        根据延迟档位创建截止时间
+
+        Args:
+            latency_tier: 延迟档位，fast 或 standard
+            deadline_ms: 显式指定的时限（毫秒），缺省使用档位默认值
+
+        Returns:
+            Deadline 实例
+        """
+        if deadline_ms is None:
+            deadline_ms = LATENCY_TIERS[latency_tier]["deadline_ms"]
+        return cls(deadline_ms)
+
+    def remaining(self) -> float:
+        """剩余时间（秒），已过期时为 0"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """是否已过期"""
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float) -> float:
+        """单个步骤的超时时间：不超过 cap，也不超过剩余时间"""
+        return min(cap, self.remaining())
+
+    async def run(self, awaitable: Awaitable[T], stage: str) -> T:
+        """
+        在剩余时间内执行一个步骤，超时则取消该步骤
+
+        Args:
+            awaitable: 要执行的协程
+            stage: 步骤名称，用于错误消息
+
+        Returns:
+            步骤的返回值
+
+        Raises:
+            MCPError: 截止时间已到时；步骤自身抛出的 TimeoutError 原样抛出
+        """
+        from .errors import handle_deadline_error
+        # 由本方法的定时器取消步骤时才视为超过截止时间，
+        # 步骤内部的 TimeoutError（例如 httpx 的读超时）与 Python 3.11 起的 asyncio.TimeoutError 是同一个类型
+        task = asyncio.ensure_future(awaitable)
+        timed_out = False
+
+        def on_deadline() -> None:
+            nonlocal timed_out
+            timed_out = True
+            task.cancel()
+
+        handle = asyncio.get_running_loop().call_later(self.remaining(), on_deadline)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if timed_out:
+                raise handle_deadline_error(stage, self.budget_ms) from None
+            raise
+        finally:
+            handle.cancel()
+
+def optimize_mode_for_tier(latency_tier: str) -> str:
+    """延迟档位对应的 optimize_prompt_options.mode"""
+    return LATENCY_TIERS[latency_tier]["optimize_mode"]
@@ -0,0 +1,298 @@
+import asyncio
+import math
+import os
+import time
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+import httpx
+
+from .stats import LatencyTracker
+
+if TYPE_CHECKING:
+    from .storage import ImageWriter
+
+# 下载配置
+# 超过该大小（字节）且服务端支持 Range 时，拆分为多个分段并行下载
+RANGED_DOWNLOAD_THRESHOLD = int(os.getenv("RANGED_DOWNLOAD_THRESHOLD", str(4 * 1024 * 1024)))
+# 并行分段数
+RANGED_DOWNLOAD_PARTS = int(os.getenv("RANGED_DOWNLOAD_PARTS", "4"))
+# 是否启用对冲请求
+HEDGED_DOWNLOADS = os.getenv("HEDGED_DOWNLOADS", "true").lower() in ("1", "true", "yes")
+# 首字节耗时超过该分位数时发出对冲请求
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# 流式读取的块大小
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# 写入文件前在内存中累积的字节数，达到后在线程中一次写入
+DOWNLOAD_WRITE_BUFFER = 1024 * 1024
+
+# 下载请求的首字节耗时，用于学习对冲阈值
+ttfb_tracker = LatencyTracker()
+
+def hedge_delay() -> Optional[float]:
+    """
+    对冲请求的触发延迟
+
+    Returns:
+        首字节耗时的 HEDGE_PERCENTILE 分位数（秒），未启用或样本不足时返回 None
+    """
+    if not HEDGED_DOWNLOADS:
+        return None
+    return ttfb_tracker.percentile(HEDGE_PERCENTILE)
+
+def _close_when_done(task: "asyncio.Task[httpx.Response]") -> None:
+    """被放弃的请求如果之后仍然返回了响应，关闭它以释放连接"""
+    def close(t: "asyncio.Task[httpx.Response]") -> None:
+        if not t.cancelled() and t.exception() is None:
+            asyncio.ensure_future(t.result().aclose())
+    task.add_done_callback(close)
+
+async def send_hedged(
+    client: httpx.AsyncClient,
+    build_request: Callable[[], httpx.Request]
+) -> httpx.Response:
+    """
+    发送流式请求，首字节过慢时发出对冲请求
+
+    第一个请求等待超过学习到的首字节耗时分位数仍未返回响应头时，
+    再发出一个相同的请求，采用先返回的响应并取消另一个。
+
+    Args:
+        client: HTTP 客户端
+        build_request: 构建请求的函数（每次调用返回新的请求）
+
+    Returns:
+        已收到响应头、尚未读取响应体的流式响应，调用方负责关闭
+    """
+    started = time.monotonic()
+    primary = asyncio.ensure_future(client.send(build_request(), stream=True, follow_redirects=True))
+    delay = hedge_delay()
+    tasks = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                # 第一个请求卡在慢节点上，发出对冲请求
+                tasks.add(asyncio.ensure_future(client.send(build_request(), stream=True, follow_redirects=True)))
+
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    ttfb_tracker.record(time.monotonic() - started)
+                    for other in done - {task}:
+                        if other.exception() is None:
+                            await other.result().aclose()
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+            _close_when_done(task)
+
+def _create_file(file_path: str, size: int) -> None:
+    """创建（或清空）文件，size 大于 0 时预分配到该大小"""
+    with open(file_path, "wb") as f:
+        if size:
+            f.truncate(size)
+
+async def _write_stream(response: httpx.Response, file_path: str, offset: int, limit: Optional[int]) -> int:
+    """
+    把响应体写入文件的指定位置，最多写入 limit 字节，返回写入的字节数
+
+    文件的打开、写入和关闭都在线程中执行，响应体在内存中累积到 DOWNLOAD_WRITE_BUFFER 后再写入，
+    磁盘较慢时不会阻塞事件循环上的其他工具调用。
+    """
+    written = 0
+    buffer: List[bytes] = []
+    buffered = 0
+    f = await asyncio.to_thread(open, file_path, "r+b")
+    try:
+        f.seek(offset)
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            if limit is not None and written + len(chunk) > limit:
+                chunk = chunk[:limit - written]
+            buffer.append(chunk)
+            buffered += len(chunk)
+            written += len(chunk)
+            if buffered >= DOWNLOAD_WRITE_BUFFER:
+                await asyncio.to_thread(f.write, b"".join(buffer))
+                buffer.clear()
+                buffered = 0
+            if limit is not None and written >= limit:
+                break
+        if buffer:
+            await asyncio.to_thread(f.write, b"".join(buffer))
+    finally:
+        await asyncio.to_thread(f.close)
+    return written
+
+async def _fetch_range(
+    client: httpx.AsyncClient,
+    url: str,
+    file_path: str,
+    start: int,
+    end: int,
+    timeout: float
+) -> None:
+    """下载 [start, end] 字节区间并写入文件对应位置"""
+    response = await send_hedged(
+        client,
+        lambda: client.build_request(
+            "GET", url,
+            headers={"Range": f"bytes={start}-{end}"},
+            timeout=timeout
+        )
+    )
+    try:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise httpx.HTTPError(f"服务端未按 Range 返回分段: HTTP {response.status_code}")
+        written = await _write_stream(response, file_path, start, end - start + 1)
+        if written != end - start + 1:
+            raise httpx.HTTPError(f"分段 {start}-{end} 不完整: {written} 字节")
+    finally:
+        await response.aclose()
+
+async def fetch_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    file_path: str,
+    timeout: float
+) -> int:
+    """
+    下载 URL 内容到文件
+
+    先发出普通 GET 请求（必要时对冲）。如果响应头表明文件较大且支持 Range，
+    则只从该响应读取第一个分段，其余分段并行请求，按偏移写入预分配的文件；
+    否则按顺序流式写入。内容先写入临时文件，完成后再原子替换为目标文件，
+    失败或取消时删除临时文件。
+
+    Args:
+        client: HTTP 客户端
+        url: 下载地址
+        file_path: 目标文件路径
+        timeout: 单个 HTTP 请求的超时时间（秒）
+
+    Returns:
+        写入的字节数
+    """
+    tmp_path = f"{file_path}.part"
+    response = await send_hedged(
+        client,
+        lambda: client.build_request("GET", url, timeout=timeout)
+    )
+    try:
+        try:
+            response.raise_for_status()
+            size = int(response.headers.get("Content-Length", "0") or 0)
+            ranged = (
+                RANGED_DOWNLOAD_PARTS > 1
+                and size >= RANGED_DOWNLOAD_THRESHOLD
+                and response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                and not response.headers.get("Content-Encoding")
+            )
+
+            # 预分配文件，各分段可以直接写入各自的偏移
+            await asyncio.to_thread(_create_file, tmp_path, size if ranged else 0)
+
+            if ranged:
+                part_size = math.ceil(size / RANGED_DOWNLOAD_PARTS)
+                ranges = [
+                    (start, min(start + part_size, size) - 1)
+                    for start in range(part_size, size, part_size)
+                ]
+                # 第一个分段复用已经建立的响应，其余分段并行下载
+                parts = [asyncio.ensure_future(_write_stream(response, tmp_path, 0, part_size))]
+                parts += [
+                    asyncio.ensure_future(_fetch_range(client, url, tmp_path, start, end, timeout))
+                    for start, end in ranges
+                ]
+                try:
+                    written, *_ = await asyncio.gather(*parts)
+                except BaseException:
+                    # 任一分段失败时停止其余分段
+                    for part in parts:
+                        part.cancel()
+                    await asyncio.gather(*parts, return_exceptions=True)
+                    raise
+                if written != part_size:
+                    raise httpx.HTTPError(f"分段 0-{part_size - 1} 不完整: {written} 字节")
+                written = size
+            else:
+                written = await _write_stream(response, tmp_path, 0, None)
+        finally:
+            await response.aclose()
+
+        await asyncio.to_thread(os.replace, tmp_path, file_path)
+        return written
+    except BaseException:
+        # 失败或被取消时不留下不完整的文件；在事件循环上同步删除，
+        # 保证调用方再次取消时临时文件也已在返回前删除
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+async def fetch_to_writer(
+    client: httpx.AsyncClient,
+    url: str,
+    writer: "ImageWriter",
+    timeout: float
+) -> str:
+    """
+    下载 URL 内容并边下载边写入存储后端，不经过本地磁盘
+
+    按顺序流式读取响应体（首字节过慢时同样对冲），每个数据块直接交给 writer，
+    全部写完后提交；失败或取消时放弃写入，清理已写入的部分。
+
+    Args:
+        client: HTTP 客户端
+        url: 下载地址
+        writer: 存储后端的写入器
+        timeout: 单个 HTTP 请求的超时时间（秒）
+
+    Returns:
+        writer 提交后返回的图片位置
+    """
+    response = await send_hedged(
+        client,
+        lambda: client.build_request("GET", url, timeout=timeout)
+    )
+    try:
+        try:
+            response.raise_for_status()
+            writer.content_type = response.headers.get("Content-Type")
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                await writer.write(chunk)
+        finally:
+            await response.aclose()
+        return await writer.commit()
+    except BaseException:
+        # 清理需要网络请求，放在独立任务中，调用方再次取消时也能完成
+        await asyncio.shield(asyncio.ensure_future(writer.abort()))
+        raise
+
+async def fetch_bytes(client: httpx.AsyncClient, url: str, timeout: float) -> bytes:
+    """
+    下载 URL 内容到内存（首字节过慢时同样对冲），用于需要在本地处理的图片
+
+    Args:
+        client: HTTP 客户端
+        url: 下载地址
+        timeout: 单个 HTTP 请求的超时时间（秒）
+
+    Returns:
+        响应内容
+    """
+    response = await send_hedged(
+        client,
+        lambda: client.build_request("GET", url, timeout=timeout)
+    )
+    try:
+        response.raise_for_status()
+        return await response.aread()
+    finally:
+        await response.aclose()
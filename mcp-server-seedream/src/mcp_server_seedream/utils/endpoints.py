@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from .stats import EwmaStats
+
+# 端点配置
+# API 基础 URL
+API_BASE_URL = os.getenv("API_BASE_URL", "https://api.seedream.ai")
+# 多个区域网关的基础 URL，逗号分隔；配置后代替 API_BASE_URL
+API_BASE_URLS = os.getenv("API_BASE_URLS", "")
+# 某个端点超过该时间（秒）没有请求时，下一个请求作为探测发往该端点
+ENDPOINT_PROBE_INTERVAL = float(os.getenv("ENDPOINT_PROBE_INTERVAL", "30"))
+# 错误率超过该值的端点只接收探测请求，不再分配正常流量
+ENDPOINT_MAX_ERROR_RATE = float(os.getenv("ENDPOINT_MAX_ERROR_RATE", "0.5"))
+# 端点延迟和错误率的指数加权系数
+ENDPOINT_EWMA_ALPHA = float(os.getenv("ENDPOINT_EWMA_ALPHA", "0.2"))
+
+# 重复发送不会产生额外副作用的 HTTP 方法
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+def is_failover_error(error: Exception, method: str) -> bool:
+    """
+    判断请求失败后能否换用其他端点重试
+
+    连接失败时请求没有到达服务端，503 表示服务端拒绝处理该请求，换端点重试不会重复生成。
+    其他 5xx（例如 502、504）可能发生在上游已经接受并计费之后，
+    只有幂等方法才换端点重试，生成图像的 POST 直接报错；
+    读取超时时服务端可能已在处理，同样不重试。
+
+    Args:
+        error: 请求抛出的异常
+        method: 请求的 HTTP 方法
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 503 or (status >= 500 and method.upper() in _IDEMPOTENT_METHODS)
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+class Endpoint:
+    """一个 API 网关端点及其延迟、错误率和进行中请求数"""
+
+    def __init__(self, base_url: str, alpha: float = ENDPOINT_EWMA_ALPHA) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.stats = EwmaStats(alpha=alpha)
+        self.in_flight = 0
+        self.last_seen = 0.0
+        self.requests = 0
+        self.failovers = 0
+
+    def url(self, path: str) -> str:
+        """拼接请求 URL"""
+        return f"{self.base_url}/{path}"
+
+    def cost(self, baseline: float) -> float:
+        """
+        路由代价：期望耗时（延迟 / 成功率）×（进行中请求数 + 1）
+
+        Args:
+            baseline: 还没有成功请求的端点使用的延迟（各端点实测延迟的最小值）
+        """
+        latency = self.stats.latency or baseline
+        return latency / max(1.0 - self.stats.error_rate, 0.05) * (self.in_flight + 1)
+
+class EndpointRouter:
+    """
+    多端点路由
+
+    每个请求发往路由代价最低的端点，代价同时考虑按指数加权统计的延迟、错误率和当前负载：
+
+    - 没有实测数据的端点代价为 0，启动后每个端点都会先收到请求
+    - 错误率超过 ENDPOINT_MAX_ERROR_RATE 的端点不再分配正常流量（所有端点都超过时除外）
+    - 超过 ENDPOINT_PROBE_INTERVAL 秒没有请求的端点，下一个请求作为探测发往该端点，
+      使其统计数据保持最新，恢复正常的端点可以重新分到流量
+    - 连接失败、503（以及幂等请求的其他 5xx）立即换用其他端点重试，端点的错误率随之上升，后续流量自动转移
+    """
+
+    def __init__(self, base_urls: Sequence[str], probe_interval: float = ENDPOINT_PROBE_INTERVAL) -> None:
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(base_urls)]
+        self.probe_interval = probe_interval
+        # 同步客户端在后台线程的事件循环中发请求，统计数据跨线程共享
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "EndpointRouter":
+        """按 API_BASE_URLS（或 API_BASE_URL）创建路由"""
+        urls = [url.strip() for url in API_BASE_URLS.split(",") if url.strip()]
+        return cls(urls or [API_BASE_URL])
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        """
+        为一次请求选择端点
+
+        Args:
+            exclude: 本次请求已经失败过的端点
+
+        Returns:
+            选中的端点，使用完毕后必须调用 release()；没有其他端点可用时返回 None
+        """
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            stale = [
+                endpoint for endpoint in candidates
+                if endpoint.in_flight == 0 and now - endpoint.last_seen >= self.probe_interval
+            ]
+            healthy = [
+                endpoint for endpoint in candidates
+                if endpoint.stats.error_rate <= ENDPOINT_MAX_ERROR_RATE
+            ] or candidates
+            baseline = min(
+                (endpoint.stats.latency for endpoint in self.endpoints if endpoint.stats.latency > 0),
+                default=0.0
+            )
+            endpoint = stale[0] if stale else min(healthy, key=lambda endpoint: endpoint.cost(baseline))
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            endpoint.last_seen = now
+            return endpoint
+
+    def record(self, endpoint: Endpoint, seconds: Optional[float], ok: bool, failover: bool = False) -> None:
+        """
+        记录一次请求结果
+
+        Args:
+            endpoint: 请求发往的端点
+            seconds: 请求耗时（秒），失败时为 None
+            ok: 端点是否正常响应（客户端 4xx 也算正常）
+            failover: 是否换用其他端点重试
+        """
+        with self._lock:
+            endpoint.stats.record(seconds, ok)
+            endpoint.last_seen = time.monotonic()
+            if failover:
+                endpoint.failovers += 1
+
+    def release(self, endpoint: Endpoint) -> None:
+        """请求结束，减少端点的进行中请求数"""
+        with self._lock:
+            endpoint.in_flight -= 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        各端点的当前状态
+
+        Returns:
+            每个端点一项，包含基础 URL、延迟、错误率、进行中请求数、累计请求数和故障转移次数
+        """
+        with self._lock:
+            return [
+                {
+                    "base_url": endpoint.base_url,
+                    "latency_ms": int(endpoint.stats.latency * 1000),
+                    "error_rate": round(endpoint.stats.error_rate, 3),
+                    "in_flight": endpoint.in_flight,
+                    "requests": endpoint.requests,
+                    "failovers": endpoint.failovers
+                }
+                for endpoint in self.endpoints
+            ]
+
+# 进程级共享实例
+endpoint_router = EndpointRouter.from_env()
@@ -104,6 +104,10 @@ def handle_download_error(error_type: str, message: str) -> MCPError:
         "PERMISSION_ERROR": {
             "message": f"权限不足: {message}",
             "suggestion": "请确保对下载目录有写入权限"
+        },
+        "STORAGE_ERROR": {
+            "message": f"图片存储失败: {message}",
+            "suggestion": "请检查 SEEDREAM_STORAGE 和 SEEDREAM_S3_* 配置、存储桶权限及网络连接"
         }
     }
     
@@ -116,4 +120,21 @@ def handle_download_error(error_type: str, message: str) -> MCPError:
         message=error_info["message"],
         suggestion=error_info["suggestion"],
         error_code=error_type
-    )
\ No newline at end of file
+    )
+
+def handle_deadline_error(stage: str, budget_ms: int) -> MCPError:
+    """
+    处理端到端截止时间超时并转换为MCPError
+
+    Args:
+        stage: 超时发生的步骤（如 API请求、图片下载）
+        budget_ms: 本次调用的总时限（毫秒）
+
+    Returns:
+        格式化的MCPError
+    """
+    return MCPError(
+        message=f"{stage}超时: 未能在 {budget_ms} ms 的时限内完成",
+        suggestion="请增大 deadline_ms，或使用 latency_tier='fast' 缩短生成耗时",
+        error_code="DEADLINE_EXCEEDED"
+    )
@@ -1,8 +1,10 @@
 import json
 import os
-from typing import Any, Dict, Literal
+from typing import Any, Dict, List, Literal
 import datetime
 
+from .records import GenerationResult, ImageRecord
+
 CHARACTER_LIMIT = 25000 * 4  # ~25k tokens
 DEFAULT_DOWNLOAD_DIR = os.getenv("DEFAULT_DOWNLOAD_DIR", "./generated_images")
 
@@ -22,6 +24,9 @@ def format_response(
     Returns:
         格式化后的字符串
     """
+    if isinstance(data, GenerationResult):
+        return render_generation_result(data, format, detail)
+
     if format == "json":
         if detail == "concise":
             # 返回精简的 JSON
@@ -41,9 +46,213 @@ def format_response(
 
     return result
 
+def render_generation_result(
+    result: GenerationResult,
+    format: Literal["json", "markdown"] = "json",
+    detail: Literal["concise", "detailed"] = "concise"
+) -> str:
+    """
+    渲染图像生成结果
+
+    汇总值直接读取 GenerationResult 中增量维护的计数，不再重新扫描图像列表。
+
+    Args:
+        result: 生成结果
+        format: 输出格式（json 或 markdown）
+        detail: 详细级别（concise 或 detailed）
+
+    Returns:
+        格式化后的字符串
+    """
+    if format == "json":
+        if detail == "concise":
+            text = json.dumps(concise_result_data(result), indent=2, ensure_ascii=False)
+        else:
+            text = json.dumps(result.to_dict(), indent=2, ensure_ascii=False)
+    elif detail == "concise":
+        text = markdown_result_concise(result)
+    else:
+        text = markdown_result_detailed(result)
+
+    if len(text) > CHARACTER_LIMIT:
+        text = truncate_response(text, CHARACTER_LIMIT)
+    return text
+
+def concise_result_data(result: GenerationResult) -> Dict[str, Any]:
+    """提取生成结果的精简数据"""
+    if not result.is_group:
+        image = result.first
+        data = {
+            "success": image.success,
+            "token_usage": image.token_usage
+        }
+        if image.downloaded and image.local_path:
+            data["downloaded"] = True
+            data["local_path"] = image.local_path
+        else:
+            data["image_url"] = image.image_url
+            if image.resource_uri:
+                data["resource_uri"] = image.resource_uri
+        return data
+
+    data = {
+        "success": True,
+        "total_images": len(result.images),
+        "token_usage": result.total_token_usage
+    }
+    if result.downloaded_images:
+        data["downloaded_images"] = result.downloaded_images
+        data["downloaded_paths"] = [image.local_path for image in result.images if image.downloaded]
+    else:
+        data["image_urls"] = [image.image_url for image in result.images]
+    resource_uris = [image.resource_uri for image in result.images if image.resource_uri]
+    if resource_uris:
+        data["resource_uris"] = resource_uris
+    return data
+
+def _image_lines(image: ImageRecord, bold: bool) -> List[str]:
+    """单张图像的 Markdown 行（地址部分）"""
+    def label(name: str) -> str:
+        return f"**{name}**" if bold else name
+
+    if not image.success:
+        return [f"❌ {label('生成失败')}: {image.error}"]
+    if image.downloaded and image.local_path:
+        return [
+            "✅ **已成功下载到本地**" if bold else "✅ 已成功下载到本地",
+            f"- {label('本地路径')}: {image.local_path}",
+        ] + ([f"- {label('原始URL')}: {image.image_url}"] if image.image_url else [])
+    lines = [f"- {label('URL')}: {image.image_url}"]
+    if image.resource_uri:
+        lines.append(f"- {label('资源')}: {image.resource_uri}（首次读取时下载）")
+    if image.download_error:
+        lines.append(f"- {label('下载失败')}: {image.download_error}")
+    return lines
+
+def markdown_result_concise(result: GenerationResult) -> str:
+    """把生成结果格式化为精简 Markdown"""
+    lines = ["# 图像生成结果", ""]
+    if not result.is_group:
+        image = result.first
+        if image.downloaded and image.local_path:
+            lines.append("## 图像已下载到本地")
+            lines.append(f"✅ 本地路径: {image.local_path}")
+            if image.image_url:
+                lines.append(f"- 原始URL: {image.image_url}")
+        else:
+            lines.append("## 图像 URL")
+            lines.append(str(image.image_url))
+            if image.resource_uri:
+                lines.append(f"- 资源: {image.resource_uri}（首次读取时下载）")
+        return "\n".join(lines)
+
+    lines.append(f"## 生成了 {len(result.images)} 张图像")
+    for i, image in enumerate(result.images[:3]):  # 只显示前3张
+        lines.append(f"### 图像 {i+1}")
+        lines.extend(_image_lines(image, bold=False))
+    if len(result.images) > 3:
+        lines.append(f"\n... 还有 {len(result.images) - 3} 张图像")
+    return "\n".join(lines)
+
+def markdown_result_detailed(result: GenerationResult) -> str:
+    """把生成结果格式化为详细 Markdown"""
+    lines = ["# 图像生成详细结果", ""]
+    if not result.is_group:
+        image = result.first
+        lines.append("## 图像信息")
+        lines.extend(_image_lines(image, bold=True))
+        lines.append(f"- **尺寸**: {image.image_size}")
+        lines.append(f"- **水印**: {'是' if image.watermark else '否'}")
+        lines.append(f"- **Token 用量**: {image.token_usage}")
+        lines.append(f"- **创建时间**: {result.created_at}")
+        lines.append(f"- **使用模型**: {result.model_used}")
+        lines.append(f"- **处理时间**: {result.processing_time_ms} ms")
+        return "\n".join(lines)
+
+    lines.append("## 总体信息")
+    lines.append(f"- **生成图像总数**: {len(result.images)}")
+    lines.append(f"- **成功图像数**: {result.successful_images}")
+    lines.append(f"- **Token 用量**: {result.total_token_usage}")
+    lines.append(f"- **创建时间**: {result.created_at}")
+    lines.append(f"- **使用模型**: {result.model_used}")
+    if result.downloaded_images:
+        lines.append(f"- **已下载图像**: {result.downloaded_images}")
+    if result.deadline_exceeded:
+        lines.append("- **部分图像超出时限**: 是")
+
+    lines.append("\n## 图像详情")
+    for i, image in enumerate(result.images):
+        lines.append(f"### 图像 {i+1}")
+        lines.extend(_image_lines(image, bold=True))
+        if image.success:
+            lines.append(f"- **尺寸**: {image.image_size}")
+            lines.append(f"- **水印**: {'是' if image.watermark else '否'}")
+    return "\n".join(lines)
+
+def render_gallery_matches(
+    matches: List[Dict[str, Any]],
+    format: Literal["json", "markdown"] = "json",
+    detail: Literal["concise", "detailed"] = "concise"
+) -> str:
+    """
+    渲染图库查询结果
+
+    Args:
+        matches: Gallery.find() 返回的记录列表
+        format: 输出格式（json 或 markdown）
+        detail: 详细级别，concise 只包含复用图像需要的字段
+
+    Returns:
+        格式化后的字符串
+    """
+    if format == "json":
+        if detail == "concise":
+            images = []
+            for item in matches:
+                image = {"id": item["id"], "prompt": item["prompt"], "size": item["size"]}
+                if item["file_exists"]:
+                    image["local_path"] = item["local_path"]
+                else:
+                    image["image_url"] = item["image_url"]
+                    image["resource_uri"] = item["resource_uri"]
+                image["created_at"] = item["created_at"]
+                images.append(image)
+        else:
+            images = matches
+        text = json.dumps({"total": len(matches), "images": images}, indent=2, ensure_ascii=False)
+    else:
+        lines = ["# 已生成的图像", ""]
+        if not matches:
+            lines.append("没有找到匹配的图像")
+        for item in matches:
+            lines.append(f"### #{item['id']} {item['prompt'][:80]}")
+            if item["file_exists"]:
+                lines.append(f"- 本地路径: {item['local_path']}")
+            elif item["local_path"]:
+                lines.append(f"- 本地路径: {item['local_path']}（文件已不存在）")
+            if item["image_url"] and (detail == "detailed" or not item["file_exists"]):
+                lines.append(f"- URL: {item['image_url']}")
+            if not item["file_exists"]:
+                lines.append(f"- 资源: {item['resource_uri']}")
+            lines.append(f"- 尺寸: {item['size']}")
+            if detail == "detailed":
+                lines.append(f"- 模型: {item['model']}")
+                lines.append(f"- Token 用量: {item['token_usage']}")
+                if item["digest"]:
+                    lines.append(f"- SHA-256: {item['digest']}")
+            lines.append(f"- 生成时间: {item['created_at']}")
+        text = "\n".join(lines)
+
+    if len(text) > CHARACTER_LIMIT:
+        text = truncate_response(text, CHARACTER_LIMIT)
+    return text
+
 def downloadImage(image_url: str, download_dir: str = DEFAULT_DOWNLOAD_DIR) -> Dict[str, Any]:
     """
-    下载图片并返回下载信息
+    下载图片并返回下载信息（同步接口）
+
+    下载在默认 SeedreamClient 的后台事件循环中执行，因此可以从任意线程调用，
+    包括正在运行事件循环的线程；新代码建议直接使用 SeedreamClient。
     
     Args:
         image_url: 图片URL
@@ -52,24 +261,10 @@ def downloadImage(image_url: str, download_dir: str = DEFAULT_DOWNLOAD_DIR) -> D
     Returns:
         包含下载状态的字典
     """
-    import asyncio
-    from .api_client import download_image
-    
-    # 使用事件循环执行异步下载
+    from .sync_client import get_default_client
+
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果事件循环正在运行，使用run_coroutine_threadsafe
-            future = asyncio.run_coroutine_threadsafe(
-                download_image(image_url, download_dir), loop
-            )
-            local_path = future.result()
-        else:
-            # 否则直接运行协程
-            local_path = loop.run_until_complete(
-                download_image(image_url, download_dir)
-            )
-        
+        local_path = get_default_client().download(image_url, download_dir)
         return {
             "downloaded": True,
             "local_path": local_path,
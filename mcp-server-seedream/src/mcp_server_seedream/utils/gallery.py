@@ -0,0 +1,329 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .records import ImageRecord
+
+# 图库配置
+# 是否把每次生成记录到图库
+SEEDREAM_GALLERY = os.getenv("SEEDREAM_GALLERY", "true").lower() in ("1", "true", "yes")
+# 图库 SQLite 数据库路径（同一主机上的多个服务器进程可以共享）
+SEEDREAM_GALLERY_PATH = os.getenv("SEEDREAM_GALLERY_PATH", "./seedream_gallery.db")
+
+# trigram 分词按连续三个字符建立索引，中英文提示词都可以按子串检索；
+# 不足三个字符的关键词退化为 LIKE 匹配
+_MIN_FTS_TERM = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    size TEXT,
+    model TEXT,
+    token_usage INTEGER NOT NULL DEFAULT 0,
+    image_url TEXT,
+    local_path TEXT,
+    digest TEXT,
+    file_bytes INTEGER,
+    download_dir TEXT,
+    download_claimed_at REAL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_prompt ON images(prompt);
+CREATE INDEX IF NOT EXISTS images_digest ON images(digest);
+CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(
+    prompt, content='images', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS images_ai AFTER INSERT ON images BEGIN
+    INSERT INTO images_fts(rowid, prompt) VALUES (new.id, new.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS images_ad AFTER DELETE ON images BEGIN
+    INSERT INTO images_fts(images_fts, rowid, prompt) VALUES ('delete', old.id, old.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS images_au AFTER UPDATE OF prompt ON images BEGIN
+    INSERT INTO images_fts(images_fts, rowid, prompt) VALUES ('delete', old.id, old.prompt);
+    INSERT INTO images_fts(rowid, prompt) VALUES (new.id, new.prompt);
+END;
+"""
+
+_COLUMNS = (
+    "id", "prompt", "size", "model", "token_usage", "image_url",
+    "local_path", "digest", "file_bytes", "download_dir", "created_at", "updated_at"
+)
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds") + "Z"
+
+def file_digest(path: str) -> Optional[str]:
+    """计算文件的 SHA-256 摘要，文件无法读取时返回 None"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def image_resource_uri(image_id: int) -> str:
+    """图像的 MCP 资源 URI，首次读取时才下载图像"""
+    return f"seedream://images/{image_id}"
+
+def stored_file_exists(location: Optional[str]) -> bool:
+    """本地文件是否仍然存在；对象存储中的图片（s3:// 等 URI）不逐个检查，视为存在"""
+    if not location:
+        return False
+    return "://" in location or os.path.exists(location)
+
+class Gallery:
+    """
+    已生成图像的索引（内嵌 SQLite）
+
+    每次成功生成记录提示词、尺寸、模型、token 用量、URL、本地路径、文件摘要和时间，
+    提示词建立 FTS5 全文索引。查询已有图像只需要几毫秒，避免为相同的提示词重新生成。
+
+    数据库操作都在工作线程中执行，不阻塞事件循环；WAL 模式下多个进程可以同时读写。
+    记录失败（例如磁盘只读）不影响生成结果，只跳过本次记录。
+    """
+
+    def __init__(self, path: str = SEEDREAM_GALLERY_PATH, enabled: bool = SEEDREAM_GALLERY) -> None:
+        self.path = path
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            # 旧版本创建的数据库没有 download_dir / download_claimed_at 列
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(images)")}
+            if "download_dir" not in columns:
+                conn.execute("ALTER TABLE images ADD COLUMN download_dir TEXT")
+            if "download_claimed_at" not in columns:
+                conn.execute("ALTER TABLE images ADD COLUMN download_claimed_at REAL")
+            self._conn = conn
+        return self._conn
+
+    def _file_info(self, location: Optional[str]):
+        """本地文件的摘要和大小；对象存储中的图片不计算"""
+        digest = file_bytes = None
+        if location and "://" not in location:
+            digest = file_digest(location)
+            try:
+                file_bytes = os.path.getsize(location)
+            except OSError:
+                pass
+        return digest, file_bytes
+
+    def _insert(self, record: ImageRecord, model: str, download_dir: Optional[str]) -> int:
+        digest, file_bytes = self._file_info(record.local_path)
+        now = _now()
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT INTO images (prompt, size, model, token_usage, image_url, local_path, digest, file_bytes, "
+                "download_dir, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.prompt, record.image_size, model, record.token_usage, record.image_url,
+                    record.local_path, digest, file_bytes, download_dir, now, now
+                )
+            )
+            return cursor.lastrowid
+
+    async def add(self, record: ImageRecord, model: str, download_dir: Optional[str] = None) -> Optional[int]:
+        """
+        记录一张成功生成的图像
+
+        Args:
+            record: 图像记录，没有 URL 也没有本地文件（例如 b64_json）时不记录
+            model: 实际使用的模型ID
+            download_dir: 下载目录，延迟下载的图像在读取时下载到该目录
+
+        Returns:
+            图库中的记录ID，未启用、不需要记录或记录失败时返回 None
+        """
+        if not self.enabled or not record.success or not (record.image_url or record.local_path):
+            return None
+        try:
+            return await asyncio.to_thread(self._insert, record, model, download_dir)
+        except (sqlite3.Error, OSError):
+            return None
+
+    def _find(
+        self,
+        query: Optional[str],
+        prompt: Optional[str],
+        size: Optional[str],
+        model: Optional[str],
+        local_only: bool,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        conditions: List[str] = []
+        params: List[Any] = []
+        fts_terms: List[str] = []
+        for term in (query or "").split():
+            if len(term) >= _MIN_FTS_TERM:
+                fts_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                conditions.append("images.prompt LIKE ? ESCAPE '\\'")
+                params.append("%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if prompt is not None:
+            conditions.append("images.prompt = ?")
+            params.append(prompt)
+        if size:
+            conditions.append("images.size = ?")
+            params.append(size)
+        if model:
+            conditions.append("images.model = ?")
+            params.append(model)
+        if local_only:
+            conditions.append("images.local_path IS NOT NULL")
+
+        columns = ", ".join(f"images.{column}" for column in _COLUMNS)
+        if fts_terms:
+            sql = f"SELECT {columns} FROM images_fts JOIN images ON images.id = images_fts.rowid WHERE images_fts MATCH ?"
+            params.insert(0, " AND ".join(fts_terms))
+            order = "bm25(images_fts), images.id DESC"
+        else:
+            sql = f"SELECT {columns} FROM images WHERE 1 = 1"
+            order = "images.id DESC"
+        for condition in conditions:
+            sql += f" AND {condition}"
+
+        # 本地文件可能已被删除，逐条检查；需要过滤时多取一些候选
+        fetch = limit * 4 if local_only else limit
+        with self._lock:
+            rows = self._connection().execute(f"{sql} ORDER BY {order} LIMIT ?", (*params, fetch)).fetchall()
+        matches = []
+        for row in rows:
+            item = dict(row)
+            item["file_exists"] = stored_file_exists(item["local_path"])
+            item["resource_uri"] = image_resource_uri(item["id"])
+            if local_only and not item["file_exists"]:
+                continue
+            matches.append(item)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    async def find(
+        self,
+        query: Optional[str] = None,
+        prompt: Optional[str] = None,
+        size: Optional[str] = None,
+        model: Optional[str] = None,
+        local_only: bool = False,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        查询已生成的图像
+
+        Args:
+            query: 提示词关键词（空格分隔，全部匹配），按相关度排序
+            prompt: 完整提示词（精确匹配），用于判断是否已经生成过
+            size: 图像尺寸
+            model: 模型ID
+            local_only: 只返回本地文件仍然存在的图像
+            limit: 最多返回的记录数
+
+        Returns:
+            匹配的记录列表，每项额外包含 file_exists；没有关键词时按生成时间从新到旧排列，
+            未启用图库时返回空列表
+        """
+        if not self.enabled:
+            return []
+        return await asyncio.to_thread(self._find, query, prompt, size, model, local_only, limit)
+
+    def _get(self, image_id: int) -> Optional[Dict[str, Any]]:
+        columns = ", ".join(_COLUMNS)
+        with self._lock:
+            row = self._connection().execute(f"SELECT {columns} FROM images WHERE id = ?", (image_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    async def get(self, image_id: int) -> Optional[Dict[str, Any]]:
+        """
+        按记录ID读取一张图像
+
+        Returns:
+            图像记录，不存在或未启用图库时返回 None
+        """
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._get, image_id)
+
+    def _claim_download(self, image_id: int, stale_after: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE images SET download_claimed_at = ? "
+                "WHERE id = ? AND (download_claimed_at IS NULL OR download_claimed_at < ?)",
+                (now, image_id, now - stale_after)
+            )
+            return cursor.rowcount == 1
+
+    async def claim_download(self, image_id: int, stale_after: float) -> bool:
+        """
+        在所有共享图库的进程之间认领一张图像的下载
+
+        认领在一条 UPDATE 中完成，同一时间只有一个进程能认领成功；
+        认领方退出而没有释放时，超过 stale_after 秒的认领视为失效，可以被重新认领。
+
+        Args:
+            image_id: 图库中的记录ID
+            stale_after: 认领的有效时间（秒）
+
+        Returns:
+            是否认领成功；其他进程正在下载时返回 False，数据库不可用时返回 True（直接下载）
+        """
+        try:
+            return await asyncio.to_thread(self._claim_download, image_id, stale_after)
+        except (sqlite3.Error, OSError):
+            return True
+
+    def _release_download(self, image_id: int) -> None:
+        with self._lock:
+            self._connection().execute("UPDATE images SET download_claimed_at = NULL WHERE id = ?", (image_id,))
+
+    async def release_download(self, image_id: int) -> None:
+        """下载失败时释放认领，其他进程可以立即重新下载"""
+        try:
+            await asyncio.to_thread(self._release_download, image_id)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _set_location(self, image_id: int, location: str) -> None:
+        digest, file_bytes = self._file_info(location)
+        with self._lock:
+            self._connection().execute(
+                "UPDATE images SET local_path = ?, digest = ?, file_bytes = ?, download_claimed_at = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (location, digest, file_bytes, _now(), image_id)
+            )
+
+    async def set_location(self, image_id: int, location: str) -> None:
+        """图像下载完成后记录本地路径（或对象 URI）、摘要和大小，同时释放下载认领"""
+        try:
+            await asyncio.to_thread(self._set_location, image_id, location)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# 进程级共享实例
+gallery = Gallery()
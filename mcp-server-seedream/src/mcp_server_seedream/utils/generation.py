@@ -0,0 +1,288 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .api_client import make_api_request, download_image, read_image, save_image_bytes
+from .deadline import Deadline
+from .errors import MCPError
+from .models import ModelSpec, model_registry
+from .records import ImageRecord
+from .gallery import gallery
+from .lazy_images import lazy_images
+from .resize import derive_sizes, image_extension, pillow_available, size_area
+from .sizes import SIZE_PRESETS, parse_image_size
+
+# 图像生成端点
+GENERATIONS_ENDPOINT = "api/v3/images/generations"
+
+def build_generation_payload(
+    prompt: str,
+    size: str,
+    response_format: str,
+    optimize_prompt: bool,
+    latency_tier: str = "standard",
+    model: Optional[ModelSpec] = None,
+    guidance_scale: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    构建图像生成 API 的请求数据
+
+    Args:
+        prompt: 提示词
+        size: 图像尺寸
+        response_format: 工具的返回格式，'local_file' 和 'resource' 会转换为 API 支持的 'url'
+        optimize_prompt: 是否优化提示词
+        latency_tier: 延迟档位，决定提示词优化使用 fast 还是 standard 模式
+        model: 使用的模型，默认使用注册表的默认模型
+        guidance_scale: 文本权重
+        seed: 随机数种子
+
+    Returns:
+        API 请求体，只包含所选模型支持的参数
+    """
+    model = model or model_registry.default
+    payload = {
+        "model": model.model_id,
+        "prompt": prompt,
+        "size": size,
+        "response_format": "url" if response_format in ("local_file", "resource") else response_format,  # API只支持url和b64_json
+        "watermark": False  # 强制不添加水印
+    }
+    payload.update(model_registry.build_params(model, optimize_prompt, latency_tier, guidance_scale, seed))
+    return payload
+
+def is_deadline_error(error: BaseException) -> bool:
+    """判断异常是否由端到端时限触发"""
+    return isinstance(error, MCPError) and error.error_code == "DEADLINE_EXCEEDED"
+
+async def request_image(
+    prompt: str,
+    size: str,
+    response_format: str,
+    optimize_prompt: bool,
+    priority: str = "interactive",
+    latency_tier: str = "standard",
+    deadline: Optional[Deadline] = None,
+    model: Optional[ModelSpec] = None,
+    guidance_scale: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    调用 API 生成一张图像
+
+    请求的服务端耗时和失败情况会记入模型注册表，用于 fastest 策略选择模型。
+
+    Args:
+        prompt: 提示词
+        size: 图像尺寸
+        response_format: 工具的返回格式
+        optimize_prompt: 是否优化提示词
+        priority: 调度优先级
+        latency_tier: 延迟档位
+        deadline: 端到端截止时间
+        model: 使用的模型，默认使用注册表的默认模型
+        guidance_scale: 文本权重（模型不支持时忽略）
+        seed: 随机数种子（模型不支持时忽略）
+
+    Returns:
+        包含 image_url、token_usage 和 model_used 的字典
+
+    Raises:
+        MCPError: API 请求失败时
+    """
+    model = model or model_registry.default
+    response = await make_api_request(
+        endpoint=GENERATIONS_ENDPOINT,
+        method="POST",
+        data=build_generation_payload(
+            prompt, size, response_format, optimize_prompt, latency_tier,
+            model=model, guidance_scale=guidance_scale, seed=seed
+        ),
+        priority=priority,
+        deadline=deadline,
+        observe=model_registry.observer(model)
+    )
+    return {
+        "image_url": response.get("data", [{}])[0].get("url"),
+        "token_usage": response.get("usage", {}).get("total_tokens", 0),
+        "model_used": model.model_id
+    }
+
+async def generate_group_item(
+    index: int,
+    prompt: str,
+    size: str,
+    response_format: str,
+    download_dir: Optional[str],
+    optimize_prompt: bool,
+    priority: str = "batch",
+    latency_tier: str = "standard",
+    deadline: Optional[Deadline] = None,
+    model: Optional[ModelSpec] = None,
+    guidance_scale: Optional[float] = None,
+    seed: Optional[int] = None
+) -> ImageRecord:
+    """
+    生成批量任务中的一张图像
+
+    单张图像生成或下载失败只记录在返回的记录中，不影响批量任务中的其他图像。
+    超出时限的图像标记 deadline_exceeded，已完成的部分照常返回。
+
+    Returns:
+        图像记录，失败时 success 为 False 并包含 error
+    """
+    try:
+        generated = await request_image(
+            prompt, size, response_format, optimize_prompt,
+            priority=priority, latency_tier=latency_tier, deadline=deadline,
+            model=model, guidance_scale=guidance_scale, seed=seed
+        )
+        record = ImageRecord(
+            index=index,
+            prompt=prompt,
+            image_url=generated["image_url"],
+            image_size=size,
+            token_usage=generated["token_usage"]
+        )
+
+        # resource 格式只登记图像，首次读取资源时再下载
+        if response_format == "resource" and record.image_url:
+            await lazy_images.defer(record, generated["model_used"], download_dir)
+
+        # 如果需要本地文件（或图库未启用、无法延迟下载），下载图片
+        if response_format in ("local_file", "resource") and record.image_url and record.resource_uri is None:
+            try:
+                record.local_path = await download_image(record.image_url, download_dir, deadline=deadline)
+                record.downloaded = True
+            except Exception as download_error:
+                # 下载失败不影响整体流程，只记录错误
+                record.downloaded = False
+                record.download_error = str(download_error)
+                record.deadline_exceeded = is_deadline_error(download_error)
+
+        # 记录到图库（失败时跳过，不影响生成结果）
+        if record.gallery_id is None:
+            record.gallery_id = await gallery.add(record, generated["model_used"], download_dir=download_dir)
+        return record
+
+    except Exception as img_error:
+        # 单个图像生成失败，记录错误但继续处理其他图像
+        return ImageRecord(
+            index=index,
+            prompt=prompt,
+            success=False,
+            error=str(img_error),
+            deadline_exceeded=is_deadline_error(img_error)
+        )
+
+async def generate_group(
+    prompts: Sequence[str],
+    size: str,
+    response_format: str,
+    download_dir: Optional[str],
+    optimize_prompt: bool,
+    priority: str = "batch",
+    latency_tier: str = "standard",
+    deadline: Optional[Deadline] = None,
+    model: Optional[ModelSpec] = None,
+    guidance_scale: Optional[float] = None,
+    seed: Optional[int] = None
+) -> List[ImageRecord]:
+    """
+    并发生成一组图像
+
+    所有提示词同时提交，由调度器按优先级限制实际的 API 并发，
+    因此批量任务只会占用交互式请求剩余的容量。
+    所有图像共享同一个截止时间，到期时未完成的图像直接标记为超时。
+
+    Returns:
+        按提示词顺序排列的图像记录列表
+    """
+    return list(await asyncio.gather(*(
+        generate_group_item(
+            i, prompt, size, response_format, download_dir, optimize_prompt,
+            priority=priority, latency_tier=latency_tier, deadline=deadline,
+            model=model, guidance_scale=guidance_scale, seed=seed
+        )
+        for i, prompt in enumerate(prompts)
+    )))
+
+async def generate_sizes(
+    prompt: str,
+    sizes: Sequence[str],
+    download_dir: str,
+    optimize_prompt: bool,
+    priority: str = "interactive",
+    latency_tier: str = "standard",
+    deadline: Optional[Deadline] = None,
+    model: Optional[ModelSpec] = None,
+    guidance_scale: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Tuple[List[ImageRecord], str]:
+    """
+    生成一次，在本地派生多个尺寸
+
+    只按最大的尺寸调用一次 API，源图原样保存，其余尺寸在缩放进程池中并行重采样后保存。
+    单个尺寸缩放或保存失败只记录在该尺寸的记录中。
+
+    Returns:
+        (按 sizes 顺序排列的图像记录列表, 实际使用的模型ID)
+
+    Raises:
+        MCPError: 未安装 Pillow、API 请求失败或源图下载失败时
+    """
+    if not pillow_available():
+        raise MCPError(
+            message="本地派生尺寸需要安装 Pillow",
+            suggestion='请运行 pip install "mcp-server-seedream[resize]"，或为每个尺寸分别调用 generate_image',
+            error_code="DEPENDENCY_MISSING"
+        )
+
+    sizes = list(dict.fromkeys(sizes))
+    source_size = max(sizes, key=size_area)
+    generated = await request_image(
+        prompt, source_size, "local_file", optimize_prompt,
+        priority=priority, latency_tier=latency_tier, deadline=deadline,
+        model=model, guidance_scale=guidance_scale, seed=seed
+    )
+    data = await read_image(generated["image_url"], deadline=deadline)
+
+    derived_sizes = [size for size in sizes if size != source_size]
+    outputs = [(data, image_extension(data), source_size)]
+    if derived_sizes:
+        resize = derive_sizes(data, derived_sizes)
+        resized = await (deadline.run(resize, "本地缩放") if deadline else resize)
+        for size, (content, extension, width, height) in zip(derived_sizes, resized):
+            # 超出源图的 '宽x高' 不放大，而是按比例缩小到源图范围内，记录实际尺寸
+            clamped = size.upper() not in SIZE_PRESETS and parse_image_size(size) != (width, height)
+            outputs.append((content, extension, f"{width}x{height}" if clamped else size))
+
+    async def save(index: int, size: str, content: bytes, extension: str, image_size: str) -> ImageRecord:
+        is_source = size == source_size
+        record = ImageRecord(
+            index=index,
+            prompt=prompt,
+            image_url=generated["image_url"] if is_source else None,
+            image_size=image_size,
+            token_usage=generated["token_usage"] if is_source else 0,
+            derived=not is_source
+        )
+        try:
+            record.local_path = await save_image_bytes(content, extension, download_dir, label=size.lower())
+            record.downloaded = True
+        except MCPError as save_error:
+            if is_source:
+                record.downloaded = False
+                record.download_error = str(save_error)
+            else:
+                # 派生图像没有 URL，保存失败即为失败
+                record.success = False
+                record.error = str(save_error)
+        record.gallery_id = await gallery.add(record, generated["model_used"], download_dir=download_dir)
+        return record
+
+    order = [source_size] + derived_sizes
+    records = await asyncio.gather(*(
+        save(sizes.index(size), size, content, extension, image_size)
+        for size, (content, extension, image_size) in zip(order, outputs)
+    ))
+    return sorted(records, key=lambda record: record.index), generated["model_used"]
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+class InflightTracker:
+    """
+    跟踪进行中的图像生成与下载任务
+
+    HTTP 部署在停机时先停止接收新连接，再调用 drain() 等待已开始的
+    生成和下载完成，避免已消耗 token 的请求被中途丢弃。
+    计数只在事件循环线程内修改，不持有与事件循环绑定的同步原语。
+    """
+
+    def __init__(self) -> None:
+        self._active = 0
+        self._cancelled = 0
+
+    @property
+    def active(self) -> int:
+        """当前进行中的任务数"""
+        return self._active
+
+    @property
+    def cancelled(self) -> int:
+        """被客户端取消的任务累计数"""
+        return self._cancelled
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator[None]:
+        """在上下文期间将一个任务计为进行中"""
+        self._active += 1
+        try:
+            yield
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            raise
+        finally:
+            self._active -= 1
+
+    async def drain(self, timeout: float, poll_interval: float = 0.1) -> bool:
+        """
+        等待所有进行中的任务完成
+
+        Args:
+            timeout: 最长等待时间（秒）
+            poll_interval: 检查间隔（秒）
+
+        Returns:
+            超时前全部完成返回 True，否则返回 False
+        """
+        deadline = time.monotonic() + timeout
+        while self._active > 0:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+        return True
+
+# 进程级共享实例
+inflight = InflightTracker()
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# 密钥池配置
+# 多个 API 密钥，逗号分隔；未配置时使用 SEEDREAM_API_KEY 单个密钥
+SEEDREAM_API_KEYS = os.getenv("SEEDREAM_API_KEYS", "")
+# 每个密钥每分钟允许的请求数，0 表示不限制
+KEY_RATE_LIMIT_RPM = float(os.getenv("SEEDREAM_KEY_RPM", "0"))
+# 密钥收到 429 且响应没有 Retry-After 时的冷却时间（秒）
+KEY_THROTTLE_COOLDOWN = float(os.getenv("SEEDREAM_KEY_THROTTLE_COOLDOWN", "10"))
+# 密钥收到 401/403 后停用的时间（秒），到期后重新尝试
+KEY_AUTH_COOLDOWN = float(os.getenv("SEEDREAM_KEY_AUTH_COOLDOWN", "600"))
+
+def _parse_keys(value: str) -> List[str]:
+    """解析逗号分隔的密钥列表，去掉空白和重复项"""
+    return list(dict.fromkeys(key.strip() for key in value.split(",") if key.strip()))
+
+class ApiKey:
+    """
+    密钥池中的一个 API 密钥
+
+    记录进行中的请求数、每密钥令牌桶，以及 429（限流冷却）和 401/403（停用）历史。
+    """
+
+    def __init__(self, token: str, requests_per_minute: float = KEY_RATE_LIMIT_RPM) -> None:
+        self.token = token
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.in_flight = 0
+        self.last_used = 0.0
+        self.cooldown_until = 0.0
+        self.disabled_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.auth_failures = 0
+
+    @property
+    def label(self) -> str:
+        """用于日志和统计的脱敏名称，只保留末 4 位"""
+        return f"…{self.token[-4:]}" if len(self.token) > 8 else "…"
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def disabled(self, now: float) -> bool:
+        """是否因认证失败被停用"""
+        return now < self.disabled_until
+
+    def wait_time(self, now: float) -> float:
+        """
+        距离该密钥可以发出下一个请求的时间（秒）
+
+        Returns:
+            0 表示立即可用；限流冷却或本密钥令牌不足时为需要等待的秒数
+        """
+        self._refill(now)
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        if self.rate > 0 and self.tokens < 1.0:
+            return (1.0 - self.tokens) / self.rate
+        return 0.0
+
+    def take(self, now: float) -> None:
+        """占用该密钥发出一个请求"""
+        self._refill(now)
+        if self.rate > 0:
+            self.tokens -= 1.0
+        self.in_flight += 1
+        self.requests += 1
+        self.last_used = now
+
+class KeyPool:
+    """
+    API 密钥池
+
+    每个请求分配给进行中请求数最少的可用密钥（相同时选最久未使用的），
+    各密钥独立计算速率和冷却，总吞吐随密钥数量增加：
+
+    - 收到 429 的密钥按 Retry-After 进入冷却，冷却期间请求分配给其他密钥
+    - 收到 401/403 的密钥停用 KEY_AUTH_COOLDOWN 秒，到期后重新参与分配
+    - 所有密钥都在冷却时等待最早结束的冷却；所有密钥都被停用时仍使用最早恢复的密钥，
+      让调用方得到真实的认证错误
+    """
+
+    def __init__(self, tokens: List[str], requests_per_minute: float = KEY_RATE_LIMIT_RPM) -> None:
+        self.keys = [ApiKey(token, requests_per_minute) for token in tokens]
+        # 同步客户端在后台线程的事件循环中发请求，密钥状态跨线程共享
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "KeyPool":
+        """按 SEEDREAM_API_KEYS（或 SEEDREAM_API_KEY）创建密钥池"""
+        return cls(_parse_keys(SEEDREAM_API_KEYS) or _parse_keys(os.getenv("SEEDREAM_API_KEY", "")))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _pick(self, now: float) -> Optional[ApiKey]:
+        ready = [key for key in self.keys if not key.disabled(now) and key.wait_time(now) == 0]
+        if not ready:
+            return None
+        return min(ready, key=lambda key: (key.in_flight, key.last_used))
+
+    def has_available(self) -> bool:
+        """是否有可以立即使用的密钥"""
+        with self._lock:
+            return self._pick(time.monotonic()) is not None
+
+    async def acquire(self) -> ApiKey:
+        """
+        等待并占用一个密钥
+
+        Returns:
+            分配到的密钥，使用完毕后必须调用 release()
+        """
+        if not self.keys:
+            raise ValueError("密钥池为空")
+        while True:
+            # 选择和占用在同一次加锁内完成，等待在锁外进行
+            with self._lock:
+                now = time.monotonic()
+                key = self._pick(now)
+                if key is None:
+                    enabled = [key for key in self.keys if not key.disabled(now)]
+                    if not enabled:
+                        key = min(self.keys, key=lambda key: key.disabled_until)
+                if key is not None:
+                    key.take(now)
+                    return key
+                wait = min(key.wait_time(now) for key in enabled)
+            await asyncio.sleep(wait)
+
+    def release(self, key: ApiKey) -> None:
+        """请求结束，归还密钥"""
+        with self._lock:
+            key.in_flight -= 1
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[ApiKey]:
+        """在上下文期间占用一个密钥"""
+        key = await self.acquire()
+        try:
+            yield key
+        finally:
+            self.release(key)
+
+    def throttled(self, key: ApiKey, retry_after: Optional[float] = None) -> None:
+        """
+        记录密钥收到 429，进入冷却
+
+        Args:
+            key: 收到 429 的密钥
+            retry_after: 服务端建议的等待时间（秒），缺省使用 SEEDREAM_KEY_THROTTLE_COOLDOWN
+        """
+        with self._lock:
+            now = time.monotonic()
+            key.throttled += 1
+            key.cooldown_until = max(key.cooldown_until, now + (retry_after or KEY_THROTTLE_COOLDOWN))
+            key.tokens = 0.0
+            key.updated_at = now
+
+    def rejected(self, key: ApiKey) -> None:
+        """记录密钥收到 401/403，停用一段时间"""
+        with self._lock:
+            key.auth_failures += 1
+            key.disabled_until = time.monotonic() + KEY_AUTH_COOLDOWN
+
+    def succeeded(self, key: ApiKey) -> None:
+        """请求成功，清除停用状态（停用到期后重新验证通过）"""
+        with self._lock:
+            key.disabled_until = 0.0
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        各密钥的当前状态
+
+        Returns:
+            每个密钥一项，包含脱敏名称、状态、进行中请求数和累计请求 / 限流 / 认证失败次数
+        """
+        with self._lock:
+            now = time.monotonic()
+            result = []
+            for key in self.keys:
+                if key.disabled(now):
+                    state = "disabled"
+                elif now < key.cooldown_until:
+                    state = "cooling"
+                else:
+                    state = "healthy"
+                result.append({
+                    "key": key.label,
+                    "state": state,
+                    "in_flight": key.in_flight,
+                    "requests": key.requests,
+                    "throttled": key.throttled,
+                    "auth_failures": key.auth_failures
+                })
+            return result
+
+# 进程级共享实例（只使用 asyncio.sleep，不绑定事件循环；服务器事件循环和同步客户端线程共用）
+key_pool = KeyPool.from_env()
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import weakref
+from typing import Dict, Optional, Tuple
+
+from .api_client import DEFAULT_DOWNLOAD_DIR, download_image
+from .errors import MCPError, handle_download_error
+from .gallery import gallery, image_resource_uri, stored_file_exists
+from .records import ImageRecord
+from .resize import image_extension
+from .storage import StorageError, read_location
+
+# 延迟下载配置
+# 其他进程正在下载同一张图像时，检查下载是否完成的间隔（秒）
+LAZY_DOWNLOAD_POLL_INTERVAL = float(os.getenv("SEEDREAM_LAZY_POLL_INTERVAL", "0.2"))
+# 下载认领的有效时间（秒），认领的进程异常退出后，超过该时间其他进程可以重新下载
+LAZY_DOWNLOAD_CLAIM_TTL = float(os.getenv("SEEDREAM_LAZY_CLAIM_TTL", "120"))
+
+_MIME_TYPES = {"png": "image/png", "webp": "image/webp", "jpg": "image/jpeg"}
+
+class LazyImages:
+    """
+    延迟下载的图像
+
+    response_format='resource' 时生成工具只把图像登记到图库并返回 seedream://images/{id}，
+    不等待下载；第一次读取该资源（或同步客户端第一次请求本地路径）时才下载，
+    下载结果写回图库，之后的读取直接使用已保存的文件。
+
+    同一进程内并发读取同一张图像时共享同一个下载任务，每张图像最多下载一次；
+    某个读取方取消不会中止其他读取方正在等待的下载。
+    共享图库的多个进程（例如多个 HTTP worker）通过图库记录认领下载，
+    未认领到的进程等待认领方写回下载结果，而不是重复下载。
+    """
+
+    def __init__(self) -> None:
+        # asyncio.Task 绑定创建它的事件循环，按事件循环分别记录进行中的下载
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, asyncio.Task[str]]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def defer(self, record: ImageRecord, model: str, download_dir: Optional[str]) -> bool:
+        """
+        登记一张待下载的图像，设置记录的 gallery_id 和 resource_uri
+
+        Args:
+            record: 已生成、尚未下载的图像记录
+            model: 实际使用的模型ID
+            download_dir: 读取时下载到的目录
+
+        Returns:
+            是否已登记；未启用图库或登记失败时返回 False，调用方应立即下载
+        """
+        record.gallery_id = await gallery.add(record, model, download_dir=download_dir)
+        if record.gallery_id is None:
+            return False
+        record.resource_uri = image_resource_uri(record.gallery_id)
+        return True
+
+    async def materialize(self, image_id: int) -> str:
+        """
+        确保图像已下载，返回图片位置
+
+        Args:
+            image_id: 图库中的记录ID
+
+        Returns:
+            本地文件路径，对象存储时为 s3://bucket/key
+
+        Raises:
+            MCPError: 图像不存在或下载失败时
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending.setdefault(loop, {})
+        task = pending.get(image_id)
+        if task is None:
+            task = loop.create_task(self._fetch(image_id))
+            pending[image_id] = task
+            task.add_done_callback(lambda done: self._forget(pending, image_id, done))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _forget(pending: Dict[int, "asyncio.Task[str]"], image_id: int, task: "asyncio.Task[str]") -> None:
+        # 下载结束后移除，失败的图像下次读取时重新下载
+        if pending.get(image_id) is task:
+            del pending[image_id]
+        if not task.cancelled():
+            # 所有读取方都已取消时，避免 "exception was never retrieved" 警告
+            task.exception()
+
+    async def _fetch(self, image_id: int) -> str:
+        while True:
+            image = await gallery.get(image_id)
+            if image is None:
+                raise MCPError(
+                    message=f"图像不存在: {image_id}",
+                    suggestion="请使用 find_generated_images 查询可用的图像ID",
+                    error_code="IMAGE_NOT_FOUND"
+                )
+            if image["local_path"] and await asyncio.to_thread(stored_file_exists, image["local_path"]):
+                return image["local_path"]
+            if not image["image_url"]:
+                raise MCPError(
+                    message=f"图像 {image_id} 的文件已不存在，且没有可供下载的URL",
+                    suggestion="请重新生成该图像",
+                    error_code="IMAGE_NOT_FOUND"
+                )
+            if await gallery.claim_download(image_id, LAZY_DOWNLOAD_CLAIM_TTL):
+                break
+            # 其他进程正在下载，等它写回位置后直接使用
+            await asyncio.sleep(LAZY_DOWNLOAD_POLL_INTERVAL)
+
+        try:
+            location = await download_image(image["image_url"], image["download_dir"] or DEFAULT_DOWNLOAD_DIR)
+        except BaseException:
+            # 下载失败时释放认领，下次读取（包括其他进程）立即重新下载
+            await gallery.release_download(image_id)
+            raise
+        await gallery.set_location(image_id, location)
+        return location
+
+    async def read(self, image_id: int) -> Tuple[bytes, str]:
+        """
+        读取图像内容（首次读取时下载）
+
+        Returns:
+            (图片内容, MIME 类型)
+        """
+        location = await self.materialize(image_id)
+        try:
+            data = await read_location(location)
+        except (StorageError, OSError) as e:
+            raise handle_download_error("STORAGE_ERROR", str(e))
+        # 文件扩展名不一定反映实际格式，按文件头判断
+        return data, _MIME_TYPES[image_extension(data)]
+
+# 进程级共享实例
+lazy_images = LazyImages()
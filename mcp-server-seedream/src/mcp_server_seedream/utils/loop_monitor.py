@@ -0,0 +1,194 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# 事件循环监控配置
+# 是否启用事件循环延迟采样
+LOOP_MONITOR = os.getenv("SEEDREAM_LOOP_MONITOR", "true").lower() in ("1", "true", "yes")
+# 采样间隔（毫秒）：每隔该时间调度一次回调，实际执行时间与预期的差即为事件循环延迟
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("SEEDREAM_LOOP_MONITOR_INTERVAL_MS", "100"))
+# 调试模式：事件循环被阻塞超过阈值时，把阻塞位置的调用栈写到 stderr
+LOOP_DEBUG = os.getenv("SEEDREAM_LOOP_DEBUG", "false").lower() in ("1", "true", "yes")
+# 调试模式下报告阻塞的阈值（毫秒）
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("SEEDREAM_LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收集超过 1 秒的样本
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+class LagHistogram:
+    """事件循环延迟直方图（固定桶，记录样本数、总和与最大值）"""
+
+    def __init__(self, buckets=LAG_BUCKETS_MS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, lag_ms: float) -> None:
+        """记录一个延迟样本（毫秒）"""
+        for i, bound in enumerate(self.buckets):
+            if lag_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        估算延迟分位数
+
+        Args:
+            q: 分位数，取值 0-100
+
+        Returns:
+            样本所在桶的上界（毫秒），超过最大桶时返回最大值；没有样本时返回 None
+        """
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """直方图数据：各桶计数（键为桶上界，"+Inf" 为超过最大桶的样本）及汇总值"""
+        labels = [f"le_{bound}ms" for bound in self.buckets] + ["+Inf"]
+        return {
+            "samples": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+class LoopMonitor:
+    """
+    事件循环延迟监控
+
+    采样任务每隔 interval 睡眠一次，醒来时间比预期晚多少就说明事件循环被占用了多久，
+    延迟样本计入直方图。任何在事件循环上同步执行的工作（文件 I/O、大对象序列化、
+    CPU 密集计算）都会拖慢所有并发的工具调用，并直接体现为延迟升高。
+
+    调试模式下另有一个看门狗线程：采样任务每次醒来更新心跳时间，心跳超过阈值没有更新时，
+    说明当前回调阻塞了事件循环，看门狗读取事件循环线程的调用栈并写到 stderr，
+    同一次阻塞只报告一次。
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL_MS / 1000.0,
+        debug: bool = LOOP_DEBUG,
+        block_threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000.0
+    ) -> None:
+        self.interval = interval
+        self.debug = debug
+        self.block_threshold = block_threshold
+        self.histogram = LagHistogram()
+        self.blocked = 0
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=10)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._beat = 0.0
+        self._loop_thread_id = 0
+
+    @property
+    def running(self) -> bool:
+        """采样任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """在当前事件循环上启动采样（调试模式下同时启动看门狗线程）"""
+        if self.running:
+            return
+        self.histogram = LagHistogram()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        """停止采样和看门狗"""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            self.histogram.record(max(0.0, now - expected) * 1000.0)
+
+    def _watch(self) -> None:
+        # 在独立线程中运行，不受事件循环阻塞的影响
+        reported_beat = 0.0
+        while not self._stopping.wait(self.block_threshold / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.block_threshold or beat == reported_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = beat
+            stack = "".join(traceback.format_stack(frame))
+            self.blocked += 1
+            self.reports.append({
+                "blocked_ms": round(blocked * 1000.0, 1),
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "stack": stack
+            })
+            # STDIO 传输使用 stdout 传递协议消息，报告只能写到 stderr
+            print(
+                f"[loop-monitor] 事件循环已被阻塞 {blocked * 1000.0:.0f} ms，当前调用栈：\n{stack}",
+                file=sys.stderr,
+                flush=True
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        读取监控数据
+
+        Returns:
+            包含采样配置、延迟直方图，以及调试模式下阻塞次数和最近阻塞调用栈的字典
+        """
+        data: Dict[str, Any] = {
+            "enabled": self.running,
+            "interval_ms": self.interval * 1000.0,
+            "lag": self.histogram.snapshot()
+        }
+        if self.debug:
+            reports: List[Dict[str, Any]] = list(self.reports)
+            data["block_threshold_ms"] = self.block_threshold * 1000.0
+            data["blocked_callbacks"] = self.blocked
+            data["recent_blocks"] = reports
+        return data
+
+# 进程级共享实例，在服务器生命周期内监控主事件循环
+loop_monitor = LoopMonitor()
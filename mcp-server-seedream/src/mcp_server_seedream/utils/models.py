@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional, Sequence
+
+from .deadline import optimize_mode_for_tier
+from .errors import MCPError
+from .stats import EwmaStats
+
+ModelPolicy = Literal["default", "fastest"]
+
+# 默认模型（注册表中的名称或完整模型ID）
+SEEDREAM_DEFAULT_MODEL = os.getenv("SEEDREAM_DEFAULT_MODEL", "seedream-4.0")
+# 'fastest' 策略下，某个模型超过该时间（秒）没有被选中时，下一个请求作为探测发往该模型
+MODEL_PROBE_INTERVAL = float(os.getenv("SEEDREAM_MODEL_PROBE_INTERVAL", "60"))
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """
+    模型能力描述
+
+    Attributes:
+        name: 注册表中的简短名称，工具参数 model 可以使用该名称
+        model_id: API 请求中使用的模型ID（或推理接入点ID）
+        text_to_image: 是否支持纯文本生成图像（seededit 只支持图生图）
+        supports_optimize_prompt: 是否支持提示词优化参数
+        supports_guidance_scale: 是否支持 guidance_scale 参数
+        supports_seed: 是否支持 seed 参数
+        prior_latency_ms: 尚无实时数据时用于比较速度的先验延迟
+    """
+    name: str
+    model_id: str
+    text_to_image: bool = True
+    supports_optimize_prompt: bool = False
+    supports_guidance_scale: bool = False
+    supports_seed: bool = False
+    prior_latency_ms: int = 15000
+
+# 模型ID可以通过环境变量替换为推理接入点ID
+MODEL_SPECS = (
+    ModelSpec(
+        name="seedream-4.0",
+        model_id=os.getenv("SEEDREAM_4_0_MODEL_ID", "doubao-seedream-4-0-250828"),
+        supports_optimize_prompt=True,
+        prior_latency_ms=20000
+    ),
+    ModelSpec(
+        name="seedream-3.0-t2i",
+        model_id=os.getenv("SEEDREAM_3_0_T2I_MODEL_ID", "doubao-seedream-3-0-t2i-250415"),
+        supports_guidance_scale=True,
+        supports_seed=True,
+        prior_latency_ms=10000
+    ),
+    ModelSpec(
+        name="seededit-3.0-i2i",
+        model_id=os.getenv("SEEDEDIT_3_0_I2I_MODEL_ID", "doubao-seededit-3-0-i2i-250628"),
+        text_to_image=False,
+        supports_guidance_scale=True,
+        supports_seed=True,
+        prior_latency_ms=15000
+    ),
+)
+
+class ModelRegistry:
+    """
+    模型注册表
+
+    记录每个模型的能力和实时延迟/错误率统计，按指定模型或策略选择模型，
+    并过滤掉所选模型不支持的请求参数。
+
+    统计数据只来自被选中的模型，'fastest' 策略因此需要探测：与 EndpointRouter 相同，
+    超过 probe_interval 秒没有被选中的文生图模型（包括从未被选中、只有先验延迟的模型），
+    下一个请求作为探测发往该模型，使较慢模型恢复后仍能重新被选中。
+    """
+
+    def __init__(self, specs: Sequence[ModelSpec], default: str, probe_interval: float = MODEL_PROBE_INTERVAL) -> None:
+        self._specs = {spec.name: spec for spec in specs}
+        self._by_id = {spec.model_id: spec for spec in specs}
+        self._stats = {
+            spec.name: EwmaStats(initial_latency=spec.prior_latency_ms / 1000.0)
+            for spec in specs
+        }
+        # 各模型最近一次被 'fastest' 策略选中的时间
+        self._last_selected = {spec.name: None for spec in specs}
+        self.probe_interval = probe_interval
+        # 同步客户端的后台循环和服务器主循环可能同时更新统计
+        self._lock = threading.Lock()
+        self.default = self.get(default)
+
+    @property
+    def names(self) -> List[str]:
+        """所有已注册模型的名称"""
+        return list(self._specs)
+
+    def get(self, model: str) -> ModelSpec:
+        """
+        按名称或模型ID查找模型
+
+        Raises:
+            MCPError: 模型未注册时
+        """
+        spec = self._specs.get(model) or self._by_id.get(model)
+        if spec is None:
+            raise MCPError(
+                message=f"未知模型: {model}",
+                suggestion=f"可用模型: {', '.join(self.names)}"
+            )
+        return spec
+
+    def select(self, model: Optional[str] = None, policy: ModelPolicy = "default") -> ModelSpec:
+        """
+        为文生图请求选择模型
+
+        Args:
+            model: 指定的模型名称或ID，指定时忽略 policy
+            policy: 'default' 使用默认模型；'fastest' 选择期望耗时最短的文生图模型，
+                长时间未被选中的模型优先作为探测
+
+        Returns:
+            选中的模型
+
+        Raises:
+            MCPError: 指定的模型不存在或不支持文生图时
+        """
+        if model:
+            spec = self.get(model)
+            if not spec.text_to_image:
+                raise MCPError(
+                    message=f"模型 {spec.name} 不支持纯文本生成图像",
+                    suggestion=f"请改用支持文生图的模型: {', '.join(s.name for s in self._specs.values() if s.text_to_image)}"
+                )
+            return spec
+        if policy == "fastest":
+            candidates = [spec for spec in self._specs.values() if spec.text_to_image]
+            with self._lock:
+                now = time.monotonic()
+                stale = [
+                    spec for spec in candidates
+                    if self._last_selected[spec.name] is None
+                    or now - self._last_selected[spec.name] >= self.probe_interval
+                ]
+                fastest = min(candidates, key=lambda spec: self._stats[spec.name].expected_latency())
+                # 最快的模型本身过期时直接选中它；否则优先探测最久未选中的模型
+                if stale and fastest not in stale:
+                    spec = min(stale, key=lambda spec: self._last_selected[spec.name] or 0.0)
+                else:
+                    spec = fastest
+                self._last_selected[spec.name] = now
+                return spec
+        return self.default
+
+    def build_params(
+        self,
+        spec: ModelSpec,
+        optimize_prompt: bool,
+        latency_tier: str = "standard",
+        guidance_scale: Optional[float] = None,
+        seed: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        构建模型相关的请求参数，所选模型不支持的参数直接丢弃
+
+        Returns:
+            需要合并到请求体中的参数
+        """
+        params: Dict[str, Any] = {}
+        if spec.supports_optimize_prompt:
+            params["optimize_prompt"] = optimize_prompt
+            if optimize_prompt:
+                params["optimize_prompt_options"] = {"mode": optimize_mode_for_tier(latency_tier)}
+        if guidance_scale is not None and spec.supports_guidance_scale:
+            params["guidance_scale"] = guidance_scale
+        if seed is not None and spec.supports_seed:
+            params["seed"] = seed
+        return params
+
+    def observer(self, spec: ModelSpec):
+        """返回记录该模型请求结果的回调，供 make_api_request 使用"""
+        def observe(seconds: Optional[float], ok: bool) -> None:
+            with self._lock:
+                self._stats[spec.name].record(seconds, ok)
+        return observe
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """各模型当前的能力与统计信息"""
+        with self._lock:
+            return [
+                {
+                    "name": spec.name,
+                    "model_id": spec.model_id,
+                    "text_to_image": spec.text_to_image,
+                    "latency_ms": int(self._stats[spec.name].latency * 1000),
+                    "error_rate": round(self._stats[spec.name].error_rate, 3),
+                    "samples": self._stats[spec.name].samples
+                }
+                for spec in self._specs.values()
+            ]
+
+# 进程内共享的模型注册表
+model_registry = ModelRegistry(MODEL_SPECS, SEEDREAM_DEFAULT_MODEL)
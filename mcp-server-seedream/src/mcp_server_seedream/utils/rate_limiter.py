@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，退化为进程内限流
+    fcntl = None
+
+# 限流配置
+# 整个主机每分钟允许的 API 请求数，0 表示不启用限流
+RATE_LIMIT_RPM = float(os.getenv("SEEDREAM_RATE_LIMIT_RPM", "0"))
+# 令牌桶容量（允许的突发请求数），默认等于每秒速率且至少为 1
+RATE_LIMIT_BURST = float(os.getenv("SEEDREAM_RATE_LIMIT_BURST", "0"))
+# 收到 429 但响应中没有 Retry-After 时的冷却时间（秒）
+RATE_LIMIT_COOLDOWN = float(os.getenv("SEEDREAM_RATE_LIMIT_COOLDOWN", "10"))
+# 主机上所有服务器进程共享的状态文件
+RATE_LIMIT_STATE_FILE = os.getenv(
+    "SEEDREAM_RATE_LIMIT_STATE",
+    os.path.join(tempfile.gettempdir(), "seedream_rate_limit.json")
+)
+
+class SharedTokenBucket:
+    """
+    主机级共享令牌桶
+
+    同一主机上的所有服务器进程（例如每个客户端一个 STDIO 进程）通过文件锁
+    读写同一个状态文件，共同遵守账号的请求速率上限：
+
+    - 每次 API 请求前领取一个令牌，令牌按固定速率补充
+    - 任一进程收到 429 时写入共享冷却时间并清空令牌，所有进程一起暂停，
+      冷却结束后令牌从零开始按速率补充，请求平滑恢复而不是同时涌入
+    - 汇总所有进程的请求数和 token 用量
+    """
+
+    def __init__(
+        self,
+        state_file: str = RATE_LIMIT_STATE_FILE,
+        requests_per_minute: float = RATE_LIMIT_RPM,
+        burst: float = RATE_LIMIT_BURST
+    ) -> None:
+        self.state_file = state_file
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(self.rate, 1.0)
+        # flock 不能阻止同一进程内的多个线程并发修改，额外加一把进程内锁
+        self._thread_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用限流"""
+        return self.rate > 0
+
+    @contextmanager
+    def _locked_state(self) -> Iterator[Dict[str, Any]]:
+        """在文件锁保护下读取并写回共享状态"""
+        with self._thread_lock:
+            fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fd, "r+", encoding="utf-8") as f:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    raw = f.read()
+                    try:
+                        state = json.loads(raw) if raw else {}
+                    except ValueError:
+                        # 状态文件损坏时重新开始计数
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        """按流逝时间补充令牌"""
+        tokens = state.get("tokens", self.capacity)
+        updated_at = state.get("updated_at", now)
+        elapsed = max(0.0, now - updated_at)
+        state["tokens"] = min(self.capacity, tokens + elapsed * self.rate)
+        state["updated_at"] = now
+
+    def _try_acquire(self) -> float:
+        """
+        尝试领取一个令牌
+
+        Returns:
+            0 表示领取成功，否则为建议的等待时间（秒）
+        """
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            cooldown_until = state.get("cooldown_until", 0.0)
+            if now < cooldown_until:
+                return cooldown_until - now
+            if state["tokens"] >= 1.0:
+                state["tokens"] -= 1.0
+                state["requests"] = state.get("requests", 0) + 1
+                return 0.0
+            return (1.0 - state["tokens"]) / self.rate
+
+    async def acquire(self) -> None:
+        """等待直到领取到一个请求令牌（未启用限流时立即返回）"""
+        if not self.enabled:
+            return
+        while True:
+            # 文件锁可能阻塞，放到线程中执行，避免卡住事件循环
+            wait = await asyncio.to_thread(self._try_acquire)
+            if wait <= 0:
+                return
+            # 加少量随机抖动，避免多个进程在同一时刻争抢
+            await asyncio.sleep(wait + random.uniform(0, 0.05))
+
+    def _penalize(self, retry_after: float) -> None:
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            state["cooldown_until"] = max(state.get("cooldown_until", 0.0), now + retry_after)
+            state["tokens"] = 0.0
+            state["throttled"] = state.get("throttled", 0) + 1
+
+    async def penalize(self, retry_after: Optional[float] = None) -> None:
+        """
+        记录一次 429 限流响应，让所有进程共同进入冷却
+
+        Args:
+            retry_after: 服务端建议的等待时间（秒），缺省使用 SEEDREAM_RATE_LIMIT_COOLDOWN
+        """
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self._penalize, retry_after or RATE_LIMIT_COOLDOWN)
+
+    def _record_usage(self, tokens: int) -> None:
+        with self._locked_state() as state:
+            state["token_usage"] = state.get("token_usage", 0) + tokens
+
+    async def record_usage(self, tokens: int) -> None:
+        """累计一次请求消耗的 token 数"""
+        if not self.enabled or not tokens:
+            return
+        await asyncio.to_thread(self._record_usage, tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        读取当前共享状态
+
+        Returns:
+            包含剩余令牌、冷却截止时间、累计请求数、限流次数和 token 用量的字典
+        """
+        if not self.enabled:
+            return {"enabled": False}
+        now = time.time()
+        with self._locked_state() as state:
+            self._refill(state, now)
+            return {
+                "enabled": True,
+                "requests_per_minute": self.rate * 60,
+                "available_permits": round(state["tokens"], 2),
+                "cooldown_seconds": round(max(0.0, state.get("cooldown_until", 0.0) - now), 2),
+                "total_requests": state.get("requests", 0),
+                "throttled_responses": state.get("throttled", 0),
+                "total_token_usage": state.get("token_usage", 0)
+            }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（仅支持秒数形式）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+# 进程级共享实例
+rate_limiter = SharedTokenBucket()
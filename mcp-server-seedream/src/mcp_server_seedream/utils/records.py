@@ -0,0 +1,149 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+@dataclass(slots=True)
+class ImageRecord:
+    """单张图像的生成结果"""
+    index: int
+    prompt: str
+    success: bool = True
+    image_url: Optional[str] = None
+    image_size: Optional[str] = None
+    token_usage: int = 0
+    watermark: bool = False
+    local_path: Optional[str] = None
+    downloaded: Optional[bool] = None
+    download_error: Optional[str] = None
+    error: Optional[str] = None
+    deadline_exceeded: bool = False
+    gallery_id: Optional[int] = None
+    derived: bool = False
+    resource_uri: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为工具响应中的图像字典，只包含有值的字段"""
+        if not self.success:
+            data = {
+                "index": self.index,
+                "prompt": self.prompt,
+                "error": self.error,
+                "success": False
+            }
+        else:
+            data = {
+                "index": self.index,
+                "prompt": self.prompt,
+                "image_url": self.image_url,
+                "image_size": self.image_size,
+                "token_usage": self.token_usage,
+                "watermark": self.watermark,
+                "success": True
+            }
+            if self.resource_uri is not None:
+                data["resource_uri"] = self.resource_uri
+            if self.local_path is not None:
+                data["local_path"] = self.local_path
+            if self.downloaded is not None:
+                data["downloaded"] = self.downloaded
+            if self.download_error is not None:
+                data["download_error"] = self.download_error
+            if self.gallery_id is not None:
+                data["gallery_id"] = self.gallery_id
+            if self.derived:
+                data["derived"] = True
+        if self.deadline_exceeded:
+            data["deadline_exceeded"] = True
+        return data
+
+@dataclass(slots=True)
+class GenerationResult:
+    """
+    一次工具调用的生成结果
+
+    成功数、下载数、token 用量等汇总值在 add() 时增量维护，格式化时无需再次遍历图像列表。
+    """
+    model_used: str
+    is_group: bool = True
+    images: List[ImageRecord] = field(default_factory=list)
+    expected_images: int = 0
+    successful_images: int = 0
+    downloaded_images: int = 0
+    total_token_usage: int = 0
+    deadline_exceeded: bool = False
+    download_dir: Optional[str] = None
+    processing_time_ms: int = 0
+    created_at: str = ""
+
+    def add(self, record: ImageRecord, keep: bool = True) -> None:
+        """
+        添加一条图像记录并更新汇总值
+
+        Args:
+            record: 图像记录
+            keep: 是否保留记录本身；流式任务只需要汇总时传 False
+        """
+        if keep:
+            self.images.append(record)
+        if record.success:
+            self.successful_images += 1
+            self.total_token_usage += record.token_usage
+        if record.downloaded:
+            self.downloaded_images += 1
+        if record.deadline_exceeded:
+            self.deadline_exceeded = True
+
+    def finish(self, processing_time_ms: int) -> None:
+        """记录处理耗时和完成时间"""
+        self.processing_time_ms = processing_time_ms
+        self.created_at = datetime.datetime.now().isoformat() + "Z"
+
+    @property
+    def first(self) -> ImageRecord:
+        """单图结果的图像记录"""
+        return self.images[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为完整的响应字典（detailed JSON 输出）"""
+        if not self.is_group:
+            image = self.first
+            data = {
+                "success": image.success,
+                "image_url": image.image_url,
+                "image_size": image.image_size,
+                "token_usage": image.token_usage,
+                "created_at": self.created_at,
+                "model_used": self.model_used,
+                "processing_time_ms": self.processing_time_ms,
+                "watermark": image.watermark
+            }
+            if image.resource_uri is not None:
+                data["resource_uri"] = image.resource_uri
+            if image.local_path is not None:
+                data["local_path"] = image.local_path
+            if image.downloaded is not None:
+                data["downloaded"] = image.downloaded
+            if image.download_error is not None:
+                data["download_error"] = image.download_error
+            if image.gallery_id is not None:
+                data["gallery_id"] = image.gallery_id
+            if image.deadline_exceeded:
+                data["deadline_exceeded"] = True
+            return data
+
+        data = {
+            "success": len(self.images) > 0,
+            "total_images": self.expected_images,
+            "successful_images": self.successful_images,
+            "images": [image.to_dict() for image in self.images],
+            "total_token_usage": self.total_token_usage,
+            "created_at": self.created_at,
+            "model_used": self.model_used,
+            "processing_time_ms": self.processing_time_ms
+        }
+        if self.download_dir is not None:
+            data["download_summary"] = f"成功下载 {self.downloaded_images}/{self.expected_images} 张图片"
+            data["download_dir"] = self.download_dir
+        if self.deadline_exceeded:
+            data["deadline_exceeded"] = True
+        return data
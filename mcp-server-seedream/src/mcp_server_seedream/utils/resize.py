@@ -0,0 +1,131 @@
+import asyncio
+import io
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from .sizes import SIZE_PRESETS, parse_image_size
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 是可选依赖：pip install "mcp-server-seedream[resize]"
+    Image = ImageOps = None
+
+# 本地缩放配置
+# 缩放进程池的进程数
+RESIZE_WORKERS = int(os.getenv("SEEDREAM_RESIZE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 输出 JPEG 时的质量
+RESIZE_JPEG_QUALITY = int(os.getenv("SEEDREAM_RESIZE_JPEG_QUALITY", "95"))
+
+_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+def pillow_available() -> bool:
+    """是否安装了 Pillow"""
+    return Image is not None
+
+def size_area(size: str) -> int:
+    """尺寸的像素面积，用于比较 '1K'/'2K'/'4K' 和 'WxH' 的大小"""
+    width, height = parse_image_size(size)
+    return width * height
+
+def image_extension(data: bytes) -> str:
+    """按文件头判断图片格式对应的扩展名，无法识别时为 jpg"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "jpg"
+
+def target_dimensions(size: str, source_width: int, source_height: int) -> Tuple[int, int]:
+    """
+    计算派生尺寸的实际宽高
+
+    '1K'/'2K'/'4K' 与 API 的含义一致，表示面积约为边长的平方、宽高比由图像决定，
+    因此保持源图宽高比按面积缩小（不放大）；'WxH' 使用指定宽高，
+    超出源图的宽或高时保持指定的宽高比缩小到源图范围内，同样不放大。
+
+    Args:
+        size: 请求的尺寸
+        source_width / source_height: 源图宽高
+
+    Returns:
+        目标宽高
+    """
+    preset = SIZE_PRESETS.get(size.upper())
+    if preset is None:
+        width, height = parse_image_size(size)
+        scale = min(1.0, source_width / max(width, 1), source_height / max(height, 1))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    scale = min(1.0, preset / math.sqrt(source_width * source_height))
+    return max(1, round(source_width * scale)), max(1, round(source_height * scale))
+
+def resize_image(data: bytes, size: str) -> Tuple[bytes, str, int, int]:
+    """
+    把图片缩放到指定尺寸（在缩放进程池中执行）
+
+    宽高比与源图相同时直接用 Lanczos 缩放；不同时先居中裁剪到目标宽高比再缩放，避免拉伸变形。
+    输出格式与源图相同（PNG / JPEG / WEBP），目标尺寸与源图相同时原样返回。
+
+    Args:
+        data: 源图内容
+        size: 目标尺寸
+
+    Returns:
+        (图片内容, 扩展名, 宽, 高)
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        source_format = image.format if image.format in _EXTENSIONS else "PNG"
+        width, height = target_dimensions(size, image.width, image.height)
+        if (width, height) == image.size:
+            return data, image_extension(data), width, height
+        source = image
+        if image.mode in ("1", "P"):
+            # 调色板图像只能最近邻缩放，先转换为 RGBA 才能使用 Lanczos
+            source = image.convert("RGBA")
+        if width * image.height == height * image.width:
+            output = source.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        else:
+            output = ImageOps.fit(source, (width, height), method=Image.LANCZOS, centering=(0.5, 0.5))
+
+    buffer = io.BytesIO()
+    if source_format == "JPEG":
+        output.convert("RGB").save(buffer, "JPEG", quality=RESIZE_JPEG_QUALITY, subsampling=0, optimize=True)
+    else:
+        output.save(buffer, source_format)
+    return buffer.getvalue(), _EXTENSIONS[source_format], width, height
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # 服务器进程中有后台线程（事件循环监控、数据库线程池），使用 spawn 避免 fork 复制锁状态
+        _pool = ProcessPoolExecutor(max_workers=RESIZE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def derive_sizes(data: bytes, sizes: Sequence[str]) -> List[Tuple[bytes, str, int, int]]:
+    """
+    在进程池中并行把一张源图缩放到多个尺寸
+
+    Lanczos 重采样是 CPU 密集计算，放在独立进程中执行，不占用事件循环和 GIL。
+
+    Args:
+        data: 源图内容
+        sizes: 目标尺寸列表
+
+    Returns:
+        与 sizes 顺序一致的 (图片内容, 扩展名, 宽, 高) 列表
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    return list(await asyncio.gather(*(loop.run_in_executor(pool, resize_image, data, size) for size in sizes)))
+
+def shutdown_resize_pool() -> None:
+    """关闭缩放进程池（停机时调用）"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Literal, Tuple
+
+from .key_pool import key_pool
+
+Priority = Literal["interactive", "batch", "background"]
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """解析 'interactive:8,batch:3,background:1' 形式的权重配置"""
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition(":")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = float(weight)
+    return weights
+
+# 调度配置
+# 同时进行的 API 请求上限（每个事件循环、每个 API 密钥）
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
+# 各优先级的权重，全部积压时按权重比例分配 API 并发
+PRIORITY_WEIGHTS = {
+    "interactive": 8.0,
+    "batch": 3.0,
+    "background": 1.0,
+    **_parse_weights(os.getenv("PRIORITY_WEIGHTS", ""))
+}
+
+class PriorityScheduler:
+    """
+    API 请求的加权公平队列调度器
+
+    每个请求按优先级进入对应队列，并获得虚拟完成时间标签
+    max(当前虚拟时间, 该队列上一个标签) + 1 / 权重，空闲槽位总是分给标签最小的请求：
+
+    - 各优先级都有积压时，按权重比例分享 API 并发，interactive 获得有保障的份额
+    - 大批量任务的标签会随积压快速增长，新到达的 interactive 请求可以插到其前面
+    - 某个优先级空闲时，其余优先级自动用满剩余容量
+    """
+
+    def __init__(
+        self,
+        capacity: int = MAX_CONCURRENT_REQUESTS,
+        weights: Dict[str, float] = PRIORITY_WEIGHTS
+    ) -> None:
+        self.capacity = max(1, capacity)
+        self.weights = dict(weights)
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_tag = {name: 0.0 for name in self.weights}
+        self._queues: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {
+            name: deque() for name in self.weights
+        }
+
+    @property
+    def active(self) -> int:
+        """当前占用的槽位数"""
+        return self._active
+
+    def queued(self) -> Dict[str, int]:
+        """各优先级排队中的请求数"""
+        return {name: len(queue) for name, queue in self._queues.items()}
+
+    def _tag(self, priority: str) -> float:
+        tag = max(self._virtual_time, self._last_tag[priority]) + 1.0 / self.weights[priority]
+        self._last_tag[priority] = tag
+        return tag
+
+    def _dispatch(self) -> None:
+        """把空闲槽位分给标签最小的排队请求"""
+        while self._active < self.capacity:
+            heads = [(queue[0][0], name) for name, queue in self._queues.items() if queue]
+            if not heads:
+                return
+            _, name = min(heads)
+            tag, waiter = self._queues[name].popleft()
+            if waiter.done():
+                # 排队期间已被取消
+                continue
+            self._virtual_time = tag
+            self._active += 1
+            waiter.set_result(None)
+
+    async def acquire(self, priority: str = "interactive") -> None:
+        """
+        等待一个 API 请求槽位
+
+        Args:
+            priority: 优先级，interactive / batch / background
+        """
+        if priority not in self.weights:
+            raise ValueError(f"未知的优先级: {priority}")
+        tag = self._tag(priority)
+        if self._active < self.capacity and not any(self._queues.values()):
+            self._virtual_time = tag
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append((tag, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 槽位已分配但调用方已取消，立即归还
+                self.release()
+            else:
+                try:
+                    self._queues[priority].remove((tag, waiter))
+                except ValueError:
+                    pass
+            raise
+
+    def release(self) -> None:
+        """归还一个槽位"""
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive") -> AsyncIterator[None]:
+        """在上下文期间占用一个 API 请求槽位"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+# 排队用的 Future 绑定事件循环，因此每个事件循环各有一个调度器
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PriorityScheduler]" = weakref.WeakKeyDictionary()
+
+def get_scheduler() -> PriorityScheduler:
+    """获取当前事件循环的调度器"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        # 配置多个密钥时按密钥数放大并发上限，总吞吐随密钥数增加
+        scheduler = PriorityScheduler(MAX_CONCURRENT_REQUESTS * max(1, len(key_pool)))
+        _schedulers[loop] = scheduler
+    return scheduler
@@ -0,0 +1,25 @@
+import re
+from typing import Tuple
+
+# 尺寸预设档位及对应的边长（像素）
+SIZE_PRESETS = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+def is_valid_size(size: object) -> bool:
+    """尺寸是否为 '1K'/'2K'/'4K' 或 '宽x高' 形式"""
+    if not isinstance(size, str):
+        return False
+    return size.upper() in SIZE_PRESETS or re.fullmatch(r"\d+[xX]\d+", size) is not None
+
+def invalid_size_message(size: object) -> str:
+    """无法识别的尺寸的错误信息，工具参数校验和 JSONL 逐行校验共用"""
+    return f"无法识别的尺寸: {size}，请使用'1K'/'2K'/'4K'或'宽x高'"
+
+def parse_image_size(size: str) -> Tuple[int, int]:
+    """把 '2048x2048' 或 '1K'/'2K'/'4K' 解析为宽高像素，无法识别时为 2048x2048"""
+    preset = SIZE_PRESETS.get(size.upper())
+    if preset:
+        return preset, preset
+    match = re.fullmatch(r"(\d+)[xX*](\d+)", size)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return 2048, 2048
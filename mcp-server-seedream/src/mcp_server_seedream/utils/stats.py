@@ -0,0 +1,75 @@
+import math
+from collections import deque
+from typing import Deque, Optional
+
+class LatencyTracker:
+    """
+    滑动窗口延迟统计
+
+    保留最近 window 个样本，用于估算延迟分位数（例如对冲请求的触发阈值）。
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        """记录一个延迟样本（秒）"""
+        self._samples.append(seconds)
+
+    @property
+    def count(self) -> int:
+        """当前窗口内的样本数"""
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        计算延迟分位数
+
+        Args:
+            q: 分位数，取值 0-100
+
+        Returns:
+            分位数对应的延迟（秒），样本不足 min_samples 时返回 None
+        """
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(0, math.ceil(q / 100.0 * len(ordered)) - 1)
+        return ordered[rank]
+
+class EwmaStats:
+    """
+    指数加权的延迟与错误率统计
+
+    新样本权重为 alpha，旧样本按指数衰减，能较快反映服务端的实时状态。
+    initial_latency 是没有实测数据时使用的先验值，第一个实测延迟会直接替换它。
+    """
+
+    def __init__(self, alpha: float = 0.2, initial_latency: float = 0.0) -> None:
+        self.alpha = alpha
+        self.latency = initial_latency
+        self.error_rate = 0.0
+        self.samples = 0
+        self._measured = False
+
+    def record(self, seconds: Optional[float], ok: bool) -> None:
+        """
+        记录一次请求结果
+
+        Args:
+            seconds: 请求耗时（秒），失败请求可以传 None，只更新错误率
+            ok: 请求是否成功
+        """
+        if seconds is not None:
+            if not self._measured:
+                self.latency = seconds
+                self._measured = True
+            else:
+                self.latency += self.alpha * (seconds - self.latency)
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        self.samples += 1
+
+    def expected_latency(self) -> float:
+        """考虑失败重试后的期望耗时（秒）：延迟 / 成功率"""
+        return self.latency / max(1.0 - self.error_rate, 0.05)
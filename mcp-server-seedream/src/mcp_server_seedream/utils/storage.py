@@ -0,0 +1,492 @@
+import asyncio
+import datetime
+import hashlib
+import hmac
+import os
+import urllib.parse
+import weakref
+import xml.etree.ElementTree as ElementTree
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .downloader import fetch_to_file, fetch_to_writer
+
+# 存储配置
+# 图片存储后端：local（本地文件系统）或 s3（S3 兼容对象存储）
+SEEDREAM_STORAGE = os.getenv("SEEDREAM_STORAGE", "local").lower()
+# S3 兼容服务地址，例如 http://127.0.0.1:9000（MinIO）；默认使用 AWS S3 的区域端点
+S3_ENDPOINT = os.getenv("SEEDREAM_S3_ENDPOINT", "")
+S3_BUCKET = os.getenv("SEEDREAM_S3_BUCKET", "")
+S3_REGION = os.getenv("SEEDREAM_S3_REGION", os.getenv("AWS_REGION", "us-east-1"))
+# 对象键前缀
+S3_PREFIX = os.getenv("SEEDREAM_S3_PREFIX", "seedream/")
+S3_ACCESS_KEY = os.getenv("SEEDREAM_S3_ACCESS_KEY", os.getenv("AWS_ACCESS_KEY_ID", ""))
+S3_SECRET_KEY = os.getenv("SEEDREAM_S3_SECRET_KEY", os.getenv("AWS_SECRET_ACCESS_KEY", ""))
+S3_SESSION_TOKEN = os.getenv("AWS_SESSION_TOKEN", "")
+# 寻址方式：path（bucket 在路径中，MinIO 等兼容服务通用）或 virtual（bucket 在域名中）
+S3_ADDRESSING = os.getenv("SEEDREAM_S3_ADDRESSING", "path").lower()
+# 分段上传的分段大小（字节），S3 要求除最后一段外至少 5 MB；小于一段的图片用单次 PUT 上传
+S3_PART_BYTES = max(int(os.getenv("SEEDREAM_S3_PART_BYTES", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+# 对象存储请求超时（秒）
+S3_TIMEOUT = float(os.getenv("SEEDREAM_S3_TIMEOUT", "60"))
+
+_UNRESERVED = "-_.~"
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+class StorageError(Exception):
+    """写入存储后端失败"""
+
+def sign_v4(
+    method: str,
+    host: str,
+    path: str,
+    query: Dict[str, str],
+    headers: Dict[str, str],
+    payload_hash: str,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    service: str = "s3",
+    session_token: Optional[str] = None,
+    now: Optional[datetime.datetime] = None
+) -> Dict[str, str]:
+    """
+    按 AWS Signature Version 4 为请求签名
+
+    Args:
+        method: HTTP 方法
+        host: 请求的 Host（含非默认端口）
+        path: 已按 URI 规则编码的路径
+        query: 查询参数（未编码）
+        headers: 需要签名的请求头
+        payload_hash: 请求体的 SHA-256（十六进制）
+        access_key / secret_key / session_token: 访问凭证
+        region: 区域
+        service: 服务名，S3 请求额外签名 x-amz-content-sha256
+        now: 签名时间，默认为当前 UTC 时间
+
+    Returns:
+        加上 Host、X-Amz-Date、Authorization 等签名头的完整请求头
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    datestamp = now.strftime("%Y%m%d")
+
+    signed = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed["host"] = host
+    signed["x-amz-date"] = amz_date
+    if service == "s3":
+        signed["x-amz-content-sha256"] = payload_hash
+    if session_token:
+        signed["x-amz-security-token"] = session_token
+
+    names = sorted(signed)
+    canonical_request = "\n".join([
+        method,
+        path,
+        canonical_query(query),
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        payload_hash
+    ])
+    scope = f"{datestamp}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    ])
+
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for part in (datestamp, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return signed
+
+def canonical_query(query: Dict[str, str]) -> str:
+    """按 SigV4 规则编码并排序查询参数（也直接用作请求 URL 的查询串，保证与签名一致）"""
+    return "&".join(
+        f"{urllib.parse.quote(name, safe=_UNRESERVED)}={urllib.parse.quote(value, safe=_UNRESERVED)}"
+        for name, value in sorted(query.items())
+    )
+
+class ImageWriter(ABC):
+    """
+    存储后端的流式写入器
+
+    下载过程中按顺序调用 write() 写入数据块，全部写完后调用 commit()；
+    下载失败或被取消时调用 abort() 清理已写入的部分。
+    """
+
+    content_type: Optional[str] = None
+
+    @abstractmethod
+    async def write(self, data: bytes) -> None:
+        """追加写入一个数据块"""
+
+    @abstractmethod
+    async def commit(self) -> str:
+        """完成写入，返回图片位置（本地路径或对象 URI）"""
+
+    @abstractmethod
+    async def abort(self) -> None:
+        """放弃写入，清理已写入的部分"""
+
+class StorageBackend(ABC):
+    """
+    图片存储后端
+
+    save() 把图片 URL 的内容直接流式写入存储，返回图片位置；
+    默认实现打开一个 ImageWriter，边下载边写入，不经过本地磁盘。
+    """
+
+    name = ""
+
+    @abstractmethod
+    def open(self, download_dir: str, filename: str) -> ImageWriter:
+        """创建写入指定文件的写入器"""
+
+    async def save(self, client: httpx.AsyncClient, url: str, download_dir: str, filename: str, timeout: float) -> str:
+        """
+        下载图片并写入存储
+
+        Args:
+            client: 下载使用的 HTTP 客户端
+            url: 图片地址
+            download_dir: 本地下载目录（对象存储不使用）
+            filename: 文件名
+            timeout: 单个 HTTP 请求的超时时间（秒）
+
+        Returns:
+            图片位置
+        """
+        return await fetch_to_writer(client, url, self.open(download_dir, filename), timeout)
+
+    async def save_bytes(self, data: bytes, download_dir: str, filename: str, content_type: Optional[str] = None) -> str:
+        """
+        把内存中的图片（例如本地缩放的结果）写入存储
+
+        Returns:
+            图片位置
+        """
+        writer = self.open(download_dir, filename)
+        writer.content_type = content_type
+        try:
+            await writer.write(data)
+            return await writer.commit()
+        except BaseException:
+            await asyncio.shield(asyncio.ensure_future(writer.abort()))
+            raise
+
+    async def aclose(self) -> None:
+        """释放后端在当前事件循环上持有的连接（停机时调用），后端仍可在其他事件循环中使用"""
+
+class LocalFileWriter(ImageWriter):
+    """本地文件写入器：写入临时文件，提交时原子替换为目标文件"""
+
+    def __init__(self, download_dir: str, filename: str) -> None:
+        self.download_dir = download_dir
+        self.file_path = os.path.join(download_dir, filename)
+        self._tmp_path = f"{self.file_path}.part"
+        self._file = None
+
+    async def _open(self) -> None:
+        def create():
+            os.makedirs(self.download_dir, exist_ok=True)
+            return open(self._tmp_path, "wb")
+        self._file = await asyncio.to_thread(create)
+
+    async def write(self, data: bytes) -> None:
+        if self._file is None:
+            await self._open()
+        await asyncio.to_thread(self._file.write, data)
+
+    async def commit(self) -> str:
+        if self._file is None:
+            await self._open()
+        await asyncio.to_thread(self._file.close)
+        await asyncio.to_thread(os.replace, self._tmp_path, self.file_path)
+        return os.path.abspath(self.file_path)
+
+    async def abort(self) -> None:
+        # 与 fetch_to_file 相同，临时文件在事件循环上同步删除
+        if self._file is not None:
+            self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+class LocalStorage(StorageBackend):
+    """本地文件系统：大文件按 Range 并行分段下载，写入临时文件后原子替换"""
+
+    name = "local"
+
+    def open(self, download_dir: str, filename: str) -> ImageWriter:
+        return LocalFileWriter(download_dir, filename)
+
+    async def save(self, client: httpx.AsyncClient, url: str, download_dir: str, filename: str, timeout: float) -> str:
+        # 文件系统操作可能很慢，不在事件循环上执行
+        await asyncio.to_thread(os.makedirs, download_dir, exist_ok=True)
+        file_path = os.path.join(download_dir, filename)
+        await fetch_to_file(client, url, file_path, timeout)
+        return os.path.abspath(file_path)
+
+class S3MultipartWriter(ImageWriter):
+    """
+    S3 对象写入器
+
+    数据在内存中累积到一个分段大小后上传，上一个分段上传的同时继续下载下一个分段，
+    内存占用最多两个分段。整张图片不足一个分段时在 commit() 中用单次 PUT 上传。
+    """
+
+    def __init__(self, storage: "S3Storage", key: str) -> None:
+        self.storage = storage
+        self.key = key
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Tuple[int, str]] = []
+        self._uploading: Optional["asyncio.Task[None]"] = None
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        while len(self._buffer) >= self.storage.part_bytes:
+            part = bytes(self._buffer[:self.storage.part_bytes])
+            del self._buffer[:self.storage.part_bytes]
+            await self._start_part(part)
+
+    async def _start_part(self, part: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = await self.storage.create_multipart_upload(self.key, self.content_type)
+        # 同时只上传一个分段：等待上一个分段完成后再开始下一个
+        if self._uploading is not None:
+            await self._uploading
+        number = len(self._parts) + 1
+        self._uploading = asyncio.ensure_future(self._upload_part(number, part))
+
+    async def _upload_part(self, number: int, part: bytes) -> None:
+        etag = await self.storage.upload_part(self.key, self._upload_id, number, part)
+        self._parts.append((number, etag))
+
+    async def commit(self) -> str:
+        if self._upload_id is None:
+            await self.storage.put_object(self.key, bytes(self._buffer), self.content_type)
+        else:
+            if self._buffer:
+                await self._start_part(bytes(self._buffer))
+            await self._uploading
+            await self.storage.complete_multipart_upload(self.key, self._upload_id, self._parts)
+        self._buffer = bytearray()
+        return self.storage.uri(self.key)
+
+    async def abort(self) -> None:
+        if self._uploading is not None:
+            # 已经失败结束的分段也要取回异常，否则事件循环会报告 "exception was never retrieved"
+            self._uploading.cancel()
+            await asyncio.gather(self._uploading, return_exceptions=True)
+        if self._upload_id is not None:
+            try:
+                await self.storage.abort_multipart_upload(self.key, self._upload_id)
+            except (httpx.HTTPError, StorageError):
+                # 清理失败时由存储桶的生命周期规则回收未完成的分段
+                pass
+        self._buffer = bytearray()
+
+class S3Storage(StorageBackend):
+    """
+    S3 兼容对象存储（AWS S3、MinIO 等）
+
+    直接用 httpx 发送 SigV4 签名请求，不依赖 AWS SDK。图片边下载边上传，
+    大图片使用分段上传，不在本地磁盘保留副本；返回 s3://bucket/key 形式的位置。
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        endpoint: str = S3_ENDPOINT,
+        region: str = S3_REGION,
+        prefix: str = S3_PREFIX,
+        access_key: str = S3_ACCESS_KEY,
+        secret_key: str = S3_SECRET_KEY,
+        session_token: str = S3_SESSION_TOKEN,
+        addressing: str = S3_ADDRESSING,
+        part_bytes: int = S3_PART_BYTES
+    ) -> None:
+        if not bucket:
+            raise ValueError("使用 s3 存储时必须设置 SEEDREAM_S3_BUCKET")
+        self.bucket = bucket
+        self.endpoint = (endpoint or f"https://s3.{region}.amazonaws.com").rstrip("/")
+        self.region = region
+        self.prefix = prefix
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token or None
+        self.addressing = addressing
+        self.part_bytes = part_bytes
+        # httpx.AsyncClient 绑定创建它的事件循环，按事件循环各保留一个连接池
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+    def uri(self, key: str) -> str:
+        """对象的 s3:// URI"""
+        return f"s3://{self.bucket}/{key}"
+
+    def open(self, download_dir: str, filename: str) -> ImageWriter:
+        return S3MultipartWriter(self, f"{self.prefix}{filename}")
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=S3_TIMEOUT)
+            self._clients[loop] = client
+        return client
+
+    async def read(self, key: str) -> bytes:
+        """读取对象内容"""
+        response = await self._request("GET", key)
+        return response.content
+
+    async def aclose(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        query: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """发送签名请求，失败时抛出 StorageError"""
+        query = query or {}
+        base = httpx.URL(self.endpoint)
+        quoted_key = urllib.parse.quote(key, safe="/" + _UNRESERVED)
+        if self.addressing == "virtual":
+            host = f"{self.bucket}.{base.netloc.decode('ascii')}"
+            path = f"{base.path.rstrip('/')}/{quoted_key}"
+        else:
+            host = base.netloc.decode("ascii")
+            path = f"{base.path.rstrip('/')}/{self.bucket}/{quoted_key}"
+        # SHA-256 计算放到线程中，分段较大时不阻塞事件循环
+        payload_hash = await asyncio.to_thread(lambda: hashlib.sha256(body).hexdigest()) if body else _EMPTY_SHA256
+        signed = sign_v4(
+            method, host, path, query, headers or {}, payload_hash,
+            self.access_key, self.secret_key, self.region, "s3", self.session_token
+        )
+        query_string = canonical_query(query)
+        url = f"{base.scheme}://{host}{path}" + (f"?{query_string}" if query_string else "")
+        try:
+            response = await self._client().request(method, url, headers=signed, content=body)
+        except httpx.HTTPError as e:
+            raise StorageError(f"对象存储请求失败: {e}") from e
+        if response.status_code >= 300:
+            raise StorageError(f"对象存储返回 HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    async def put_object(self, key: str, body: bytes, content_type: Optional[str] = None) -> None:
+        """单次 PUT 上传整个对象"""
+        await self._request("PUT", key, body=body, headers={"Content-Type": content_type} if content_type else None)
+
+    async def create_multipart_upload(self, key: str, content_type: Optional[str] = None) -> str:
+        """开始分段上传，返回 UploadId"""
+        response = await self._request(
+            "POST", key, {"uploads": ""},
+            headers={"Content-Type": content_type} if content_type else None
+        )
+        upload_id = _xml_text(response.content, "UploadId")
+        if not upload_id:
+            raise StorageError("对象存储未返回 UploadId")
+        return upload_id
+
+    async def upload_part(self, key: str, upload_id: str, number: int, body: bytes) -> str:
+        """上传一个分段，返回 ETag"""
+        response = await self._request(
+            "PUT", key, {"partNumber": str(number), "uploadId": upload_id}, body=body
+        )
+        etag = response.headers.get("ETag")
+        if not etag:
+            raise StorageError(f"分段 {number} 未返回 ETag")
+        return etag
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        """按分段编号合并所有分段"""
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in sorted(parts)
+        ) + "</CompleteMultipartUpload>"
+        response = await self._request(
+            "POST", key, {"uploadId": upload_id}, body=body.encode("utf-8"),
+            headers={"Content-Type": "application/xml"}
+        )
+        # 合并失败时 S3 可能返回 200 和错误内容
+        if _xml_text(response.content, "Code"):
+            raise StorageError(f"合并分段失败: {response.text[:200]}")
+
+    async def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        """放弃分段上传，删除已上传的分段"""
+        await self._request("DELETE", key, {"uploadId": upload_id})
+
+def _xml_text(content: bytes, tag: str) -> Optional[str]:
+    """读取 S3 XML 响应中第一个指定标签的文本（忽略命名空间）"""
+    if not content:
+        return None
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] == tag:
+            return element.text
+    return None
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """按 SEEDREAM_STORAGE 获取进程共享的存储后端"""
+    global _storage
+    if _storage is None:
+        if SEEDREAM_STORAGE == "local":
+            _storage = LocalStorage()
+        elif SEEDREAM_STORAGE == "s3":
+            _storage = S3Storage()
+        else:
+            raise ValueError(f"不支持的 SEEDREAM_STORAGE: {SEEDREAM_STORAGE}，可选 local、s3")
+    return _storage
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def read_location(location: str) -> bytes:
+    """
+    读取 StorageBackend.save() 返回的图片位置的内容
+
+    Args:
+        location: 本地文件路径或 s3://bucket/key
+
+    Returns:
+        图片内容
+    """
+    if not location.startswith("s3://"):
+        return await asyncio.to_thread(_read_file, location)
+    bucket, _, key = location[len("s3://"):].partition("/")
+    storage = get_storage()
+    if not isinstance(storage, S3Storage) or storage.bucket != bucket:
+        raise StorageError(f"当前存储后端无法读取 {location}")
+    return await storage.read(key)
+
+async def close_storage() -> None:
+    """关闭存储后端在当前事件循环上的连接（停机时调用），进程共享的后端实例和其他事件循环的连接保持不变"""
+    if _storage is not None:
+        await _storage.aclose()
@@ -0,0 +1,282 @@
+import asyncio
+import atexit
+import concurrent.futures
+import datetime
+import os
+import threading
+from typing import Any, Coroutine, Dict, List, Optional, Sequence, TypeVar
+
+from .api_client import DEFAULT_DOWNLOAD_DIR, close_http_client, download_image
+from .deadline import Deadline
+from .generation import generate_group, request_image
+from .gallery import gallery
+from .lazy_images import lazy_images
+from .models import model_registry
+from .records import ImageRecord
+from .storage import close_storage
+
+T = TypeVar("T")
+
+class SeedreamClient:
+    """
+    Seedream 同步客户端门面
+
+    在一个后台线程中运行专用的事件循环，所有调用都提交到该循环执行，
+    共享同一个 HTTP 连接池和优先级调度器。适合同步批处理脚本和 Celery 一类的 worker：
+
+    - generate() / download() 阻塞直到完成
+    - generate_future() / download_future() 立即返回 concurrent.futures.Future，
+      多个线程可以同时提交，请求在后台循环中并发执行；对 Future 调用 cancel() 会中止对应的请求和下载
+
+    Example:
+        with SeedreamClient() as client:
+            futures = [client.generate_future(p, response_format="local_file") for p in prompts]
+            results = [f.result() for f in futures]
+    """
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop,
+            name="seedream-client-loop",
+            daemon=True
+        )
+        self._closed = False
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _submit(self, coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """把协程提交到后台事件循环"""
+        if self._closed:
+            coro.close()
+            raise RuntimeError("SeedreamClient 已关闭")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _wait(self, future: "concurrent.futures.Future[T]") -> T:
+        """阻塞等待结果；在后台循环线程内阻塞会造成死锁，因此直接拒绝"""
+        if threading.current_thread() is self._thread:
+            future.cancel()
+            raise RuntimeError("不能在 SeedreamClient 的事件循环线程内调用阻塞接口，请使用 *_future 接口")
+        try:
+            return future.result()
+        except BaseException:
+            # 调用方被中断（如 KeyboardInterrupt）时取消后台任务，不再继续请求和下载
+            future.cancel()
+            raise
+
+    async def _generate(
+        self,
+        prompt: str,
+        size: str,
+        response_format: str,
+        download_dir: str,
+        optimize_prompt: bool,
+        latency_tier: str,
+        deadline_ms: Optional[int],
+        priority: str,
+        model: Optional[str],
+        model_policy: str,
+        guidance_scale: Optional[float],
+        seed: Optional[int]
+    ) -> Dict[str, Any]:
+        deadline = Deadline.for_tier(latency_tier, deadline_ms)
+        start_time = datetime.datetime.now()
+        generated = await request_image(
+            prompt, size, response_format, optimize_prompt,
+            priority=priority, latency_tier=latency_tier, deadline=deadline,
+            model=model_registry.select(model, model_policy),
+            guidance_scale=guidance_scale, seed=seed
+        )
+        result = {
+            "success": True,
+            "prompt": prompt,
+            "image_url": generated["image_url"],
+            "image_size": size,
+            "token_usage": generated["token_usage"],
+            "model_used": generated["model_used"],
+            "processing_time_ms": int((datetime.datetime.now() - start_time).total_seconds() * 1000),
+            "watermark": False
+        }
+        record = ImageRecord(
+            index=0,
+            prompt=prompt,
+            image_url=generated["image_url"],
+            image_size=size,
+            token_usage=generated["token_usage"]
+        )
+        # resource 格式只登记图像，调用 image_path() 时再下载
+        if response_format == "resource" and record.image_url:
+            await lazy_images.defer(record, generated["model_used"], download_dir)
+            if record.resource_uri is not None:
+                result["resource_uri"] = record.resource_uri
+        if response_format in ("local_file", "resource") and record.image_url and record.resource_uri is None:
+            record.local_path = await download_image(record.image_url, download_dir, deadline=deadline)
+            result["local_path"] = record.local_path
+            result["downloaded"] = True
+        if record.gallery_id is None:
+            record.gallery_id = await gallery.add(record, generated["model_used"], download_dir=download_dir)
+        if record.gallery_id is not None:
+            result["gallery_id"] = record.gallery_id
+        return result
+
+    def generate_future(
+        self,
+        prompt: str,
+        size: str = "2048x2048",
+        response_format: str = "url",
+        download_dir: str = DEFAULT_DOWNLOAD_DIR,
+        optimize_prompt: bool = True,
+        latency_tier: str = "standard",
+        deadline_ms: Optional[int] = None,
+        priority: str = "interactive",
+        model: Optional[str] = None,
+        model_policy: str = "default",
+        guidance_scale: Optional[float] = None,
+        seed: Optional[int] = None
+    ) -> "concurrent.futures.Future[Dict[str, Any]]":
+        """
+        提交一次图像生成，立即返回 Future
+
+        Args:
+            prompt: 提示词
+            size: 图像尺寸
+            response_format: 'url'、'b64_json'、'local_file' 或 'resource'（只登记图像，用 image_path() 按需下载）
+            download_dir: 'local_file' / 'resource' 时的下载目录
+            optimize_prompt: 是否优化提示词
+            latency_tier: 延迟档位
+            deadline_ms: 端到端时限（毫秒）
+            priority: 调度优先级
+            model: 指定模型名称或ID
+            model_policy: 未指定模型时的选择策略，'default' 或 'fastest'
+            guidance_scale: 文本权重（模型不支持时忽略）
+            seed: 随机数种子（模型不支持时忽略）
+
+        Returns:
+            结果为图像信息字典的 Future，失败时 Future 抛出 MCPError
+        """
+        return self._submit(self._generate(
+            prompt, size, response_format, download_dir, optimize_prompt,
+            latency_tier, deadline_ms, priority, model, model_policy, guidance_scale, seed
+        ))
+
+    def generate(self, prompt: str, **kwargs: Any) -> Dict[str, Any]:
+        """阻塞执行一次图像生成，参数同 generate_future"""
+        return self._wait(self.generate_future(prompt, **kwargs))
+
+    def generate_many(
+        self,
+        prompts: Sequence[str],
+        size: str = "2048x2048",
+        response_format: str = "url",
+        download_dir: str = DEFAULT_DOWNLOAD_DIR,
+        optimize_prompt: bool = True,
+        latency_tier: str = "standard",
+        deadline_ms: Optional[int] = None,
+        model: Optional[str] = None,
+        model_policy: str = "default",
+        guidance_scale: Optional[float] = None,
+        seed: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        阻塞并发生成一组图像（batch 优先级），参数含义同 generate_future
+
+        Returns:
+            按提示词顺序排列的图像信息列表，单张失败时对应项包含 error 字段
+        """
+        async def run() -> List[Dict[str, Any]]:
+            records = await generate_group(
+                prompts, size, response_format, download_dir, optimize_prompt,
+                priority="batch",
+                latency_tier=latency_tier,
+                deadline=Deadline.for_tier(latency_tier, deadline_ms),
+                model=model_registry.select(model, model_policy),
+                guidance_scale=guidance_scale,
+                seed=seed
+            )
+            return [record.to_dict() for record in records]
+
+        return self._wait(self._submit(run()))
+
+    def download_future(
+        self,
+        image_url: str,
+        download_dir: str = DEFAULT_DOWNLOAD_DIR,
+        deadline_ms: Optional[int] = None
+    ) -> "concurrent.futures.Future[str]":
+        """
+        提交一次图片下载，立即返回 Future
+
+        Returns:
+            结果为本地文件绝对路径的 Future
+        """
+        deadline = Deadline(deadline_ms) if deadline_ms is not None else None
+        return self._submit(download_image(image_url, download_dir, deadline=deadline))
+
+    def download(self, image_url: str, download_dir: str = DEFAULT_DOWNLOAD_DIR, deadline_ms: Optional[int] = None) -> str:
+        """阻塞下载图片，返回本地文件绝对路径"""
+        return self._wait(self.download_future(image_url, download_dir, deadline_ms))
+
+    def image_path_future(self, image_id: int) -> "concurrent.futures.Future[str]":
+        """
+        获取已生成图像的本地路径，图像尚未下载时先下载，立即返回 Future
+
+        Args:
+            image_id: 生成结果中的 gallery_id
+
+        Returns:
+            结果为本地文件路径（对象存储时为 s3://bucket/key）的 Future
+        """
+        return self._submit(lazy_images.materialize(image_id))
+
+    def image_path(self, image_id: int) -> str:
+        """阻塞获取已生成图像的本地路径，参数同 image_path_future"""
+        return self._wait(self.image_path_future(image_id))
+
+    @staticmethod
+    async def _close_loop_resources() -> None:
+        # 在后台循环中执行：只关闭该循环自己的 HTTP 客户端和存储连接，
+        # 服务器主循环（或其他 SeedreamClient）的连接继续可用
+        await close_http_client()
+        await close_storage()
+
+    def close(self) -> None:
+        """关闭后台事件循环的连接池并停止该事件循环"""
+        if self._closed:
+            return
+        self._closed = True
+        # fork 出的子进程中后台线程已不存在，只有父进程需要停止事件循环
+        if self._thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._close_loop_resources(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def __enter__(self) -> "SeedreamClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+_default_client: Optional[SeedreamClient] = None
+_default_client_lock = threading.Lock()
+
+def get_default_client() -> SeedreamClient:
+    """获取进程共享的默认同步客户端（首次调用时创建，进程退出时关闭）"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = SeedreamClient()
+            atexit.register(_default_client.close)
+        return _default_client
+
+def _reset_after_fork() -> None:
+    # fork 出的子进程（如 Celery prefork worker）中后台线程不存在，需要重新创建
+    global _default_client, _default_client_lock
+    _default_client = None
+    _default_client_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
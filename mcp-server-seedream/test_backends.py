@@ -0,0 +1,110 @@
+# 离线后端测试：mock 生成与下载、录制后回放
+import asyncio
+import json
+import struct
+
+import httpx
+import pytest
+
+from mcp_server_seedream.utils.backends import (
+    MOCK_IMAGE_HOST,
+    LatencyDistribution,
+    MockTransport,
+    RecordingTransport,
+    ReplayTransport,
+    mock_image_bytes,
+)
+
+API = "https://api.test/api/v3/images/generations"
+
+
+def _mock(image_bytes: int = 0) -> MockTransport:
+    return MockTransport(LatencyDistribution("fixed:0"), LatencyDistribution("fixed:0"), image_bytes=image_bytes)
+
+
+async def _generate(client: httpx.AsyncClient, prompt: str, size: str = "64x32") -> dict:
+    response = await client.post(
+        API, json={"model": "m", "prompt": prompt, "size": size},
+        headers={"Authorization": "Bearer secret-key"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def test_latency_distribution_specs():
+    assert LatencyDistribution("250").sample() == 0.25
+    assert 0.1 <= LatencyDistribution("uniform:100,200").sample() <= 0.2
+    assert LatencyDistribution("lognormal:800,0.5").sample() > 0
+    with pytest.raises(ValueError):
+        LatencyDistribution("gamma:1,2")
+
+
+def test_mock_generates_and_serves_png_with_ranges():
+    async def main():
+        async with httpx.AsyncClient(transport=_mock()) as client:
+            url = (await _generate(client, "一只猫"))["data"][0]["url"]
+            full = await client.get(url)
+            part = await client.get(url, headers={"Range": "bytes=0-7"})
+            return url, full, part
+
+    url, full, part = asyncio.run(main())
+    assert httpx.URL(url).host == MOCK_IMAGE_HOST
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert struct.unpack(">II", full.content[16:24]) == (64, 32)
+    assert part.status_code == 206
+    assert part.content == full.content[:8]
+
+
+def test_mock_pads_images_to_requested_size():
+    assert len(mock_image_bytes(16, 16, 50_000)) == 50_000
+
+
+def test_recorded_session_replays_offline(tmp_path):
+    cassette = str(tmp_path / "cassette.jsonl")
+
+    async def record():
+        async with httpx.AsyncClient(transport=RecordingTransport(_mock(image_bytes=20_000), cassette)) as client:
+            generated = await _generate(client, "一只猫")
+            image = await client.get(generated["data"][0]["url"])
+            return generated, len(image.content)
+
+    async def replay():
+        async with httpx.AsyncClient(transport=ReplayTransport(cassette, speed=0)) as client:
+            generated = await _generate(client, "一只猫")
+            image = await client.get(generated["data"][0]["url"])
+            return generated, len(image.content)
+
+    recorded, recorded_size = asyncio.run(record())
+    with open(cassette, encoding="utf-8") as f:
+        text = f.read()
+    assert "secret-key" not in text
+    assert [json.loads(line)["kind"] for line in text.splitlines()] == ["generation", "download"]
+
+    replayed, replayed_size = asyncio.run(replay())
+    assert replayed == recorded
+    assert replayed_size == recorded_size
+
+
+def test_replay_serves_png_content_type_for_jpeg_recordings(tmp_path):
+    cassette = tmp_path / "cassette.jsonl"
+    entries = [
+        {"kind": "generation", "request": {"prompt": "一只猫"}, "status": 200,
+         "body": json.dumps({"data": [{"url": "https://cdn.test/a.jpeg"}]}), "elapsed_ms": 0},
+        {"kind": "download", "url": "https://cdn.test/a.jpeg", "range": None, "status": 200,
+         "content_length": 0, "content_type": "image/jpeg", "elapsed_ms": 0},
+    ]
+    cassette.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+
+    async def main():
+        async with httpx.AsyncClient(transport=ReplayTransport(str(cassette), speed=0)) as client:
+            return await client.get("https://cdn.test/a.jpeg")
+
+    response = asyncio.run(main())
+    # 回放的是模拟 PNG，Content-Type 必须与内容一致
+    assert response.content.startswith(b"\x89PNG")
+    assert response.headers["Content-Type"] == "image/png"
+
+
+def test_replay_requires_a_cassette(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ReplayTransport(str(tmp_path / "missing.jsonl"))
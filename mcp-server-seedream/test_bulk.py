@@ -0,0 +1,153 @@
+# JSONL 批量生成测试：API 通过 httpx.MockTransport 模拟，不访问网络
+import asyncio
+import json
+import threading
+
+import httpx
+
+from mcp_server_seedream.utils import api_client, bulk
+
+
+async def _api(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(0.005)
+    return httpx.Response(200, json={
+        "data": [{"url": "https://img.test/a.png"}],
+        "usage": {"total_tokens": 16}
+    })
+
+
+async def _bulk(*args, **kwargs):
+    api_client._http_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+        transport=httpx.MockTransport(_api)
+    )
+    try:
+        return await bulk.run_bulk_generation(*args, **kwargs)
+    finally:
+        await api_client.close_http_client()
+
+
+def _run(tmp_path, lines, **kwargs):
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    output_path = tmp_path / "out" / "results.jsonl"
+    summary = asyncio.run(_bulk(
+        str(input_path), str(output_path), "1K", "url", None, False, "standard", 4, **kwargs
+    ))
+    results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    return summary, results
+
+
+def test_bulk_writes_one_result_per_line(tmp_path):
+    lines = [json.dumps({"id": f"sku-{i}", "prompt": f"产品图 {i}"}, ensure_ascii=False) for i in range(10)]
+    lines[3] = "{not json"
+    lines.insert(5, "")
+    summary, results = _run(tmp_path, lines)
+
+    assert summary["total_prompts"] == 10
+    assert summary["successful_images"] == 9
+    assert summary["invalid_lines"] == 1
+    assert len(results) == 10
+    assert sorted(r["id"] for r in results if r["success"]) == sorted(f"sku-{i}" for i in range(10) if i != 3)
+    assert [r for r in results if not r["success"]][0]["line"] == 4
+
+
+def test_bulk_file_io_runs_off_the_event_loop_in_batches(tmp_path, monkeypatch):
+    writes = []
+    write_lines = bulk._write_lines
+
+    def record(out, lines):
+        writes.append((threading.current_thread() is threading.main_thread(), len(lines)))
+        write_lines(out, lines)
+
+    monkeypatch.setattr(bulk, "_write_lines", record)
+    monkeypatch.setattr(bulk, "BULK_WRITE_BATCH", 5)
+    monkeypatch.setattr(bulk, "BULK_FLUSH_INTERVAL", 3600)
+    summary, results = _run(tmp_path, [f'"提示词 {i}"' for i in range(12)])
+
+    assert summary["successful_images"] == 12 and len(results) == 12
+    # 12 条结果：中途按 5 条一批写入，剩余部分在结束时与关闭文件一起写入
+    assert writes and all(not on_loop for on_loop, _ in writes)
+    assert all(count >= 5 for _, count in writes)
+
+
+def test_cancelled_bulk_keeps_completed_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_FLUSH_INTERVAL", 3600)
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text("\n".join(f'"提示词 {i}"' for i in range(200)) + "\n", encoding="utf-8")
+    output_path = tmp_path / "results.jsonl"
+
+    async def main():
+        task = asyncio.create_task(_bulk(
+            str(input_path), str(output_path), "1K", "url", None, False, "standard", 4
+        ))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert 0 < len(results) < 200
+    assert all(r["success"] for r in results)
+
+
+def test_bulk_refuses_to_overwrite_its_input(tmp_path):
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text('"提示词"\n', encoding="utf-8")
+
+    try:
+        asyncio.run(_bulk(
+            str(input_path), str(tmp_path / "." / "prompts.jsonl"), "1K", "url", None, False, "standard", 4
+        ))
+    except bulk.MCPError as e:
+        assert "相同" in e.message
+    else:
+        raise AssertionError("输出与输入相同时应报错")
+    assert input_path.read_text(encoding="utf-8") == '"提示词"\n'
+
+
+def test_bulk_reports_unrecognised_line_size_as_failed(tmp_path):
+    lines = [
+        json.dumps({"id": "ok", "prompt": "产品图", "size": "2K"}),
+        json.dumps({"id": "bad", "prompt": "产品图", "size": "huge"}),
+        json.dumps({"id": "wrong-type", "prompt": "产品图", "size": 1024})
+    ]
+    summary, results = _run(tmp_path, lines)
+
+    assert summary["successful_images"] == 1
+    assert summary["invalid_lines"] == 2
+    failed = [r for r in results if not r["success"]]
+    assert sorted(r["line"] for r in failed) == [2, 3]
+    assert all("无法识别的尺寸" in r["error"] for r in failed)
+
+
+def test_bulk_flushes_on_a_timer_while_generation_is_slow(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_FLUSH_INTERVAL", 0.05)
+
+    async def api(request: httpx.Request) -> httpx.Response:
+        if "慢" in json.loads(request.content)["prompt"]:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"data": [{"url": "https://img.test/a.png"}]})
+
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text('"快"\n"慢"\n', encoding="utf-8")
+    output_path = tmp_path / "results.jsonl"
+
+    async def main():
+        api_client._http_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(api)
+        )
+        try:
+            task = asyncio.create_task(bulk.run_bulk_generation(
+                str(input_path), str(output_path), "1K", "url", None, False, "standard", 4
+            ))
+            await asyncio.sleep(0.5)
+            # 第二条仍在生成，第一条的结果已经按时写入
+            written = output_path.read_text(encoding="utf-8").splitlines()
+            await task
+            return written
+        finally:
+            await api_client.close_http_client()
+
+    written = asyncio.run(main())
+    assert len(written) == 1 and json.loads(written[0])["line"] == 1
+    assert len(output_path.read_text(encoding="utf-8").splitlines()) == 2
@@ -0,0 +1,84 @@
+# 取消测试：客户端取消后，排队和进行中的请求立即中止并归还调度槽位
+import asyncio
+import time
+
+import pytest
+
+from mcp_server_seedream import server
+from mcp_server_seedream.utils import backends
+from mcp_server_seedream.utils.api_client import close_http_client
+from mcp_server_seedream.utils.inflight import InflightTracker, inflight
+from mcp_server_seedream.utils.scheduler import get_scheduler
+from mcp_server_seedream.utils.sync_client import SeedreamClient
+
+
+async def _wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.01)
+
+
+def test_tracker_counts_cancelled_tasks():
+    tracker = InflightTracker()
+
+    async def main():
+        async def tracked():
+            async with tracker.track():
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(tracked())
+        await _wait_until(lambda: tracker.active == 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert (tracker.active, tracker.cancelled) == (0, 1)
+
+
+def test_cancelled_tool_call_aborts_request(monkeypatch):
+    # mock 后端生成耗时 5 秒，调用在请求进行中被取消
+    monkeypatch.setattr(backends, "SEEDREAM_MOCK_LATENCY_MS", "fixed:5000")
+    cancelled_before = inflight.cancelled
+
+    async def main():
+        scheduler = get_scheduler()
+        call = asyncio.ensure_future(server.generate_image(
+            server.GenerateImageInput(prompt="一只猫", response_format="url")
+        ))
+        try:
+            await _wait_until(lambda: scheduler.active == 1)
+            started = time.monotonic()
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+            return time.monotonic() - started, scheduler.active
+        finally:
+            await close_http_client()
+
+    elapsed, active = asyncio.run(main())
+    assert elapsed < 1
+    assert active == 0
+    assert inflight.active == 0
+    assert inflight.cancelled == cancelled_before + 1
+
+
+def test_cancelled_future_releases_the_client_loop(monkeypatch):
+    monkeypatch.setattr(backends, "SEEDREAM_MOCK_LATENCY_MS", "fixed:5000")
+
+    async def active_slots() -> int:
+        return get_scheduler().active
+
+    def wait_for_slots(client, expected):
+        deadline = time.monotonic() + 5
+        while client._submit(active_slots()).result() != expected:
+            assert time.monotonic() < deadline, "等待超时"
+            time.sleep(0.01)
+
+    with SeedreamClient() as client:
+        future = client.generate_future("一只猫", optimize_prompt=False)
+        wait_for_slots(client, 1)
+        assert future.cancel()
+        wait_for_slots(client, 0)
+    assert future.cancelled()
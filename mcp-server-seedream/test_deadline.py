@@ -0,0 +1,78 @@
+# 端到端时限测试：生成请求走离线 mock 后端
+import asyncio
+
+import pytest
+
+from mcp_server_seedream.utils import backends
+from mcp_server_seedream.utils.api_client import close_http_client
+from mcp_server_seedream.utils.deadline import LATENCY_TIERS, Deadline, optimize_mode_for_tier
+from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.generation import generate_group_item, is_deadline_error
+
+
+def test_tier_defaults_and_explicit_budget():
+    assert Deadline.for_tier("fast").budget_ms == LATENCY_TIERS["fast"]["deadline_ms"]
+    assert Deadline.for_tier("standard", deadline_ms=500).budget_ms == 500
+    assert optimize_mode_for_tier("fast") == "fast"
+
+
+def test_step_timeout_is_clamped_to_remaining_time():
+    deadline = Deadline(1000)
+    assert deadline.timeout(60) <= 1.0
+    assert deadline.timeout(0.2) == 0.2
+
+    expired = Deadline(0)
+    assert expired.expired
+    assert expired.timeout(60) == 0
+
+
+def test_run_raises_deadline_exceeded():
+    with pytest.raises(MCPError) as excinfo:
+        asyncio.run(Deadline(50).run(asyncio.sleep(1), "API请求"))
+    assert excinfo.value.error_code == "DEADLINE_EXCEEDED"
+    assert "50 ms" in excinfo.value.message
+
+
+def test_run_keeps_timeouts_raised_inside_the_step():
+    async def read_timeout():
+        await asyncio.sleep(0)
+        raise TimeoutError("读超时")
+
+    # 步骤自身的超时不是截止时间到期，不能被改写为 DEADLINE_EXCEEDED
+    with pytest.raises(TimeoutError, match="读超时"):
+        asyncio.run(Deadline(10_000).run(read_timeout(), "下载"))
+
+
+def test_run_propagates_outer_cancellation():
+    async def main():
+        step = asyncio.ensure_future(asyncio.sleep(10))
+        task = asyncio.ensure_future(Deadline(10_000).run(step, "API请求"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return step.cancelled()
+
+    assert asyncio.run(main())
+
+
+def test_slow_generation_is_marked_deadline_exceeded(monkeypatch):
+    # mock 后端生成耗时 1.5 秒，时限只有 100 ms
+    monkeypatch.setattr(backends, "SEEDREAM_MOCK_LATENCY_MS", "fixed:1500")
+
+    async def main():
+        try:
+            return await generate_group_item(
+                0, "一只猫", "1024x1024", "url", None, False, deadline=Deadline(100)
+            )
+        finally:
+            await close_http_client()
+
+    record = asyncio.run(main())
+    assert record.success is False
+    assert record.deadline_exceeded is True
+
+
+def test_is_deadline_error_ignores_other_errors():
+    assert not is_deadline_error(MCPError("失败", error_code="API_ERROR"))
+    assert not is_deadline_error(ValueError("x"))
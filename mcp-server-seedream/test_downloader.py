@@ -0,0 +1,105 @@
+# 下载测试：分段下载和对冲请求，服务端通过 httpx.MockTransport 模拟，不访问网络
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+from mcp_server_seedream.utils import downloader
+from mcp_server_seedream.utils.stats import LatencyTracker
+
+BLOB = bytes(range(256)) * 40
+
+
+def _range_server(requests, fail_range=None):
+    """支持 Range 的图片服务器，fail_range 指定的分段返回 500"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        header = request.headers.get("Range")
+        requests.append(header)
+        if header is None:
+            return httpx.Response(200, content=BLOB, headers={"Accept-Ranges": "bytes"})
+        if header == fail_range:
+            return httpx.Response(500)
+        start, end = (int(value) for value in header[len("bytes="):].split("-"))
+        return httpx.Response(206, content=BLOB[start:end + 1])
+    return handler
+
+
+def _fetch(handler, file_path):
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await downloader.fetch_to_file(client, "http://img.test/a.png", file_path, timeout=10)
+    return asyncio.run(main())
+
+
+def test_large_download_is_split_into_ranges(monkeypatch, tmp_path):
+    monkeypatch.setattr(downloader, "RANGED_DOWNLOAD_THRESHOLD", 1024)
+    monkeypatch.setattr(downloader, "RANGED_DOWNLOAD_PARTS", 4)
+    requests = []
+    target = tmp_path / "a.png"
+
+    assert _fetch(_range_server(requests), str(target)) == len(BLOB)
+    assert target.read_bytes() == BLOB
+    # 第一个分段复用普通 GET 的响应，其余三个分段各发一个 Range 请求
+    assert requests == [None, "bytes=2560-5119", "bytes=5120-7679", "bytes=7680-10239"]
+    assert not os.path.exists(f"{target}.part")
+
+
+def test_small_download_is_sequential(monkeypatch, tmp_path):
+    monkeypatch.setattr(downloader, "RANGED_DOWNLOAD_THRESHOLD", len(BLOB) + 1)
+    requests = []
+    target = tmp_path / "a.png"
+
+    assert _fetch(_range_server(requests), str(target)) == len(BLOB)
+    assert target.read_bytes() == BLOB
+    assert requests == [None]
+
+
+def test_failed_range_leaves_no_partial_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(downloader, "RANGED_DOWNLOAD_THRESHOLD", 1024)
+    monkeypatch.setattr(downloader, "RANGED_DOWNLOAD_PARTS", 4)
+    target = tmp_path / "a.png"
+
+    with pytest.raises(httpx.HTTPError):
+        _fetch(_range_server([], fail_range="bytes=5120-7679"), str(target))
+    assert os.listdir(tmp_path) == []
+
+
+def test_slow_first_byte_triggers_hedged_request(monkeypatch):
+    tracker = LatencyTracker()
+    for _ in range(tracker.min_samples):
+        tracker.record(0.01)
+    monkeypatch.setattr(downloader, "ttfb_tracker", tracker)
+    monkeypatch.setattr(downloader, "HEDGED_DOWNLOADS", True)
+    sent = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        if len(sent) == 1:
+            # 第一个请求落在慢节点上
+            await asyncio.sleep(5)
+        return httpx.Response(200, content=b"image")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            started = time.monotonic()
+            response = await downloader.send_hedged(
+                client, lambda: client.build_request("GET", "http://img.test/a.png")
+            )
+            try:
+                return await response.aread(), time.monotonic() - started
+            finally:
+                await response.aclose()
+
+    body, elapsed = asyncio.run(main())
+    assert body == b"image"
+    assert len(sent) == 2
+    assert elapsed < 1
+
+
+def test_hedging_needs_enough_samples(monkeypatch):
+    monkeypatch.setattr(downloader, "ttfb_tracker", LatencyTracker())
+    assert downloader.hedge_delay() is None
+    monkeypatch.setattr(downloader, "HEDGED_DOWNLOADS", False)
+    assert downloader.hedge_delay() is None
@@ -0,0 +1,65 @@
+# 多端点路由测试：请求通过 httpx.MockTransport 模拟，不访问网络
+import asyncio
+
+import httpx
+import pytest
+
+from mcp_server_seedream.utils import api_client
+from mcp_server_seedream.utils.endpoints import EndpointRouter, is_failover_error
+from mcp_server_seedream.utils.errors import MCPError
+
+
+def _status_error(method: str, status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request(method, "http://a.test/")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+def test_failover_only_when_the_request_was_not_processed():
+    assert is_failover_error(httpx.ConnectError("refused"), "POST")
+    assert is_failover_error(_status_error("POST", 503), "POST")
+    # 502/504 可能发生在上游已接受并计费之后，生成请求不能重发
+    assert not is_failover_error(_status_error("POST", 502), "POST")
+    assert not is_failover_error(_status_error("POST", 504), "POST")
+    assert is_failover_error(_status_error("GET", 502), "GET")
+    assert not is_failover_error(_status_error("POST", 400), "POST")
+    assert not is_failover_error(httpx.ReadTimeout("timeout"), "GET")
+
+
+def _run(monkeypatch, method: str, first_status: int):
+    hosts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if len(hosts) == 1:
+            return httpx.Response(first_status, json={"message": "upstream error"})
+        return httpx.Response(200, json={"ok": True})
+
+    router = EndpointRouter(["http://a.test", "http://b.test"])
+    monkeypatch.setattr(api_client, "endpoint_router", router)
+
+    async def main():
+        api_client._http_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await api_client._request_with_retry(method, "images", {}, None, {"prompt": "cat"})
+        finally:
+            await api_client.close_http_client()
+
+    return hosts, router, main
+
+
+def test_post_fails_over_on_503(monkeypatch):
+    hosts, router, main = _run(monkeypatch, "POST", 503)
+
+    assert asyncio.run(main()) == {"ok": True}
+    assert len(hosts) == 2 and hosts[0] != hosts[1]
+    assert sum(endpoint["failovers"] for endpoint in router.snapshot()) == 1
+
+
+def test_post_is_not_resent_after_502(monkeypatch):
+    hosts, router, main = _run(monkeypatch, "POST", 502)
+
+    with pytest.raises(MCPError):
+        asyncio.run(main())
+    assert len(hosts) == 1
@@ -0,0 +1,48 @@
+# 生成结果记录与格式化测试
+import json
+
+from mcp_server_seedream.utils.formatters import format_response
+from mcp_server_seedream.utils.records import GenerationResult, ImageRecord
+
+
+def _result() -> GenerationResult:
+    result = GenerationResult(model_used="doubao-seedream-4-0-250828")
+    result.add(ImageRecord(index=1, prompt="猫", image_url="https://x/1.png", token_usage=100))
+    result.add(ImageRecord(index=2, prompt="狗", image_url="https://x/2.png", token_usage=50,
+                           local_path="/tmp/2.png", downloaded=True))
+    result.add(ImageRecord(index=3, prompt="鸟", success=False, error="超时", deadline_exceeded=True))
+    return result
+
+
+def test_counters_are_maintained_incrementally():
+    result = _result()
+
+    assert result.successful_images == 2
+    assert result.downloaded_images == 1
+    assert result.total_token_usage == 150
+    assert result.deadline_exceeded
+
+
+def test_concise_json_uses_counters():
+    data = json.loads(format_response(_result(), format="json", detail="concise"))
+
+    assert data["total_images"] == 3
+    assert data["token_usage"] == 150
+    assert data["downloaded_paths"] == ["/tmp/2.png"]
+
+
+def test_rendering_reflects_records_added_later():
+    result = _result()
+    before = format_response(result, format="json", detail="detailed")
+    result.add(ImageRecord(index=4, prompt="鱼", image_url="https://x/4.png", token_usage=10))
+    after = json.loads(format_response(result, format="json", detail="detailed"))
+
+    assert before != json.dumps(after, indent=2, ensure_ascii=False)
+    assert len(after["images"]) == 4
+
+
+def test_markdown_lists_failures():
+    text = format_response(_result(), format="markdown", detail="detailed")
+
+    assert "超时" in text
+    assert "/tmp/2.png" in text
@@ -0,0 +1,127 @@
+# 图库测试：记录、全文检索、旧数据库迁移
+import asyncio
+import hashlib
+import sqlite3
+
+from mcp_server_seedream.utils.gallery import Gallery
+from mcp_server_seedream.utils.records import ImageRecord
+
+
+def _record(prompt, size="1K", url="https://img.test/a.png", local_path=None):
+    return ImageRecord(index=0, prompt=prompt, image_url=url, image_size=size, token_usage=10, local_path=local_path)
+
+
+def test_find_by_keywords_prompt_and_filters(tmp_path):
+    gallery = Gallery(str(tmp_path / "gallery.db"), enabled=True)
+    image = tmp_path / "cat.png"
+    image.write_bytes(b"png")
+
+    async def main():
+        cat = await gallery.add(_record("一只橘猫在沙发上睡觉", local_path=str(image)), "model-a")
+        dog = await gallery.add(_record("一只小狗在草地上奔跑", size="2K"), "model-b")
+        return cat, dog, {
+            "fts": await gallery.find(query="橘猫在沙发"),
+            "short": await gallery.find(query="小狗"),
+            "both": await gallery.find(query="一只 在"),
+            "prompt": await gallery.find(prompt="一只小狗在草地上奔跑"),
+            "size": await gallery.find(size="2K"),
+            "model": await gallery.find(model="model-a"),
+            "none": await gallery.find(query="老虎"),
+        }
+
+    cat, dog, found = asyncio.run(main())
+    ids = {name: [item["id"] for item in items] for name, items in found.items()}
+    assert ids == {
+        "fts": [cat], "short": [dog], "both": [dog, cat],
+        "prompt": [dog], "size": [dog], "model": [cat], "none": [],
+    }
+    match = found["fts"][0]
+    assert match["digest"] == hashlib.sha256(b"png").hexdigest()
+    assert match["file_bytes"] == 3
+    assert match["resource_uri"] == f"seedream://images/{cat}"
+    gallery.close()
+
+
+def test_local_only_skips_deleted_files(tmp_path):
+    gallery = Gallery(str(tmp_path / "gallery.db"), enabled=True)
+    kept, deleted = tmp_path / "kept.png", tmp_path / "deleted.png"
+    kept.write_bytes(b"1")
+    deleted.write_bytes(b"2")
+
+    async def main():
+        kept_id = await gallery.add(_record("保留的图片", local_path=str(kept)), "m")
+        await gallery.add(_record("删除的图片", local_path=str(deleted)), "m")
+        await gallery.add(_record("没有下载的图片"), "m")
+        deleted.unlink()
+        return kept_id, await gallery.find(local_only=True)
+
+    kept_id, found = asyncio.run(main())
+    assert [item["id"] for item in found] == [kept_id]
+    gallery.close()
+
+
+def test_records_without_image_are_skipped(tmp_path):
+    gallery = Gallery(str(tmp_path / "gallery.db"), enabled=True)
+    disabled = Gallery(str(tmp_path / "disabled.db"), enabled=False)
+
+    async def main():
+        return (
+            await gallery.add(_record("b64 图像", url=None), "m"),
+            await disabled.add(_record("一只猫"), "m"),
+        )
+
+    assert asyncio.run(main()) == (None, None)
+    assert not (tmp_path / "disabled.db").exists()
+    gallery.close()
+
+
+def test_old_database_gains_download_dir_and_set_location(tmp_path):
+    path = str(tmp_path / "gallery.db")
+    old = sqlite3.connect(path)
+    old.execute(
+        "CREATE TABLE images (id INTEGER PRIMARY KEY, prompt TEXT NOT NULL, size TEXT, model TEXT, "
+        "token_usage INTEGER NOT NULL DEFAULT 0, image_url TEXT, local_path TEXT, digest TEXT, "
+        "file_bytes INTEGER, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+    )
+    old.execute("INSERT INTO images (prompt, created_at, updated_at) VALUES ('旧记录', 'x', 'x')")
+    old.commit()
+    old.close()
+    gallery = Gallery(path, enabled=True)
+    image = tmp_path / "later.png"
+    image.write_bytes(b"later")
+
+    async def main():
+        image_id = await gallery.add(_record("延迟下载的图片"), "m", download_dir=str(tmp_path))
+        await gallery.set_location(image_id, str(image))
+        return await gallery.get(image_id), await gallery.get(1)
+
+    new, legacy = asyncio.run(main())
+    assert new["download_dir"] == str(tmp_path)
+    assert new["local_path"] == str(image) and new["file_bytes"] == 5
+    assert legacy["prompt"] == "旧记录" and legacy["download_dir"] is None
+    gallery.close()
+
+
+def test_disabled_gallery_finds_nothing(tmp_path):
+    gallery = Gallery(str(tmp_path / "gallery.db"), enabled=False)
+    assert asyncio.run(gallery.find(query="一只橘猫")) == []
+    assert not (tmp_path / "gallery.db").exists()
+
+
+def test_download_claim_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "gallery.db")
+    # 两个实例各自持有连接，相当于共享图库的两个进程
+    first, second = Gallery(path, enabled=True), Gallery(path, enabled=True)
+
+    async def main():
+        image_id = await first.add(_record("一只橘猫"), "model-a")
+        claims = [await first.claim_download(image_id, 60), await second.claim_download(image_id, 60)]
+        await first.release_download(image_id)
+        claims.append(await second.claim_download(image_id, 60))
+        # 认领方异常退出没有释放：超过有效时间后可以重新认领
+        claims.append(await first.claim_download(image_id, 0))
+        await first.set_location(image_id, str(tmp_path / "cat.png"))
+        claims.append(await second.claim_download(image_id, 60))
+        return claims
+
+    assert asyncio.run(main()) == [True, False, True, True, True]
@@ -0,0 +1,69 @@
+# HTTP 部署测试：停机时进行中的工具调用应完成并返回结果，API 通过 httpx.MockTransport 模拟
+import asyncio
+import json
+import socket
+
+import httpx
+import uvicorn
+
+from mcp_server_seedream import http_app
+from mcp_server_seedream.utils import api_client
+from mcp_server_seedream.utils.inflight import inflight
+
+
+async def _slow_api(request: httpx.Request) -> httpx.Response:
+    # 生成请求耗时 1.5 秒，停机在请求进行中开始
+    await asyncio.sleep(1.5)
+    return httpx.Response(200, json={
+        "data": [{"url": "https://img.test/a.png"}],
+        "usage": {"total_tokens": 16}
+    })
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_inflight_call_completes_during_shutdown():
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        http_app.create_app(), host="127.0.0.1", port=port, log_level="warning",
+        timeout_graceful_shutdown=http_app.graceful_shutdown_timeout()
+    ))
+
+    async def main():
+        api_client._http_clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(_slow_api)
+        )
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        # 直接发送 JSON-RPC 请求：停机开始后服务器不再接受新连接，客户端不能再发起其他请求
+        async with httpx.AsyncClient(timeout=30) as client:
+            call = asyncio.create_task(client.post(
+                f"http://127.0.0.1:{port}{http_app.HTTP_PATH}",
+                json={
+                    "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                    "params": {"name": "generate_image", "arguments": {"input": {"prompt": "一只猫", "response_format": "url"}}}
+                },
+                headers={"Accept": "application/json, text/event-stream"}
+            ))
+            while inflight.active == 0:
+                await asyncio.sleep(0.05)
+            server.should_exit = True
+            response = await call
+        await serving
+        return response
+
+    response = asyncio.run(main())
+    assert response.status_code == 200
+    result = response.json()["result"]
+    assert result["isError"] is False
+    assert json.loads(result["content"][0]["text"])["success"] is True
+    assert inflight.active == 0
+
+
+def test_graceful_timeout_covers_shutdown_grace():
+    assert http_app.graceful_shutdown_timeout() >= http_app.SHUTDOWN_GRACE_SECONDS
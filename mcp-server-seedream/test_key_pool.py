@@ -0,0 +1,47 @@
+# 密钥池测试
+import asyncio
+import threading
+
+from mcp_server_seedream.utils.key_pool import KeyPool
+
+
+def test_throttled_and_rejected_keys_are_skipped():
+    pool = KeyPool(["key-aaaaaaaa", "key-bbbbbbbb", "key-cccccccc"])
+
+    async def main():
+        first = await pool.acquire()
+        pool.release(first)
+        pool.throttled(first, retry_after=60)
+        second = await pool.acquire()
+        pool.release(second)
+        pool.rejected(second)
+        third = await pool.acquire()
+        pool.release(third)
+        return first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert len({first.token, second.token, third.token}) == 3
+    assert {key["state"] for key in pool.snapshot()} == {"cooling", "disabled", "healthy"}
+    assert pool.has_available()
+
+
+def test_shared_pool_is_consistent_across_threads():
+    # 服务器事件循环和同步客户端线程共用同一个密钥池
+    pool = KeyPool(["key-aaaaaaaa", "key-bbbbbbbb"])
+    per_thread = 2000
+
+    async def worker():
+        for _ in range(per_thread):
+            key = await pool.acquire()
+            pool.succeeded(key)
+            pool.release(key)
+
+    threads = [threading.Thread(target=asyncio.run, args=(worker(),)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = pool.snapshot()
+    assert sum(key["requests"] for key in snapshot) == 4 * per_thread
+    assert all(key["in_flight"] == 0 for key in snapshot)
@@ -0,0 +1,110 @@
+# 延迟下载测试：resource 格式生成时不下载，首次读取资源时只下载一次
+import asyncio
+import base64
+import json
+import threading
+
+import pytest
+from fastmcp import Client
+
+from mcp_server_seedream import server
+from mcp_server_seedream.utils.api_client import close_http_client
+from mcp_server_seedream.utils.backends import MOCK_IMAGE_HOST, MockTransport
+from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.generation import generate_group_item
+from mcp_server_seedream.utils.lazy_images import lazy_images
+
+
+@pytest.fixture
+def image_gets(monkeypatch):
+    """记录 mock 图片 CDN 收到的下载请求"""
+    gets = []
+    real_handle = MockTransport.handle_async_request
+
+    async def handle(self, request):
+        if request.url.host == MOCK_IMAGE_HOST:
+            gets.append(str(request.url))
+        return await real_handle(self, request)
+
+    monkeypatch.setattr(MockTransport, "handle_async_request", handle)
+    return gets
+
+
+def test_concurrent_reads_download_once(tmp_path, image_gets):
+    async def main():
+        try:
+            record = await generate_group_item(0, "一只猫", "64x64", "resource", str(tmp_path), False)
+            gets_after_generate = len(image_gets)
+            reads = await asyncio.gather(*(lazy_images.read(record.gallery_id) for _ in range(5)))
+            again = await lazy_images.read(record.gallery_id)
+            return record, gets_after_generate, reads, again
+        finally:
+            await close_http_client()
+
+    record, gets_after_generate, reads, again = asyncio.run(main())
+    assert record.resource_uri == f"seedream://images/{record.gallery_id}"
+    assert record.local_path is None
+    assert gets_after_generate == 0
+    assert len(image_gets) == 1
+    assert all(read == reads[0] for read in reads) and again == reads[0]
+    assert reads[0][1] == "image/png"
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_unknown_image_is_not_found():
+    with pytest.raises(MCPError) as excinfo:
+        asyncio.run(lazy_images.read(10 ** 9))
+    assert excinfo.value.error_code == "IMAGE_NOT_FOUND"
+
+
+def test_resource_format_through_the_server(tmp_path, image_gets):
+    async def main():
+        async with Client(server.mcp) as client:
+            result = await client.call_tool("generate_image", {"input": {
+                "prompt": "一只猫", "size": "64x64", "response_format": "resource",
+                "download_dir": str(tmp_path), "optimize_prompt": False
+            }})
+            resource_uri = json.loads(result.content[0].text)["resource_uri"]
+            gets_after_generate = len(image_gets)
+            contents = await client.read_resource(resource_uri)
+        await close_http_client()
+        return gets_after_generate, contents
+
+    gets_after_generate, contents = asyncio.run(main())
+    assert gets_after_generate == 0
+    assert len(image_gets) == 1
+    assert contents[0].mime_type == "image/png"
+    assert base64.b64decode(contents[0].blob).startswith(b"\x89PNG")
+
+
+def test_reads_from_separate_event_loops_download_once(tmp_path, image_gets, monkeypatch):
+    from mcp_server_seedream.utils import backends, lazy_images as lazy_module
+
+    async def generate():
+        try:
+            return await generate_group_item(0, "一只猫", "64x64", "resource", str(tmp_path), False)
+        finally:
+            await close_http_client()
+
+    record = asyncio.run(generate())
+    # 每个线程有自己的事件循环和进程内下载表，相当于多个 HTTP worker 进程，只能通过图库认领去重
+    monkeypatch.setattr(backends, "SEEDREAM_MOCK_DOWNLOAD_LATENCY_MS", "fixed:300")
+    monkeypatch.setattr(lazy_module, "LAZY_DOWNLOAD_POLL_INTERVAL", 0.02)
+    locations = []
+
+    def worker():
+        async def main():
+            try:
+                locations.append(await lazy_images.materialize(record.gallery_id))
+            finally:
+                await close_http_client()
+        asyncio.run(main())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(image_gets) == 1
+    assert len(locations) == 3 and len(set(locations)) == 1
@@ -0,0 +1,58 @@
+# 事件循环监控测试
+import asyncio
+import time
+
+from mcp_server_seedream.utils.loop_monitor import LagHistogram, LoopMonitor
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = LagHistogram(buckets=(1, 10, 100))
+    for lag in (0.5, 0.8, 5, 50, 2000):
+        histogram.record(lag)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"le_1ms": 2, "le_10ms": 1, "le_100ms": 1, "+Inf": 1}
+    assert histogram.percentile(40) == 1.0
+    assert histogram.percentile(80) == 100.0
+    assert histogram.percentile(100) == 2000
+    assert snapshot["max_ms"] == 2000
+    assert LagHistogram().percentile(50) is None
+
+
+def test_blocking_callback_shows_up_as_lag_and_stack(capsys):
+    monitor = LoopMonitor(interval=0.01, debug=True, block_threshold=0.05)
+
+    def blocking_call():
+        time.sleep(0.3)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(main())
+    snapshot = monitor.snapshot()
+
+    assert not monitor.running
+    assert snapshot["lag"]["max_ms"] >= 250
+    assert snapshot["blocked_callbacks"] == 1
+    assert "blocking_call" in snapshot["recent_blocks"][0]["stack"]
+    assert "[loop-monitor]" in capsys.readouterr().err
+
+
+def test_idle_loop_has_low_lag():
+    monitor = LoopMonitor(interval=0.01, debug=False)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+
+    asyncio.run(main())
+    snapshot = monitor.snapshot()
+
+    assert snapshot["lag"]["samples"] > 5
+    assert snapshot["lag"]["max_ms"] < 100
+    assert "blocked_callbacks" not in snapshot
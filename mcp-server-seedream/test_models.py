@@ -0,0 +1,35 @@
+# 模型注册表测试
+from mcp_server_seedream.utils.models import MODEL_SPECS, ModelRegistry
+
+
+def _registry(probe_interval: float) -> ModelRegistry:
+    return ModelRegistry(MODEL_SPECS, "seedream-4.0", probe_interval=probe_interval)
+
+
+def test_fastest_probes_models_that_were_never_selected():
+    registry = _registry(probe_interval=3600)
+
+    # 先验延迟：3.0-t2i 为 10 秒，4.0 为 20 秒；4.0 从未被选中时仍要探测一次
+    assert registry.select(policy="fastest").name == "seedream-3.0-t2i"
+    assert registry.select(policy="fastest").name == "seedream-4.0"
+    assert registry.select(policy="fastest").name == "seedream-3.0-t2i"
+
+
+def test_fastest_switches_after_probe_measures_a_faster_model():
+    registry = _registry(probe_interval=3600)
+    v4 = registry.get("seedream-4.0")
+
+    # 3.0-t2i 实际很慢，探测发现 4.0 更快后切换到 4.0
+    for _ in range(2):
+        spec = registry.select(policy="fastest")
+        registry.observer(spec)(5.0 if spec is v4 else 30.0, True)
+
+    assert registry.select(policy="fastest") is v4
+    assert registry.select(policy="fastest") is v4
+
+
+def test_default_and_explicit_model_ignore_probing():
+    registry = _registry(probe_interval=0)
+
+    assert registry.select().name == "seedream-4.0"
+    assert registry.select("seedream-3.0-t2i", "fastest").name == "seedream-3.0-t2i"
@@ -0,0 +1,64 @@
+# 主机级共享令牌桶测试：多个进程通过文件锁共享同一个状态文件
+import asyncio
+import multiprocessing
+import time
+
+from mcp_server_seedream.utils.rate_limiter import SharedTokenBucket, parse_retry_after
+
+
+def _take(state_file: str, count: int) -> None:
+    bucket = SharedTokenBucket(state_file, requests_per_minute=600, burst=5)
+
+    async def main():
+        for _ in range(count):
+            await bucket.acquire()
+
+    asyncio.run(main())
+
+
+def test_processes_share_one_rate(tmp_path):
+    state_file = str(tmp_path / "rate.json")
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_take, args=(state_file, 5)) for _ in range(3)]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    elapsed = time.monotonic() - started
+
+    assert all(worker.exitcode == 0 for worker in workers)
+    snapshot = SharedTokenBucket(state_file, requests_per_minute=600, burst=5).snapshot()
+    assert snapshot["total_requests"] == 15
+    # 突发 5 个，其余 10 个按每秒 10 个补充：三个进程合计至少需要约 1 秒
+    assert elapsed >= 0.9
+
+
+def test_penalize_pauses_all_holders(tmp_path):
+    state_file = str(tmp_path / "rate.json")
+    first = SharedTokenBucket(state_file, requests_per_minute=6000, burst=10)
+    second = SharedTokenBucket(state_file, requests_per_minute=6000, burst=10)
+
+    async def main():
+        await first.penalize(0.3)
+        started = time.monotonic()
+        await second.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.3
+    assert second.snapshot()["throttled_responses"] == 1
+
+
+def test_disabled_bucket_does_not_touch_state(tmp_path):
+    bucket = SharedTokenBucket(str(tmp_path / "rate.json"), requests_per_minute=0)
+
+    asyncio.run(bucket.acquire())
+    assert bucket.snapshot() == {"enabled": False}
+    assert not (tmp_path / "rate.json").exists()
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,105 @@
+# 本地派生尺寸测试：尺寸计算不依赖 Pillow，缩放测试在未安装 Pillow 时跳过
+import asyncio
+import io
+
+import pytest
+
+from mcp_server_seedream.utils import generation
+from mcp_server_seedream.utils.api_client import close_http_client
+from mcp_server_seedream.utils.errors import MCPError
+from mcp_server_seedream.utils.resize import image_extension, resize_image, size_area, target_dimensions
+
+
+def test_size_helpers():
+    assert size_area("2K") == 2048 * 2048
+    assert max(["1K", "1280x720", "2K"], key=size_area) == "2K"
+    assert image_extension(b"\x89PNG\r\n\x1a\n...") == "png"
+    assert image_extension(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert image_extension(b"\xff\xd8\xff") == "jpg"
+
+
+def test_target_dimensions_keep_aspect_ratio_for_presets():
+    assert target_dimensions("1K", 4096, 4096) == (1024, 1024)
+    assert target_dimensions("1K", 2560, 1440) == (1365, 768)
+    # 预设尺寸不放大
+    assert target_dimensions("4K", 2048, 2048) == (2048, 2048)
+    assert target_dimensions("800x600", 2048, 2048) == (800, 600)
+
+
+def test_target_dimensions_never_upscale_explicit_sizes():
+    # 超出源图的宽或高时保持指定的宽高比缩小到源图范围内
+    assert target_dimensions("3000x1000", 2048, 2048) == (2048, 683)
+    assert target_dimensions("4096x4096", 1024, 768) == (768, 768)
+    assert target_dimensions("2048x2048", 2048, 2048) == (2048, 2048)
+
+
+def test_resize_image_crops_to_requested_aspect_ratio():
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 200), "red").save(buffer, "JPEG")
+
+    scaled, extension, width, height = resize_image(buffer.getvalue(), "100x100")
+
+    assert (extension, width, height) == ("jpg", 100, 100)
+    with Image.open(io.BytesIO(scaled)) as image:
+        assert (image.format, image.size) == ("JPEG", (100, 100))
+
+
+def test_generate_sizes_calls_api_once_and_derives_the_rest(tmp_path, monkeypatch):
+    derived = []
+
+    async def fake_derive_sizes(data, sizes):
+        derived.append(list(sizes))
+        # mock 后端按请求的 2K 返回 2048x2048 的源图
+        return [(b"derived-" + size.encode(), "png", *target_dimensions(size, 2048, 2048)) for size in sizes]
+
+    requested = []
+    real_request_image = generation.request_image
+
+    async def request_image(prompt, size, *args, **kwargs):
+        requested.append(size)
+        return await real_request_image(prompt, size, *args, **kwargs)
+
+    monkeypatch.setattr(generation, "pillow_available", lambda: True)
+    monkeypatch.setattr(generation, "derive_sizes", fake_derive_sizes)
+    monkeypatch.setattr(generation, "request_image", request_image)
+
+    async def main():
+        try:
+            return await generation.generate_sizes("一只猫", ["1K", "64x64", "2K", "1K"], str(tmp_path), False)
+        finally:
+            await close_http_client()
+
+    records, model = asyncio.run(main())
+    assert requested == ["2K"]
+    assert derived == [["1K", "64x64"]]
+    assert [record.image_size for record in records] == ["1K", "64x64", "2K"]
+    assert [record.derived for record in records] == [True, True, False]
+    assert records[2].image_url and records[2].token_usage > 0
+    assert all(record.downloaded for record in records)
+    with open(records[0].local_path, "rb") as f:
+        assert f.read() == b"derived-1K"
+
+
+def test_generate_sizes_requires_pillow(monkeypatch):
+    monkeypatch.setattr(generation, "pillow_available", lambda: False)
+
+    with pytest.raises(MCPError) as excinfo:
+        asyncio.run(generation.generate_sizes("一只猫", ["1K", "2K"], "unused", False))
+    assert excinfo.value.error_code == "DEPENDENCY_MISSING"
+
+
+def test_generate_sizes_records_clamped_dimensions(tmp_path, monkeypatch):
+    pytest.importorskip("PIL.Image")
+
+    async def main():
+        try:
+            return await generation.generate_sizes("一只猫", ["2K", "3000x1000"], str(tmp_path), False)
+        finally:
+            await close_http_client()
+
+    records, _ = asyncio.run(main())
+    assert [record.image_size for record in records] == ["2K", "2048x683"]
+    Image = pytest.importorskip("PIL.Image")
+    with Image.open(records[1].local_path) as image:
+        assert image.size == (2048, 683)
@@ -0,0 +1,65 @@
+# 加权公平队列调度器测试
+import asyncio
+
+import pytest
+
+from mcp_server_seedream.utils.scheduler import PriorityScheduler
+
+
+async def _grant_order(scheduler: PriorityScheduler, arrivals):
+    """先占满唯一的槽位，让所有请求排队，再释放，记录获得槽位的顺序"""
+    order = []
+
+    async def request(priority: str):
+        async with scheduler.slot(priority):
+            order.append(priority)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire("interactive")
+    tasks = []
+    for priority in arrivals:
+        tasks.append(asyncio.create_task(request(priority)))
+        await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_interactive_overtakes_background_backlog():
+    scheduler = PriorityScheduler(capacity=1)
+    order = asyncio.run(_grant_order(scheduler, ["background"] * 10 + ["interactive"]))
+
+    assert order.index("interactive") <= 1
+
+
+def test_backlogged_priorities_share_by_weight():
+    scheduler = PriorityScheduler(capacity=1, weights={"interactive": 8.0, "batch": 3.0, "background": 1.0})
+    order = asyncio.run(_grant_order(scheduler, ["batch"] * 30 + ["interactive"] * 30))
+
+    first = order[:22]
+    assert first.count("interactive") == 16
+    assert first.count("batch") == 6
+
+
+def test_cancelled_waiter_leaves_queue_and_slot_is_reused():
+    scheduler = PriorityScheduler(capacity=1)
+
+    async def main():
+        await scheduler.acquire("interactive")
+        waiter = asyncio.create_task(scheduler.acquire("batch"))
+        await asyncio.sleep(0)
+        assert scheduler.queued()["batch"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queued()["batch"] == 0
+        scheduler.release()
+        await asyncio.wait_for(scheduler.acquire("background"), 1)
+        assert scheduler.active == 1
+
+    asyncio.run(main())
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(PriorityScheduler().acquire("urgent"))
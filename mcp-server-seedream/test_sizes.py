@@ -0,0 +1,14 @@
+# 尺寸解析与校验测试
+from mcp_server_seedream.utils.sizes import invalid_size_message, is_valid_size, parse_image_size
+
+
+def test_parse_image_size():
+    assert parse_image_size("2K") == (2048, 2048)
+    assert parse_image_size("1280x720") == (1280, 720)
+    assert parse_image_size("bogus") == (2048, 2048)
+
+
+def test_is_valid_size():
+    assert all(is_valid_size(size) for size in ("1K", "2k", "4K", "1280x720", "64X64"))
+    assert not any(is_valid_size(size) for size in ("8K", "huge", "1280*720", "", 1024, None))
+    assert "huge" in invalid_size_message("huge")
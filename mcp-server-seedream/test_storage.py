@@ -0,0 +1,143 @@
+# 存储后端测试：S3 分段上传通过 httpx.MockTransport 模拟，不访问网络
+import asyncio
+import datetime
+import gc
+
+import httpx
+import pytest
+
+from mcp_server_seedream.utils.storage import (
+    ImageWriter,
+    LocalStorage,
+    S3Storage,
+    StorageBackend,
+    StorageError,
+    sign_v4,
+)
+
+
+class FakeS3:
+    """记录收到的请求，按 S3 协议返回响应；fail_part 指定的分段返回 500"""
+
+    def __init__(self, fail_part=None):
+        self.requests = []
+        self.fail_part = fail_part
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        query = dict(request.url.params)
+        self.requests.append((request.method, request.url.path, query, request.content))
+        assert request.headers["authorization"].startswith("AWS4-HMAC-SHA256 Credential=AK/")
+        if request.method == "POST" and "uploads" in query:
+            return httpx.Response(200, content=b"<InitiateMultipartUploadResult><UploadId>u-1</UploadId></InitiateMultipartUploadResult>")
+        if request.method == "PUT" and "partNumber" in query:
+            if query["partNumber"] == str(self.fail_part):
+                return httpx.Response(500, text="InternalError")
+            return httpx.Response(200, headers={"ETag": f'"etag-{query["partNumber"]}"'})
+        if request.method == "POST" and "uploadId" in query:
+            return httpx.Response(200, content=b"<CompleteMultipartUploadResult><Key>k</Key></CompleteMultipartUploadResult>")
+        return httpx.Response(204 if request.method == "DELETE" else 200)
+
+    def calls(self):
+        return [(method, sorted(query)) for method, _, query, _ in self.requests]
+
+
+async def _save(fake: FakeS3, chunks, part_bytes: int = 4):
+    storage = S3Storage(
+        bucket="bucket", endpoint="http://s3.test", region="us-east-1", prefix="p/",
+        access_key="AK", secret_key="SK", part_bytes=part_bytes
+    )
+    storage._clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    writer = storage.open("", "image.png")
+    try:
+        for chunk in chunks:
+            await writer.write(chunk)
+        return await writer.commit()
+    except BaseException:
+        await writer.abort()
+        raise
+    finally:
+        await storage.aclose()
+
+
+def test_interfaces_are_abstract():
+    with pytest.raises(TypeError):
+        ImageWriter()
+    with pytest.raises(TypeError):
+        StorageBackend()
+    LocalStorage()
+
+
+def test_small_image_uses_single_put():
+    fake = FakeS3()
+    location = asyncio.run(_save(fake, [b"abc"]))
+
+    assert location == "s3://bucket/p/image.png"
+    assert fake.calls() == [("PUT", [])]
+    assert fake.requests[0][1] == "/bucket/p/image.png"
+    assert fake.requests[0][3] == b"abc"
+
+
+def test_multipart_upload_initiates_uploads_parts_and_completes():
+    fake = FakeS3()
+    location = asyncio.run(_save(fake, [b"0123", b"456", b"789", b"ab"]))
+
+    assert location == "s3://bucket/p/image.png"
+    assert fake.calls() == [
+        ("POST", ["uploads"]),
+        ("PUT", ["partNumber", "uploadId"]),
+        ("PUT", ["partNumber", "uploadId"]),
+        ("PUT", ["partNumber", "uploadId"]),
+        ("POST", ["uploadId"]),
+    ]
+    parts = [(query["partNumber"], body) for method, _, query, body in fake.requests if "partNumber" in query]
+    assert parts == [("1", b"0123"), ("2", b"4567"), ("3", b"89ab")]
+    complete = fake.requests[-1][3].decode()
+    assert complete.index('"etag-1"') < complete.index('"etag-2"') < complete.index('"etag-3"')
+
+
+def test_failed_part_aborts_multipart_upload():
+    fake = FakeS3(fail_part=2)
+    with pytest.raises(StorageError):
+        asyncio.run(_save(fake, [b"0123", b"4567", b"89ab", b"cd"]))
+
+    assert fake.calls()[-1] == ("DELETE", ["uploadId"])
+    assert fake.requests[-1][2]["uploadId"] == "u-1"
+    assert ("POST", ["uploadId"]) not in fake.calls()
+
+
+def test_abort_retrieves_a_part_that_already_failed():
+    fake = FakeS3(fail_part=1)
+    unhandled = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        storage = S3Storage(bucket="bucket", endpoint="http://s3.test", access_key="AK", secret_key="SK", part_bytes=4)
+        storage._clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+        writer = storage.open("", "image.png")
+        await writer.write(b"0123")
+        # 下载因其他原因中止时，第一个分段已经失败结束
+        await asyncio.sleep(0.05)
+        assert writer._uploading.done()
+        await writer.abort()
+        await storage.aclose()
+        del writer
+        gc.collect()
+
+    asyncio.run(main())
+    assert fake.calls()[-1] == ("DELETE", ["uploadId"])
+    assert unhandled == []
+
+
+def test_sign_v4_matches_aws_example():
+    # AWS 文档中 IAM ListUsers 请求的签名示例
+    signed = sign_v4(
+        "GET", "iam.amazonaws.com", "/", {"Action": "ListUsers", "Version": "2010-05-08"},
+        {"Content-Type": "application/x-www-form-urlencoded; charset=utf-8"},
+        "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
+        "AKIDEXAMPLE", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY", "us-east-1", "iam",
+        now=datetime.datetime(2015, 8, 30, 12, 36, 0, tzinfo=datetime.timezone.utc)
+    )
+
+    assert signed["authorization"].endswith(
+        "Signature=5d672d79c15b13162d9279b0855cfba6789a8edb4c82c400e06b5924a6f2b5d7"
+    )
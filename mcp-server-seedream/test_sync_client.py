@@ -0,0 +1,76 @@
+# 同步客户端测试：使用离线 mock 后端
+import asyncio
+import json
+
+import pytest
+
+from mcp_server_seedream.utils import api_client, storage
+from mcp_server_seedream.utils.storage import S3Storage
+from mcp_server_seedream.utils.sync_client import SeedreamClient
+
+
+def test_generate_and_generate_many(tmp_path):
+    with SeedreamClient() as client:
+        single = client.generate("一只猫", size="1K", optimize_prompt=False)
+        many = client.generate_many(["猫", "狗", "鸟"], size="1K", response_format="local_file",
+                                    download_dir=str(tmp_path), optimize_prompt=False)
+
+    assert single["success"] and single["image_url"].startswith("https://")
+    assert [image["prompt"] for image in many] == ["猫", "狗", "鸟"]
+    assert all(image["downloaded"] for image in many)
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_closed_client_rejects_calls():
+    client = SeedreamClient()
+    client.close()
+    client.close()
+    with pytest.raises(RuntimeError):
+        client.generate("一只猫")
+
+
+def test_close_keeps_other_loops_connections(monkeypatch):
+    # 服务器主循环与同步客户端共用进程级存储后端，关闭客户端不能影响主循环的连接
+    s3 = S3Storage(bucket="bucket", endpoint="http://s3.test", access_key="AK", secret_key="SK")
+    monkeypatch.setattr(storage, "_storage", s3)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        http_client = api_client.get_http_client()
+        s3_client = s3._client()
+
+        def use_and_close():
+            client = SeedreamClient()
+            client.generate("一只猫", size="1K", optimize_prompt=False)
+            client.close()
+
+        await asyncio.to_thread(use_and_close)
+        try:
+            assert not http_client.is_closed
+            assert s3._clients.get(loop) is s3_client and not s3_client.is_closed
+        finally:
+            await api_client.close_http_client()
+            await s3.aclose()
+
+    asyncio.run(main())
+
+
+def test_guidance_scale_and_seed_reach_the_api(monkeypatch):
+    from mcp_server_seedream.utils.backends import MOCK_IMAGE_HOST, MockTransport
+
+    payloads = []
+    real_handle = MockTransport.handle_async_request
+
+    async def handle(self, request):
+        if request.url.host != MOCK_IMAGE_HOST:
+            payloads.append(json.loads(request.content))
+        return await real_handle(self, request)
+
+    monkeypatch.setattr(MockTransport, "handle_async_request", handle)
+    with SeedreamClient() as client:
+        client.generate("一只猫", size="1K", optimize_prompt=False,
+                        model="seedream-3.0-t2i", guidance_scale=5.5, seed=42)
+        client.generate_many(["猫", "狗"], size="1K", optimize_prompt=False,
+                             model="seedream-3.0-t2i", guidance_scale=3, seed=7)
+
+    assert [(p["guidance_scale"], p["seed"]) for p in payloads] == [(5.5, 42), (3, 7), (3, 7)]
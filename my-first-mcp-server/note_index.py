@@ -0,0 +1,338 @@
+"""
+笔记全文索引：notes/ 目录的倒排索引
+
+- 分词：英文和数字按单词切分，中日韩文字同时按单字和相邻两字（bigram）建立索引；
+  查询时多字词只用 bigram，单字词用单字，因此单字查询也能命中多字词中的字
+- 索引首次构建后持久化到磁盘，之后按文件的 (mtime, size) 增量更新，只重新分词有变化的文件
+- 增量修改追加到变更日志，日志累积到一定长度后再合并为新快照
+- 查询要求包含全部关键词，按 BM25 排序
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# 索引文件路径
+NOTE_INDEX_PATH = os.getenv("NOTE_INDEX_PATH", ".note_index.json")
+# 超过该大小（字节）的文件不建立索引（例如大型日志）
+NOTE_INDEX_MAX_FILE_BYTES = int(os.getenv("NOTE_INDEX_MAX_FILE_BYTES", str(8 * 1024 * 1024)))
+# 两次检查目录变化的最小间隔（秒），间隔内的查询直接使用内存中的索引
+NOTE_INDEX_REFRESH_SECONDS = float(os.getenv("NOTE_INDEX_REFRESH_SECONDS", "2"))
+# 变更日志至少累积到该条数（或索引文件数的 1/4）才合并为新快照
+NOTE_INDEX_JOURNAL_MIN = int(os.getenv("NOTE_INDEX_JOURNAL_MIN", "1000"))
+
+INDEX_VERSION = 2
+
+# 连续的中日韩文字，或连续的字母数字
+_TOKEN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[0-9a-z_]+")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    把文本切分为索引词
+
+    中日韩文字的每个字和每对相邻的字都作为索引词，
+    使 "猫" 能命中 "小猫"、"笔" 能命中 "学习笔记"。
+
+    参数：
+        text: 文本
+
+    返回：
+        索引词列表（保留重复，用于统计词频）
+    """
+    tokens: List[str] = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    把查询文本切分为查询词（去重）
+
+    多字的中日韩词只用 bigram 查询，单字才用单字查询，
+    避免 "小猫" 被拆成 "小"、"猫" 后匹配到只是分别出现这两个字的文件。
+
+    参数：
+        query: 查询文本
+
+    返回：
+        查询词列表
+    """
+    terms: List[str] = []
+    for run in _TOKEN_RE.findall(query.lower()):
+        if _CJK_RE.match(run) and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return list(dict.fromkeys(terms))
+
+
+def make_snippet(text: str, query: str, width: int = 80) -> str:
+    """
+    截取文本中第一个命中关键词附近的片段
+
+    参数：
+        text: 文件内容
+        query: 查询文本
+        width: 片段长度（字符）
+
+    返回：
+        单行片段，找不到命中位置时返回开头部分
+    """
+    lowered = text.lower()
+    position = lowered.find(query.lower().strip())
+    if position < 0:
+        for term in query_terms(query):
+            position = lowered.find(term)
+            if position >= 0:
+                break
+    start = max(position - width // 4, 0) if position >= 0 else 0
+    snippet = " ".join(text[start:start + width].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+
+class NoteIndex:
+    """
+    notes/ 目录的倒排索引
+
+    磁盘上保存每个文件的版本 (mtime, size) 和词频表（正排），加载时在内存中重建倒排表；
+    refresh() 只对新增或修改过的文件重新分词，并移除已删除文件的记录。
+    所有修改都在持有 asyncio 锁的工作线程中进行，search() 同样持有该锁。
+    """
+
+    def __init__(
+        self,
+        root: str = "notes",
+        index_path: str = NOTE_INDEX_PATH,
+        refresh_interval: float = NOTE_INDEX_REFRESH_SECONDS
+    ):
+        self.root = root
+        self.index_path = index_path
+        self.refresh_interval = refresh_interval
+        # 文件名 -> (mtime_ns, size, 词数, 词频表)
+        self._docs: Dict[str, Tuple[int, int, int, Dict[str, int]]] = {}
+        # 索引词 -> {文件名: 词频}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._journal_entries = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def document_count(self) -> int:
+        """已索引的文件数"""
+        return len(self._docs)
+
+    def _add(self, name: str, mtime_ns: int, size: int, terms: Dict[str, int]) -> None:
+        length = sum(terms.values())
+        self._docs[name] = (mtime_ns, size, length, terms)
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[name] = tf
+
+    def _remove(self, name: str) -> None:
+        doc = self._docs.pop(name, None)
+        if doc is None:
+            return
+        self._total_length -= doc[2]
+        for term in doc[3]:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(name, None)
+                if not posting:
+                    del self._postings[term]
+
+    @property
+    def journal_path(self) -> str:
+        """变更日志路径：快照之后的增量修改追加到这里，避免每次修改都重写整个索引"""
+        return f"{self.index_path}.log"
+
+    def _load(self) -> None:
+        # 先加载快照，再按顺序重放变更日志；任一部分损坏时从头重建
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != os.path.abspath(self.root):
+            return
+        for name, (mtime_ns, size, terms) in data.get("docs", {}).items():
+            self._add(name, mtime_ns, size, terms)
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._remove(entry[0])
+                    if len(entry) == 4:
+                        self._add(*entry)
+                    self._journal_entries += 1
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError):
+            self._reset()
+
+    def _reset(self) -> None:
+        self._docs.clear()
+        self._postings.clear()
+        self._total_length = 0
+        self._journal_entries = 0
+
+    def _save(self, entries: List[list]) -> None:
+        # 已有快照且变更较少时追加到日志；否则写入新快照并清空日志
+        if (
+            os.path.exists(self.index_path)
+            and self._journal_entries + len(entries) <= max(NOTE_INDEX_JOURNAL_MIN, len(self._docs) // 4)
+        ):
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._journal_entries += len(entries)
+            return
+
+        data = {
+            "version": INDEX_VERSION,
+            "root": os.path.abspath(self.root),
+            "docs": {name: [doc[0], doc[1], doc[3]] for name, doc in self._docs.items()}
+        }
+        # 先写临时文件再替换，避免中断时留下损坏的索引
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self._journal_entries = 0
+
+    def _scan(self) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+        # 找出新增/修改和已删除的文件
+        current: Dict[str, Tuple[int, int]] = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                if st.st_size <= NOTE_INDEX_MAX_FILE_BYTES:
+                    current[entry.name] = (st.st_mtime_ns, st.st_size)
+        changed = [
+            (name, mtime_ns, size)
+            for name, (mtime_ns, size) in current.items()
+            if self._docs.get(name, (None, None))[:2] != (mtime_ns, size)
+        ]
+        removed = [name for name in self._docs if name not in current]
+        return changed, removed
+
+    def _tokenize_file(self, name: str) -> Optional[Dict[str, int]]:
+        # 读取并分词一个文件，无法读取时返回 None
+        try:
+            with open(os.path.join(self.root, name), "r", encoding="utf-8", errors="replace") as f:
+                return dict(Counter(tokenize(f.read())))
+        except OSError:
+            return None
+
+    def _update(self) -> int:
+        # 在工作线程中执行：加载、扫描、分词、更新内存索引并持久化
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+
+        changed, removed = self._scan()
+        if not changed and not removed:
+            return 0
+
+        entries: List[list] = []
+        for name in removed:
+            self._remove(name)
+            entries.append([name])
+        for name, mtime_ns, size in changed:
+            terms = self._tokenize_file(name)
+            self._remove(name)
+            if terms is None:
+                entries.append([name])
+            else:
+                self._add(name, mtime_ns, size, terms)
+                entries.append([name, mtime_ns, size, terms])
+        self._save(entries)
+        return len(changed) + len(removed)
+
+    async def refresh(self, force: bool = False) -> int:
+        """
+        按需增量更新索引
+
+        参数：
+            force: 忽略 refresh_interval，立即检查目录变化
+
+        返回：
+            本次新增、修改或删除的文件数
+        """
+        async with self._lock:
+            if self._loaded and not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return 0
+            # 首次构建可能需要数秒，整个更新过程都在工作线程中完成，不阻塞事件循环；
+            # 持有锁期间 search() 会等待，不会读到更新了一半的索引
+            count = await asyncio.to_thread(self._update)
+            self._last_refresh = time.monotonic()
+            return count
+
+    def mark_stale(self) -> None:
+        """标记索引已过期，下一次查询时立即检查目录变化（收到文件变化事件时调用）"""
+        self._last_refresh = 0.0
+
+    async def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        查询包含全部关键词的文件
+
+        参数：
+            query: 查询文本，按 query_terms 切分
+            limit: 最多返回的结果数
+
+        返回：
+            按相关度从高到低排列的 (文件名, 得分) 列表
+        """
+        async with self._lock:
+            return self._search(query, limit)
+
+    def _search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        terms = query_terms(query)
+        if not terms or not self._docs:
+            return []
+        postings = [self._postings.get(term) for term in terms]
+        if any(posting is None for posting in postings):
+            return []
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        n = len(self._docs)
+        avg_length = self._total_length / n if n else 0.0
+        scores: Dict[str, float] = {}
+        for posting in postings:
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for name in candidates:
+                tf = posting[name]
+                length = self._docs[name][2]
+                norm = _K1 * (1 - _B + _B * length / avg_length) if avg_length else _K1
+                scores[name] = scores.get(name, 0.0) + idf * tf * (_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
@@ -0,0 +1,304 @@
+"""
+笔记存储：带缓存的 notes/ 目录读取器
+
+- 内存 LRU 缓存，以文件的 (mtime, size) 校验是否过期，文件被修改后自动重新读取
+- 缓存总大小按字节数限制，超出时淘汰最久未使用的笔记
+- 文件读取在线程池中执行，冷读取不会阻塞事件循环上的其他工具调用
+- 同一文件的并发冷读取合并为一次磁盘读取
+- 大文件通过 mmap 按页读取，每次只复制一页内容，返回继续读取用的游标
+"""
+
+import asyncio
+import mmap
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# 缓存的总字节数上限（默认 64 MB）
+NOTE_CACHE_MAX_BYTES = int(os.getenv("NOTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 分页读取时每页的最大字节数（默认 256 KB），超过一页的笔记分页返回
+NOTE_PAGE_BYTES = int(os.getenv("NOTE_PAGE_BYTES", str(256 * 1024)))
+
+
+@dataclass
+class CachedNote:
+    """缓存中的一篇笔记"""
+
+    mtime_ns: int
+    size: int
+    text: str
+
+
+@dataclass
+class NotePage:
+    """
+    笔记的一页内容
+
+    start / end 为本页在文件中的字节范围 [start, end)，
+    next_cursor 为下一页的起始字节偏移，已读到文件末尾（或 stop）时为 None。
+    stop 为按行范围读取时该范围的结束字节偏移，续读的页不会超过它；按页读取整个文件时为 None。
+    """
+
+    text: str
+    start: int
+    end: int
+    size: int
+    next_cursor: Optional[int]
+    stop: Optional[int] = None
+
+
+def _align_forward(mm: mmap.mmap, pos: int, size: int) -> int:
+    # 跳过 UTF-8 续字节，从完整字符开始
+    while pos < size and (mm[pos] & 0xC0) == 0x80:
+        pos += 1
+    return pos
+
+
+def _align_backward(mm: mmap.mmap, pos: int, start: int, size: int) -> int:
+    # pos 落在多字节字符中间时回退到字符开头，避免截断字符
+    while start < pos < size and (mm[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def _page_end(mm: mmap.mmap, start: int, limit: int, size: int) -> int:
+    """计算从 start 开始、不超过 limit 字节的一页的结束位置，尽量在换行处分页"""
+    end = min(start + limit, size)
+    if end >= size:
+        return size
+    newline = mm.rfind(b"\n", start, end)
+    if newline >= start + limit // 2:
+        return newline + 1
+    end = _align_backward(mm, end, start, size)
+    # 页大小小于一个字符时至少前进一个完整字符
+    return end if end > start else _align_forward(mm, start + 1, size)
+
+
+def render_page(filename: str, page: NotePage) -> str:
+    """
+    把一页内容格式化为资源文本，未读完时在末尾附上继续读取的资源 URI
+
+    参数：
+        filename: 文件名
+        page: read_page / read_lines 返回的页
+
+    返回：
+        资源文本
+    """
+    text = f"文件：{filename}（字节 {page.start}-{page.end}，共 {page.size} 字节）\n\n{page.text}"
+    if page.next_cursor is not None:
+        # 行范围没有读到文件末尾时，续读地址带上范围的结束偏移，不读到范围之外
+        if page.stop is not None and page.stop < page.size:
+            text += f"\n\n[未完，继续读取：file://notes/{filename}/page/{page.next_cursor}/{page.stop}]"
+        else:
+            text += f"\n\n[未完，继续读取：file://notes/{filename}/page/{page.next_cursor}]"
+    return text
+
+
+def is_safe_filename(filename: str) -> bool:
+    """
+    检查文件名是否安全：防止路径遍历攻击（如 ../../etc/passwd）
+
+    参数：
+        filename: 文件名
+
+    返回：
+        文件名不含 '..' 和路径分隔符时返回 True
+    """
+    return bool(filename) and ".." not in filename and "/" not in filename and "\\" not in filename
+
+
+class NoteStore:
+    """
+    notes/ 目录的缓存读取器
+
+    热点笔记直接从内存返回；每次读取前在线程池中用 os.stat 校验 (mtime, size)，
+    文件有变化时同样在线程池中重新读取，磁盘较慢时不阻塞事件循环。超过缓存上限 1/4 的大文件不进入缓存。
+    """
+
+    def __init__(self, root: str = "notes", max_bytes: int = NOTE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4
+        self._cache: "OrderedDict[str, CachedNote]" = OrderedDict()
+        self._cached_bytes = 0
+        self._loading: Dict[Tuple[str, int, int], "asyncio.Task[str]"] = {}
+
+    def path_for(self, filename: str) -> str:
+        """返回笔记文件的路径"""
+        return os.path.join(self.root, filename)
+
+    @property
+    def cached_bytes(self) -> int:
+        """当前缓存占用的字节数"""
+        return self._cached_bytes
+
+    async def read(self, filename: str) -> str:
+        """
+        读取笔记内容
+
+        参数：
+            filename: notes/ 目录下的文件名
+
+        返回：
+            文件内容
+
+        异常：
+            ValueError: 文件名不安全
+            FileNotFoundError / OSError / UnicodeDecodeError: 读取失败
+        """
+        if not is_safe_filename(filename):
+            raise ValueError("非法文件名，不允许包含 '..' 或路径分隔符")
+
+        path = self.path_for(filename)
+        st = await asyncio.to_thread(os.stat, path)
+
+        entry = self._cache.get(filename)
+        if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+            self._cache.move_to_end(filename)
+            return entry.text
+
+        # 同一版本文件的并发冷读取只读一次磁盘；读取任务独立于请求方，
+        # 某个请求被取消不会影响其他等待同一文件的请求
+        key = (filename, st.st_mtime_ns, st.st_size)
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(filename, path))
+            self._loading[key] = task
+            task.add_done_callback(lambda t: self._loaded(key, t))
+        return await asyncio.shield(task)
+
+    async def _load(self, filename: str, path: str) -> str:
+        mtime_ns, size, text = await asyncio.to_thread(self._read_file, path)
+        self._store(filename, CachedNote(mtime_ns, size, text))
+        return text
+
+    def _loaded(self, key: Tuple[str, int, int], task: "asyncio.Task[str]") -> None:
+        self._loading.pop(key, None)
+        if not task.cancelled():
+            # 所有请求方都已取消时，避免 "exception was never retrieved" 警告
+            task.exception()
+
+    @staticmethod
+    def _read_file(path: str) -> Tuple[int, int, str]:
+        # 在工作线程中执行；用 fstat 取得与读取内容一致的版本信息
+        with open(path, "r", encoding="utf-8") as f:
+            st = os.fstat(f.fileno())
+            return st.st_mtime_ns, st.st_size, f.read()
+
+    def _store(self, filename: str, entry: CachedNote) -> None:
+        self.invalidate(filename)
+        if entry.size > self.max_entry_bytes:
+            return
+        self._cache[filename] = entry
+        self._cached_bytes += entry.size
+        # 按最久未使用淘汰，直到总大小回到上限以内
+        while self._cached_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted.size
+
+    async def size(self, filename: str) -> int:
+        """
+        返回笔记文件的字节数
+
+        异常：
+            ValueError: 文件名不安全
+            FileNotFoundError / OSError: 文件不存在或无法访问
+        """
+        if not is_safe_filename(filename):
+            raise ValueError("非法文件名，不允许包含 '..' 或路径分隔符")
+        return (await asyncio.to_thread(os.stat, self.path_for(filename))).st_size
+
+    async def read_page(
+        self,
+        filename: str,
+        cursor: int = 0,
+        length: int = NOTE_PAGE_BYTES,
+        stop: Optional[int] = None
+    ) -> NotePage:
+        """
+        从字节偏移 cursor 开始读取一页
+
+        参数：
+            filename: notes/ 目录下的文件名
+            cursor: 起始字节偏移（上一页的 next_cursor），落在多字节字符中间时向后对齐
+            length: 本页最大字节数
+            stop: 只读到该字节偏移为止（续读行范围时为上一页的 stop），默认读到文件末尾
+
+        返回：
+            NotePage，只复制本页内容，内存占用与文件大小无关
+        """
+        if not is_safe_filename(filename):
+            raise ValueError("非法文件名，不允许包含 '..' 或路径分隔符")
+        if cursor < 0 or length <= 0:
+            raise ValueError("游标和页大小必须为非负整数")
+        if stop is not None and stop < cursor:
+            raise ValueError(f"结束偏移 {stop} 小于游标 {cursor}")
+        return await asyncio.to_thread(self._read_range, self.path_for(filename), cursor, None, length, stop)
+
+    async def read_lines(self, filename: str, start_line: int, line_count: int, length: int = NOTE_PAGE_BYTES) -> NotePage:
+        """
+        读取从第 start_line 行（从 1 开始）起的 line_count 行
+
+        超过 length 字节时截断为一页，剩余部分通过 next_cursor 继续读取，续读到该行范围的末尾（stop）为止。
+        """
+        if not is_safe_filename(filename):
+            raise ValueError("非法文件名，不允许包含 '..' 或路径分隔符")
+        if start_line < 1 or line_count < 1:
+            raise ValueError("行号和行数必须为正整数")
+        return await asyncio.to_thread(
+            self._read_range, self.path_for(filename), None, (start_line, line_count), length
+        )
+
+    @staticmethod
+    def _read_range(
+        path: str,
+        cursor: Optional[int],
+        lines: Optional[Tuple[int, int]],
+        length: int,
+        stop: Optional[int] = None
+    ) -> NotePage:
+        # 在工作线程中执行：通过 mmap 定位并只复制需要的字节
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if cursor is not None and cursor > size:
+                raise ValueError(f"游标 {cursor} 超出文件大小 {size}")
+            if stop is not None and stop > size:
+                raise ValueError(f"结束偏移 {stop} 超出文件大小 {size}")
+            if size == 0:
+                return NotePage("", 0, 0, 0, None, stop)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if lines is None:
+                    limit = size if stop is None else stop
+                    start = min(_align_forward(mm, cursor, size), limit)
+                    end = _page_end(mm, start, length, limit)
+                    more = end < limit
+                else:
+                    start_line, line_count = lines
+                    start = 0
+                    for _ in range(start_line - 1):
+                        newline = mm.find(b"\n", start)
+                        if newline < 0:
+                            start = size
+                            break
+                        start = newline + 1
+                    end = start
+                    for _ in range(line_count):
+                        newline = mm.find(b"\n", end)
+                        end = size if newline < 0 else newline + 1
+                        if end >= size:
+                            break
+                    # 行范围超过一页时截断，剩余部分按游标继续读取，续读到范围末尾为止
+                    stop = end
+                    more = end - start > length
+                    if more:
+                        end = _page_end(mm, start, length, stop)
+                text = mm[start:end].decode("utf-8", errors="replace")
+        return NotePage(text, start, end, size, end if more else None, stop)
+
+    def invalidate(self, filename: str) -> None:
+        """从缓存中移除一篇笔记"""
+        entry = self._cache.pop(filename, None)
+        if entry is not None:
+            self._cached_bytes -= entry.size
@@ -0,0 +1,366 @@
+"""
+笔记目录监视器：notes/ 目录变化时通知 MCP 客户端
+
+- Linux 上通过 ctypes 调用 inotify，由事件循环直接监听文件描述符；其他平台或 inotify 不可用时退化为定时轮询
+- 在内存中维护目录清单 {文件名: (mtime, size)}，收到事件后只 stat 相关文件并与清单比较
+- 事件先防抖再合并：一段时间内同一文件的多次写入只产生一次变化，内容没有真正变化的事件被丢弃
+- NoteNotifier 记录客户端连接及其订阅，向订阅了对应资源的连接发送 resources/updated，
+  文件增删时向所有连接发送 resources/list_changed
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import weakref
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import mcp_types
+
+logger = logging.getLogger(__name__)
+
+# 防抖时间（秒）：收到第一个事件后等待该时间，把期间的所有事件合并处理
+NOTE_WATCH_DEBOUNCE_SECONDS = float(os.getenv("NOTE_WATCH_DEBOUNCE_SECONDS", "0.2"))
+# 轮询模式下两次扫描目录的间隔（秒）
+NOTE_WATCH_POLL_SECONDS = float(os.getenv("NOTE_WATCH_POLL_SECONDS", "2"))
+# 设为 1 时强制使用轮询（例如 notes/ 位于不支持 inotify 的网络文件系统上）
+NOTE_WATCH_FORCE_POLLING = os.getenv("NOTE_WATCH_FORCE_POLLING", "0") == "1"
+
+# inotify 常量（见 <sys/inotify.h>）
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+)
+# 这些事件意味着需要重新扫描整个目录
+_RESCAN_MASK = _IN_Q_OVERFLOW | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass
+class NoteChanges:
+    """一次合并后的目录变化"""
+
+    added: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    modified: Set[str] = field(default_factory=set)
+
+    @property
+    def listing_changed(self) -> bool:
+        """是否有文件新增或删除（需要发送 resources/list_changed）"""
+        return bool(self.added or self.removed)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+def _stat_note(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Inotify:
+    """inotify 的最小 ctypes 封装，只监听一个目录"""
+
+    def __init__(self, path: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch 失败：{path}")
+
+    def read_events(self) -> Tuple[Set[str], bool]:
+        """
+        读出当前所有事件
+
+        返回：
+            (涉及的文件名集合, 是否需要重新扫描整个目录)
+        """
+        names: Set[str] = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & _RESCAN_MASK:
+                    rescan = True
+                elif name:
+                    names.add(os.fsdecode(name))
+        return names, rescan
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class NoteWatcher:
+    """
+    notes/ 目录监视器
+
+    start() 扫描一次目录建立清单，之后每批变化调用一次通过 on_change() 注册的回调，
+    回调参数为合并后的 NoteChanges。
+    """
+
+    def __init__(
+        self,
+        root: str = "notes",
+        debounce: float = NOTE_WATCH_DEBOUNCE_SECONDS,
+        poll_interval: float = NOTE_WATCH_POLL_SECONDS,
+        force_polling: bool = NOTE_WATCH_FORCE_POLLING
+    ):
+        self.root = root
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        # 文件名 -> (mtime_ns, size)
+        self.listing: Dict[str, Tuple[int, int]] = {}
+        self._callbacks: List[Callable[[NoteChanges], Awaitable[None]]] = []
+        self._pending: Set[str] = set()
+        self._pending_rescan = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set["asyncio.Task[None]"] = set()
+        self._lock = asyncio.Lock()
+        self._inotify: Optional[_Inotify] = None
+        self._poll_task: Optional["asyncio.Task[None]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def mode(self) -> str:
+        """当前的监视方式：inotify / polling / stopped"""
+        if self._inotify is not None:
+            return "inotify"
+        return "polling" if self._poll_task is not None else "stopped"
+
+    def names(self) -> List[str]:
+        """按名称排序的文件清单（清单在事件循环线程中更新，只能在该线程中调用）"""
+        return sorted(self.listing)
+
+    def on_change(self, callback: Callable[[NoteChanges], Awaitable[None]]) -> None:
+        """注册变化回调"""
+        self._callbacks.append(callback)
+
+    async def start(self) -> None:
+        """建立初始清单并开始监视"""
+        self._loop = asyncio.get_running_loop()
+        self.listing = await asyncio.to_thread(self._scan)
+        if not self.force_polling:
+            try:
+                self._inotify = _Inotify(self.root)
+                self._loop.add_reader(self._inotify.fd, self._on_inotify)
+            except (OSError, AttributeError, NotImplementedError) as e:
+                # 非 Linux 平台、inotify 实例数用尽，或事件循环不支持 add_reader
+                logger.info("inotify 不可用，改用轮询：%s", e)
+                if self._inotify is not None:
+                    self._inotify.close()
+                    self._inotify = None
+        if self._inotify is None:
+            self._poll_task = asyncio.ensure_future(self._poll())
+
+    async def stop(self) -> None:
+        """停止监视"""
+        if self._inotify is not None:
+            self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for task in list(self._flush_tasks):
+            task.cancel()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        # 在工作线程中执行：扫描整个目录
+        listing: Dict[str, Tuple[int, int]] = {}
+        try:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    listing[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return listing
+
+    def _diff(self, names: Optional[Set[str]]) -> Tuple[NoteChanges, Dict[str, Optional[Tuple[int, int]]]]:
+        # 在工作线程中执行：stat 指定文件（names 为 None 时扫描整个目录），与清单比较
+        if names is None:
+            current = self._scan()
+            updates: Dict[str, Optional[Tuple[int, int]]] = dict(current)
+            updates.update({name: None for name in self.listing if name not in current})
+        else:
+            updates = {
+                name: _stat_note(os.path.join(self.root, name))
+                for name in names
+                if not name.startswith(".")
+            }
+
+        changes = NoteChanges()
+        for name, version in updates.items():
+            old = self.listing.get(name)
+            if version is None:
+                if old is not None:
+                    changes.removed.add(name)
+            elif old is None:
+                changes.added.add(name)
+            elif old != version:
+                changes.modified.add(name)
+        return changes, updates
+
+    def _on_inotify(self) -> None:
+        names, rescan = self._inotify.read_events()
+        if rescan and not os.path.isdir(self.root):
+            # 目录被删除或移走，inotify 监视随之失效，改为轮询等待目录重新出现
+            self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+            self._poll_task = asyncio.ensure_future(self._poll())
+        self._schedule(names, rescan)
+
+    def _schedule(self, names: Set[str], rescan: bool = False) -> None:
+        # 把事件并入待处理集合；同一批事件只安排一次处理
+        self._pending.update(names)
+        self._pending_rescan = self._pending_rescan or rescan
+        if self._flush_handle is None and (self._pending or self._pending_rescan):
+            self._flush_handle = self._loop.call_later(self.debounce, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush_handle = None
+        names = None if self._pending_rescan else self._pending
+        self._pending = set()
+        self._pending_rescan = False
+        task = asyncio.ensure_future(self._flush(names))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, names: Optional[Set[str]]) -> None:
+        # 处理期间到达的新事件会安排下一次处理；用锁保证各批按顺序更新清单
+        async with self._lock:
+            changes, updates = await asyncio.to_thread(self._diff, names)
+            for name, version in updates.items():
+                if version is None:
+                    self.listing.pop(name, None)
+                else:
+                    self.listing[name] = version
+        if not changes:
+            return
+        for callback in self._callbacks:
+            try:
+                await callback(changes)
+            except Exception:
+                logger.exception("处理笔记变化时出错")
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self._flush(None)
+
+
+class NoteNotifier:
+    """
+    记录客户端连接和资源订阅，并发送资源变化通知
+
+    install() 在底层 MCP Server 上注册 notifications/initialized、resources/subscribe
+    和 resources/unsubscribe 处理器：前者登记连接（用于 list_changed），后两者维护订阅。
+    处理器收到的 session 对象每个请求新建一个，因此按其所属的连接（Connection）登记，
+    通知经连接级通道发送；连接断开后由弱引用自动移除。
+    """
+
+    def __init__(self, uri_prefix: str = "file://notes/"):
+        self.uri_prefix = uri_prefix
+        # 连接 -> 已订阅的资源 URI
+        self._connections: "weakref.WeakKeyDictionary[object, Set[str]]" = weakref.WeakKeyDictionary()
+
+    @property
+    def connection_count(self) -> int:
+        """当前登记的客户端连接数"""
+        return len(self._connections)
+
+    def install(self, mcp) -> None:
+        """在 FastMCP 实例的底层 Server 上注册处理器"""
+        server = mcp._mcp_server
+        server.add_notification_handler(
+            "notifications/initialized", mcp_types.NotificationParams, self._on_initialized
+        )
+        server.add_request_handler("resources/subscribe", mcp_types.SubscribeRequestParams, self._on_subscribe)
+        server.add_request_handler("resources/unsubscribe", mcp_types.UnsubscribeRequestParams, self._on_unsubscribe)
+
+    async def _on_initialized(self, ctx, params) -> None:
+        self._connections.setdefault(ctx.session._connection, set())
+
+    async def _on_subscribe(self, ctx, params) -> mcp_types.EmptyResult:
+        self._connections.setdefault(ctx.session._connection, set()).add(str(params.uri))
+        return mcp_types.EmptyResult()
+
+    async def _on_unsubscribe(self, ctx, params) -> mcp_types.EmptyResult:
+        self._connections.get(ctx.session._connection, set()).discard(str(params.uri))
+        return mcp_types.EmptyResult()
+
+    def _affected(self, uri: str, names: Set[str]) -> bool:
+        # file://notes/{name} 以及它的分页、按行资源都受文件变化影响
+        if not uri.startswith(self.uri_prefix):
+            return False
+        return uri[len(self.uri_prefix):].split("/", 1)[0] in names
+
+    @staticmethod
+    async def _send(connection, notification) -> None:
+        data = notification.model_dump(by_alias=True, mode="json", exclude_none=True)
+        await connection.outbound.notify(data["method"], data.get("params"))
+
+    async def publish(self, changes: NoteChanges) -> None:
+        """
+        发送变化通知
+
+        参数：
+            changes: 合并后的目录变化；修改和删除的文件发送 resources/updated，
+                     有文件增删时额外发送 resources/list_changed
+        """
+        touched = changes.modified | changes.removed
+        for connection, subscriptions in list(self._connections.items()):
+            try:
+                for uri in sorted(subscriptions):
+                    if self._affected(uri, touched):
+                        await self._send(connection, mcp_types.ResourceUpdatedNotification(
+                            params=mcp_types.ResourceUpdatedNotificationParams(uri=uri)
+                        ))
+                if changes.listing_changed:
+                    await self._send(connection, mcp_types.ResourceListChangedNotification())
+            except Exception as e:
+                # 连接已关闭，不再通知
+                logger.debug("发送资源通知失败，移除连接：%s", e)
+                self._connections.pop(connection, None)
@@ -3,11 +3,58 @@
 提供基础工具和资源示例
 """
 
+import asyncio
+import fnmatch
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List
+
 from fastmcp import FastMCP
+from fastmcp.resources import Resource
+
+from note_index import NoteIndex, make_snippet
+from note_store import NOTE_PAGE_BYTES, NoteStore, is_safe_filename, render_page
+from note_watcher import NoteChanges, NoteNotifier, NoteWatcher
+from tool_batch import ToolCall, run_batch
+
+# read_notes 一次最多返回的内容字节数（默认 1 MB）和文件数
+NOTE_BATCH_MAX_BYTES = int(os.getenv("NOTE_BATCH_MAX_BYTES", str(1024 * 1024)))
+NOTE_BATCH_MAX_FILES = int(os.getenv("NOTE_BATCH_MAX_FILES", "100"))
+
+# 笔记读取器：带 mtime 校验的内存缓存，文件读取不阻塞事件循环
+note_store = NoteStore("notes")
+
+# 笔记全文索引：持久化到磁盘，查询时按文件 mtime 增量更新
+note_index = NoteIndex("notes")
+
+# 目录监视器和通知器：笔记变化时主动通知客户端，客户端无需轮询
+note_watcher = NoteWatcher("notes")
+note_notifier = NoteNotifier()
+
+# 装饰器注册的静态资源（启动时记录），监视器不会重复注册或移除它们
+static_resource_uris = set()
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """
+    服务生命周期：启动时开始监视 notes/ 目录，退出时停止
+    """
+    static_resource_uris.update(str(resource.uri) for resource in await server.list_resources())
+    await note_watcher.start()
+    sync_note_resources(NoteChanges(added=set(note_watcher.listing)))
+    try:
+        yield {}
+    finally:
+        await note_watcher.stop()
+
 
 # 创建 MCP 服务实例
-# 参数：服务名称（会显示给客户端）
-mcp = FastMCP("My First MCP Server")
+# 参数：服务名称（会显示给客户端），生命周期管理函数
+mcp = FastMCP("My First MCP Server", lifespan=lifespan)
+
+# 处理客户端的资源订阅（resources/subscribe）
+note_notifier.install(mcp)
 
 # ============================================
 # 工具定义（Tools）
@@ -48,27 +95,173 @@ def add(a: int, b: int) -> int:
     return result
 
 
+@mcp.tool()
+async def batch(calls: List[ToolCall]) -> List[Dict[str, Any]]:
+    """
+    批量调用：一次请求执行多个工具调用，减少往返次数
+
+    同步工具在线程池中执行，异步工具并发执行，结果按请求顺序返回。
+    单个调用出错不影响其他调用；不支持在 batch 中再调用 batch。
+
+    参数：
+        calls: 工具调用列表，例如
+            [{"tool": "echo", "arguments": {"text": "你好"}},
+             {"tool": "add", "arguments": {"a": 1, "b": 2}}]
+
+    返回：
+        与 calls 顺序一致的结果列表，每项包含 tool、ok，以及 result 或 error
+    """
+    return await run_batch(mcp, calls)
+
+
+@mcp.tool()
+async def search_notes(query: str, limit: int = 10) -> str:
+    """
+    全文搜索笔记：在 notes/ 目录中查找包含全部关键词的笔记
+
+    支持中文（按单字和相邻两字建立索引，单字关键词也能命中）和英文单词，结果按相关度排序。
+
+    参数：
+        query: 搜索词，多个关键词用空格分隔
+        limit: 最多返回的笔记数（默认 10）
+
+    返回：
+        匹配的文件名、相关度和内容片段
+    """
+    if not query.strip():
+        return "错误：搜索词不能为空"
+
+    await note_index.refresh()
+    hits = await note_index.search(query, max(1, limit))
+    if not hits:
+        return f"没有找到包含“{query}”的笔记"
+
+    lines = [f"找到 {len(hits)} 篇相关笔记（共索引 {note_index.document_count} 篇）：", ""]
+    for filename, score in hits:
+        try:
+            # 大文件只取第一页生成片段
+            if await note_store.size(filename) > NOTE_PAGE_BYTES:
+                text = (await note_store.read_page(filename)).text
+            else:
+                text = await note_store.read(filename)
+            snippet = make_snippet(text, query)
+        except Exception as e:
+            snippet = f"（无法读取：{str(e)}）"
+        lines.append(f"- file://notes/{filename}（相关度 {score:.2f}）")
+        lines.append(f"  {snippet}")
+    return "\n".join(lines)
+
+
+def scan_note_files() -> List[str]:
+    """扫描 notes/ 目录，返回文件名（按名称排序）"""
+    try:
+        return sorted(
+            entry.name for entry in os.scandir("notes")
+            if entry.is_file() and not entry.name.startswith(".")
+        )
+    except FileNotFoundError:
+        return []
+
+
+async def list_note_files() -> List[str]:
+    """
+    返回 notes/ 目录下的文件名（按名称排序）
+
+    监视器运行时直接使用内存中的清单：清单只在事件循环线程中修改，因此也在这里读取；
+    否则在线程中扫描目录。
+    """
+    if note_watcher.mode != "stopped":
+        return note_watcher.names()
+    return await asyncio.to_thread(scan_note_files)
+
+
+@mcp.tool()
+async def read_notes(files: List[str], max_bytes: int = NOTE_BATCH_MAX_BYTES) -> str:
+    """
+    批量读取笔记：一次调用读取多个文件，省去逐个读取资源的往返
+
+    参数：
+        files: 文件名列表，支持通配符（例如 ["todo.txt", "*.md"]）
+        max_bytes: 本次最多返回的内容字节数，超出的文件不读取，只列出文件名
+
+    返回：
+        按请求顺序排列的各文件内容；单个文件的错误与 read_note 的格式相同，不影响其他文件。
+        超过一页的大文件只返回第一页。
+    """
+    if not files:
+        return "错误：文件列表不能为空"
+
+    # 展开通配符并去重，保持请求顺序；没有匹配的通配符在原位置报告错误
+    entries: List[str] = []
+    errors = {}
+    listing = None
+    for item in files:
+        if any(ch in item for ch in "*?["):
+            if listing is None:
+                listing = await list_note_files()
+            matched = fnmatch.filter(listing, item)
+            if not matched:
+                errors[item] = f"错误：没有与 {item} 匹配的文件"
+                matched = [item]
+            entries.extend(matched)
+        else:
+            entries.append(item)
+    entries = list(dict.fromkeys(entries))
+
+    # 按文件大小分配预算（大文件按一页计算），放不下的文件不读取，只列出文件名
+    selected: List[str] = []
+    skipped: List[str] = []
+    budget = max(0, max_bytes)
+    for name in entries:
+        if name in errors:
+            selected.append(name)
+            continue
+        try:
+            cost = min(await note_store.size(name), NOTE_PAGE_BYTES) if is_safe_filename(name) else 0
+        except OSError:
+            cost = 0
+        if len(selected) >= NOTE_BATCH_MAX_FILES or cost > budget:
+            skipped.append(name)
+            continue
+        selected.append(name)
+        budget -= cost
+
+    async def read_one(name: str) -> str:
+        if name in errors:
+            return errors[name]
+        return await read_note(name)
+
+    contents = await asyncio.gather(*(read_one(name) for name in selected))
+
+    header = f"共读取 {len(selected) - len(errors)} 个文件"
+    if skipped:
+        header += f"，{len(skipped)} 个文件因超出大小上限（{max_bytes} 字节）或数量上限（{NOTE_BATCH_MAX_FILES}）未读取"
+    sections = [header, *contents]
+    if skipped:
+        sections.append("未读取的文件（请单独读取或分批读取）：\n" + "\n".join(f"- {name}" for name in skipped))
+    return "\n\n---\n\n".join(sections)
+
+
 # ============================================
 # 资源定义（Resources）
 # ============================================
 
 
 @mcp.resource("file://notes/hello.txt")
-def read_hello() -> str:
+async def read_hello() -> str:
     """
     读取欢迎文件（静态资源）
 
     URI: file://notes/hello.txt
     """
     try:
-        with open("notes/hello.txt", "r", encoding="utf-8") as f:
-            return f.read()
+        return await note_store.read("hello.txt")
     except Exception as e:
         return f"错误：{str(e)}"
 
 
 @mcp.resource("file://notes/{filename}")
-def read_note(filename: str) -> str:
+async def read_note(filename: str) -> str:
     """
     读取指定的笔记文件（动态资源）
 
@@ -81,17 +274,19 @@ def read_note(filename: str) -> str:
         - file://notes/todo.txt
         - file://notes/python.txt
 
+    超过一页（NOTE_PAGE_BYTES）的大文件只返回第一页，
+    末尾附有继续读取的 file://notes/{filename}/page/{cursor} 地址。
+
     来源：基于 MCP Resource 规范的动态资源实现
     """
     # 安全检查：防止路径遍历攻击
-    if ".." in filename or "/" in filename:
+    if not is_safe_filename(filename):
         return "错误：非法文件名，不允许包含 '..' 或 '/'"
 
-    filepath = f"notes/{filename}"
-
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
+        if await note_store.size(filename) > NOTE_PAGE_BYTES:
+            return render_page(filename, await note_store.read_page(filename))
+        content = await note_store.read(filename)
         return f"文件：{filename}\n\n{content}"
     except FileNotFoundError:
         return f"错误：文件 {filename} 不存在"
@@ -99,6 +294,152 @@ def read_note(filename: str) -> str:
         return f"错误：读取失败 - {str(e)}"
 
 
+@mcp.resource("file://notes/{filename}/page/{cursor}")
+async def read_note_page(filename: str, cursor: str) -> str:
+    """
+    分页读取笔记文件（适合大文件）
+
+    通过 mmap 只读取一页内容，内存占用与文件大小无关。
+
+    参数：
+        filename: 文件名
+        cursor: 起始字节偏移，第一页为 0，之后使用上一页末尾给出的游标
+
+    URI 示例：
+        - file://notes/app.log/page/0
+        - file://notes/app.log/page/262144
+    """
+    if not is_safe_filename(filename):
+        return "错误：非法文件名，不允许包含 '..' 或 '/'"
+    if not cursor.isdigit():
+        return f"错误：游标必须是非负整数，收到 {cursor}"
+
+    try:
+        return render_page(filename, await note_store.read_page(filename, int(cursor)))
+    except FileNotFoundError:
+        return f"错误：文件 {filename} 不存在"
+    except Exception as e:
+        return f"错误：读取失败 - {str(e)}"
+
+
+@mcp.resource("file://notes/{filename}/page/{cursor}/{stop}")
+async def read_note_page_range(filename: str, cursor: str, stop: str) -> str:
+    """
+    分页读取笔记文件中 [cursor, stop) 字节范围内的一页（续读行范围）
+
+    按行范围读取的内容超过一页时，末尾给出该地址；读到 stop 后不再给出游标。
+
+    参数：
+        filename: 文件名
+        cursor: 起始字节偏移
+        stop: 结束字节偏移
+
+    URI 示例：
+        - file://notes/app.log/page/262144/300000
+    """
+    if not is_safe_filename(filename):
+        return "错误：非法文件名，不允许包含 '..' 或 '/'"
+    if not (cursor.isdigit() and stop.isdigit()):
+        return "错误：游标和结束偏移必须是非负整数"
+
+    try:
+        return render_page(filename, await note_store.read_page(filename, int(cursor), stop=int(stop)))
+    except FileNotFoundError:
+        return f"错误：文件 {filename} 不存在"
+    except Exception as e:
+        return f"错误：读取失败 - {str(e)}"
+
+
+@mcp.resource("file://notes/{filename}/lines/{start}/{count}")
+async def read_note_lines(filename: str, start: str, count: str) -> str:
+    """
+    按行范围读取笔记文件
+
+    参数：
+        filename: 文件名
+        start: 起始行号（从 1 开始）
+        count: 读取的行数；内容超过一页时截断，并给出继续读取的游标，续读到第 start+count-1 行为止
+
+    URI 示例：
+        - file://notes/app.log/lines/1/100
+    """
+    if not is_safe_filename(filename):
+        return "错误：非法文件名，不允许包含 '..' 或 '/'"
+    if not (start.isdigit() and count.isdigit()):
+        return "错误：行号和行数必须是正整数"
+
+    try:
+        return render_page(filename, await note_store.read_lines(filename, int(start), int(count)))
+    except FileNotFoundError:
+        return f"错误：文件 {filename} 不存在"
+    except Exception as e:
+        return f"错误：读取失败 - {str(e)}"
+
+
+# ============================================
+# 笔记变化通知（Notifications）
+# ============================================
+
+
+def note_resource(filename: str) -> Resource:
+    """
+    为一篇笔记创建具体资源，使其出现在 resources/list 中
+
+    参数：
+        filename: 文件名
+
+    返回：
+        URI 为 file://notes/{filename} 的资源，读取时与 read_note 相同
+    """
+    async def read() -> str:
+        return await read_note(filename)
+
+    return Resource.from_function(
+        read,
+        uri=f"file://notes/{filename}",
+        name=filename,
+        description=f"笔记文件 {filename}",
+        mime_type="text/plain"
+    )
+
+
+def sync_note_resources(changes: NoteChanges) -> None:
+    """
+    按目录变化增删笔记资源
+
+    参数：
+        changes: 目录变化
+    """
+    for filename in changes.added:
+        uri = f"file://notes/{filename}"
+        if is_safe_filename(filename) and uri not in static_resource_uris:
+            mcp.add_resource(note_resource(filename))
+    for filename in changes.removed:
+        uri = f"file://notes/{filename}"
+        if uri not in static_resource_uris:
+            try:
+                mcp.local_provider.remove_resource(uri)
+            except KeyError:
+                pass
+
+
+async def on_notes_changed(changes: NoteChanges) -> None:
+    """
+    笔记目录变化回调（已防抖合并）
+
+    清除变化文件的缓存、标记搜索索引过期、同步资源列表，然后通知客户端：
+    订阅了变化文件的客户端收到 resources/updated，有文件增删时所有客户端收到 resources/list_changed。
+    """
+    for filename in changes.modified | changes.removed:
+        note_store.invalidate(filename)
+    note_index.mark_stale()
+    sync_note_resources(changes)
+    await note_notifier.publish(changes)
+
+
+note_watcher.on_change(on_notes_changed)
+
+
 # ============================================
 # 启动服务
 # ============================================
@@ -0,0 +1,47 @@
+# 笔记全文索引测试
+import asyncio
+
+from note_index import NoteIndex, query_terms, tokenize
+
+
+def _build(tmp_path, files):
+    root = tmp_path / "notes"
+    root.mkdir()
+    for name, text in files.items():
+        (root / name).write_text(text, encoding="utf-8")
+    index = NoteIndex(root=str(root), index_path=str(tmp_path / "index.json"), refresh_interval=0)
+    asyncio.run(index.refresh(force=True))
+    return index
+
+
+def test_tokenize_indexes_cjk_unigrams_and_bigrams():
+    assert tokenize("小猫 Cat") == ["小", "猫", "小猫", "cat"]
+    assert query_terms("小猫") == ["小猫"]
+    assert query_terms("猫") == ["猫"]
+
+
+def test_single_character_query_matches_inside_longer_words(tmp_path):
+    index = _build(tmp_path, {"a.txt": "家里的小猫", "b.txt": "今天的学习笔记", "c.txt": "english only"})
+
+    assert [name for name, _ in asyncio.run(index.search("猫"))] == ["a.txt"]
+    assert [name for name, _ in asyncio.run(index.search("笔"))] == ["b.txt"]
+    assert [name for name, _ in asyncio.run(index.search("学习笔记"))] == ["b.txt"]
+
+
+def test_multi_character_query_does_not_match_scattered_characters(tmp_path):
+    # "小猫" 只匹配相邻出现的两个字，不匹配分别出现 "小" 和 "猫" 的文件
+    index = _build(tmp_path, {"a.txt": "小猫", "b.txt": "小狗和猫"})
+
+    assert [name for name, _ in asyncio.run(index.search("小猫"))] == ["a.txt"]
+
+
+def test_bm25_ranks_frequent_term_first(tmp_path):
+    index = _build(tmp_path, {
+        "many.txt": "python python python notes",
+        "once.txt": "python and other notes",
+        "none.txt": "rust notes",
+    })
+
+    results = asyncio.run(index.search("python"))
+    assert [name for name, _ in results] == ["many.txt", "once.txt"]
+    assert results[0][1] > results[1][1]
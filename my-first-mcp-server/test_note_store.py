@@ -0,0 +1,154 @@
+# 笔记缓存读取测试
+import asyncio
+import os
+import threading
+
+import pytest
+
+import note_store
+from note_store import NoteStore
+
+
+def _store(tmp_path, files, **kwargs):
+    root = tmp_path / "notes"
+    root.mkdir()
+    for name, text in files.items():
+        (root / name).write_text(text, encoding="utf-8")
+    return root, NoteStore(root=str(root), **kwargs)
+
+
+def test_cached_read_stats_in_worker_thread(tmp_path, monkeypatch):
+    root, store = _store(tmp_path, {"a.txt": "hello"})
+    stat_threads = []
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        stat_threads.append(threading.current_thread() is threading.main_thread())
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(note_store.os, "stat", stat)
+
+    async def main():
+        first = await store.read("a.txt")
+        second = await store.read("a.txt")
+        return first, second, await store.size("a.txt")
+
+    assert asyncio.run(main()) == ("hello", "hello", 5)
+    assert stat_threads and not any(stat_threads)
+
+
+def test_modified_file_is_reread(tmp_path):
+    root, store = _store(tmp_path, {"a.txt": "old"})
+
+    async def main():
+        before = await store.read("a.txt")
+        (root / "a.txt").write_text("new content", encoding="utf-8")
+        return before, await store.read("a.txt")
+
+    assert asyncio.run(main()) == ("old", "new content")
+    assert store.cached_bytes == len("new content")
+
+
+def test_concurrent_cold_reads_share_one_disk_read(tmp_path, monkeypatch):
+    root, store = _store(tmp_path, {"a.txt": "shared"})
+    reads = []
+    real_read = NoteStore._read_file
+
+    def read_file(path):
+        reads.append(path)
+        return real_read(path)
+
+    monkeypatch.setattr(NoteStore, "_read_file", staticmethod(read_file))
+
+    async def main():
+        return await asyncio.gather(*(store.read("a.txt") for _ in range(10)))
+
+    assert asyncio.run(main()) == ["shared"] * 10
+    assert len(reads) == 1
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    files = {f"{name}.txt": name * 10 for name in "abcde"}
+    root, store = _store(tmp_path, files, max_bytes=40)
+
+    async def main():
+        for name in ("a", "b", "c", "d", "a", "e"):
+            await store.read(f"{name}.txt")
+
+    asyncio.run(main())
+    # 总上限 40 字节只能缓存 4 篇：b 最久未使用，被淘汰
+    assert list(store._cache) == ["c.txt", "d.txt", "a.txt", "e.txt"]
+    assert store.cached_bytes == 40
+
+
+def _pages(store, filename, length):
+    async def main():
+        pages, cursor = [], 0
+        while cursor is not None:
+            page = await store.read_page(filename, cursor, length)
+            pages.append(page)
+            cursor = page.next_cursor
+        return pages
+    return asyncio.run(main())
+
+
+def test_pages_cover_file_without_splitting_characters(tmp_path):
+    text = "第一行笔记\n" + "中文内容" * 20 + "\nlast line\n"
+    root, store = _store(tmp_path, {"long.txt": text})
+
+    pages = _pages(store, "long.txt", 16)
+
+    assert "".join(page.text for page in pages) == text
+    assert all("�" not in page.text for page in pages)
+    assert pages[0].text == "第一行笔记\n"
+    assert pages[-1].end == pages[-1].size == len(text.encode("utf-8"))
+
+
+def test_cursor_inside_a_character_is_aligned_forward(tmp_path):
+    root, store = _store(tmp_path, {"a.txt": "中文"})
+
+    page = asyncio.run(store.read_page("a.txt", 1, 100))
+
+    assert (page.start, page.text, page.next_cursor) == (3, "文", None)
+
+
+def test_read_lines_returns_requested_range(tmp_path):
+    text = "".join(f"line {n}\n" for n in range(1, 11))
+    root, store = _store(tmp_path, {"a.txt": text})
+
+    async def main():
+        lines = await store.read_lines("a.txt", 3, 2)
+        truncated = await store.read_lines("a.txt", 1, 10, length=20)
+        rest = await store.read_page("a.txt", truncated.next_cursor, 1000)
+        return lines, truncated, rest
+
+    lines, truncated, rest = asyncio.run(main())
+    assert lines.text == "line 3\nline 4\n"
+    assert truncated.text == "line 1\nline 2\n"
+    assert truncated.text + rest.text == text
+    assert "page/14]" in note_store.render_page("a.txt", truncated)
+
+
+def test_line_range_continuation_stops_at_the_last_requested_line(tmp_path):
+    text = "".join(f"line {n}\n" for n in range(1, 11))
+    root, store = _store(tmp_path, {"a.txt": text})
+
+    async def main():
+        pages = [await store.read_lines("a.txt", 2, 4, length=15)]
+        while pages[-1].next_cursor is not None:
+            pages.append(await store.read_page("a.txt", pages[-1].next_cursor, 15, stop=pages[-1].stop))
+        return pages
+
+    pages = asyncio.run(main())
+    # 第 2-5 行分两页读完，最后一页不再给出游标
+    assert "".join(page.text for page in pages) == "line 2\nline 3\nline 4\nline 5\n"
+    assert [page.next_cursor is None for page in pages] == [False, True]
+    assert "page/21/35]" in note_store.render_page("a.txt", pages[0])
+    assert "继续读取" not in note_store.render_page("a.txt", pages[-1])
+
+
+def test_cursor_past_end_is_rejected(tmp_path):
+    root, store = _store(tmp_path, {"a.txt": "abc"})
+
+    with pytest.raises(ValueError):
+        asyncio.run(store.read_page("a.txt", 10))
@@ -0,0 +1,94 @@
+# 笔记目录监视测试：防抖合并变化，并按订阅发送资源通知
+import asyncio
+
+import pytest
+
+from note_watcher import NoteChanges, NoteNotifier, NoteWatcher
+
+
+def _watch(tmp_path, force_polling, actions):
+    root = tmp_path / "notes"
+    root.mkdir()
+    (root / "old.txt").write_text("old", encoding="utf-8")
+    (root / "keep.txt").write_text("keep", encoding="utf-8")
+    batches = []
+
+    async def record(changes):
+        batches.append(changes)
+
+    async def main():
+        watcher = NoteWatcher(str(root), debounce=0.1, poll_interval=0.3, force_polling=force_polling)
+        watcher.on_change(record)
+        await watcher.start()
+        try:
+            actions(root)
+            await asyncio.sleep(1)
+        finally:
+            await watcher.stop()
+        return watcher
+
+    return asyncio.run(main()), batches
+
+
+def _edit(root):
+    # 短时间内多次写入同一文件、新增和删除文件
+    for n in range(5):
+        (root / "new.txt").write_text(f"v{n}", encoding="utf-8")
+    (root / "old.txt").unlink()
+    (root / "keep.txt").write_text("keep", encoding="utf-8")
+
+
+@pytest.mark.parametrize("force_polling", [False, True])
+def test_burst_of_writes_is_one_change(tmp_path, force_polling):
+    watcher, batches = _watch(tmp_path, force_polling, _edit)
+
+    assert len(batches) == 1
+    assert batches[0].added == {"new.txt"}
+    assert batches[0].removed == {"old.txt"}
+    assert watcher.names() == ["keep.txt", "new.txt"]
+
+
+def test_modified_note_is_reported_once(tmp_path):
+    def modify(root):
+        (root / "keep.txt").write_text("changed", encoding="utf-8")
+
+    watcher, batches = _watch(tmp_path, False, modify)
+
+    assert [batch.modified for batch in batches] == [{"keep.txt"}]
+    assert not batches[0].listing_changed
+
+
+def test_polling_without_changes_sends_nothing(tmp_path):
+    watcher, batches = _watch(tmp_path, True, lambda root: None)
+
+    assert watcher.mode == "stopped"
+    assert batches == []
+
+
+class _Outbound:
+    def __init__(self, sent):
+        self.sent = sent
+
+    async def notify(self, method, params):
+        self.sent.append((method, params and params.get("uri")))
+
+
+class _Connection:
+    def __init__(self):
+        self.sent = []
+        self.outbound = _Outbound(self.sent)
+
+
+def test_notifier_sends_updates_to_subscribers_only():
+    notifier = NoteNotifier()
+    subscribed, other = _Connection(), _Connection()
+    notifier._connections[subscribed] = {"file://notes/a.txt/page/0", "file://notes/b.txt"}
+    notifier._connections[other] = set()
+
+    asyncio.run(notifier.publish(NoteChanges(modified={"a.txt"}, added={"c.txt"})))
+
+    assert subscribed.sent == [
+        ("notifications/resources/updated", "file://notes/a.txt/page/0"),
+        ("notifications/resources/list_changed", None),
+    ]
+    assert other.sent == [("notifications/resources/list_changed", None)]
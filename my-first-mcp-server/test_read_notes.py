@@ -0,0 +1,96 @@
+# 批量读取笔记工具测试
+import asyncio
+import threading
+
+import pytest
+
+import server
+from note_store import NoteStore
+
+
+@pytest.fixture
+def notes(tmp_path, monkeypatch):
+    root = tmp_path / "notes"
+    root.mkdir()
+    for name, text in {"a.md": "aaaa", "b.md": "bbbbbbbb", "todo.txt": "todo"}.items():
+        (root / name).write_text(text, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server, "note_store", NoteStore("notes"))
+    return root
+
+
+def test_files_and_globs_are_read_in_request_order(notes):
+    result = asyncio.run(server.read_notes(["todo.txt", "*.md", "a.md"]))
+    sections = result.split("\n\n---\n\n")
+
+    assert sections == [
+        "共读取 3 个文件",
+        "文件：todo.txt\n\ntodo",
+        "文件：a.md\n\naaaa",
+        "文件：b.md\n\nbbbbbbbb",
+    ]
+
+
+def test_errors_stay_in_place(notes):
+    result = asyncio.run(server.read_notes(["missing.txt", "*.log", "../secret", "a.md"]))
+    sections = result.split("\n\n---\n\n")
+
+    assert sections[0] == "共读取 3 个文件"
+    assert sections[1] == "错误：文件 missing.txt 不存在"
+    assert sections[2] == "错误：没有与 *.log 匹配的文件"
+    assert sections[3].startswith("错误：非法文件名")
+    assert sections[4] == "文件：a.md\n\naaaa"
+
+
+def test_files_over_the_byte_budget_are_listed_not_read(notes):
+    result = asyncio.run(server.read_notes(["a.md", "b.md", "todo.txt"], max_bytes=9))
+    sections = result.split("\n\n---\n\n")
+
+    assert sections[0].startswith("共读取 2 个文件，1 个文件因超出大小上限（9 字节）")
+    assert sections[1:3] == ["文件：a.md\n\naaaa", "文件：todo.txt\n\ntodo"]
+    assert sections[3] == "未读取的文件（请单独读取或分批读取）：\n- b.md"
+
+
+def test_empty_request_is_rejected(notes):
+    assert asyncio.run(server.read_notes([])) == "错误：文件列表不能为空"
+
+
+def test_glob_reads_the_watcher_listing_on_the_loop_thread(notes, monkeypatch):
+    class Watcher:
+        mode = "polling"
+        threads = []
+
+        def names(self):
+            self.threads.append(threading.current_thread())
+            return ["a.md", "b.md", "todo.txt"]
+
+    monkeypatch.setattr(server, "note_watcher", Watcher())
+    output = asyncio.run(server.read_notes(["*.md"]))
+
+    assert "aaaa" in output and "bbbbbbbb" in output
+    assert Watcher.threads == [threading.main_thread()]
+
+
+def test_lines_resource_continuation_stays_inside_the_range(notes, monkeypatch):
+    from fastmcp import Client
+
+    (notes / "log.txt").write_text("".join(f"line {n}\n" for n in range(1, 101)), encoding="utf-8")
+    # 页大小的默认值在导入时确定，改用 64 字节的页，使 20 行需要多页读完
+    read_lines = NoteStore.read_lines
+    monkeypatch.setattr(NoteStore, "read_lines", lambda self, f, s, c: read_lines(self, f, s, c, length=64))
+    read_page = NoteStore.read_page
+    monkeypatch.setattr(NoteStore, "read_page", lambda self, f, c=0, length=64, stop=None: read_page(self, f, c, 64, stop))
+
+    async def main():
+        texts = []
+        uri = "file://notes/log.txt/lines/10/20"
+        async with Client(server.mcp) as client:
+            while uri:
+                text = (await client.read_resource(uri))[0].text
+                texts.append(text.split("\n\n", 1)[1].split("\n\n[未完")[0])
+                uri = text.rsplit("继续读取：", 1)[1].rstrip("]") if "继续读取" in text else None
+        return texts
+
+    texts = asyncio.run(main())
+    assert len(texts) > 1
+    assert "".join(texts) == "".join(f"line {n}\n" for n in range(10, 30))
@@ -0,0 +1,59 @@
+# 批量调用测试
+import asyncio
+
+import pytest
+from fastmcp import Client, FastMCP
+
+import server
+import tool_batch
+from tool_batch import ToolCall, run_batch
+
+
+def test_batch_tool_returns_results_in_request_order(tmp_path, monkeypatch):
+    (tmp_path / "notes").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    async def main():
+        async with Client(server.mcp) as client:
+            result = await client.call_tool("batch", {"calls": [
+                {"tool": "echo", "arguments": {"text": "你好"}},
+                {"tool": "add", "arguments": {"a": 1, "b": 2}},
+                {"tool": "add", "arguments": {"a": "x"}},
+                {"tool": "missing"},
+                {"tool": "batch", "arguments": {"calls": []}},
+            ]})
+            return result.structured_content["result"]
+
+    results = asyncio.run(main())
+    assert results[0] == {"tool": "echo", "ok": True, "result": "你说：你好"}
+    assert results[1] == {"tool": "add", "ok": True, "result": 3}
+    assert [item["ok"] for item in results[2:]] == [False, False, False]
+    assert results[4]["error"] == "错误：不支持嵌套批量调用"
+
+
+def test_concurrency_is_limited(monkeypatch):
+    monkeypatch.setattr(tool_batch, "BATCH_MAX_CONCURRENCY", 3)
+    mcp = FastMCP("batch-test")
+    running = []
+    peak = []
+
+    @mcp.tool()
+    async def slow(n: int) -> int:
+        running.append(n)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(n)
+        return n * 2
+
+    results = asyncio.run(run_batch(mcp, [ToolCall(tool="slow", arguments={"n": n}) for n in range(10)]))
+
+    assert [item["result"] for item in results] == [n * 2 for n in range(10)]
+    assert max(peak) == 3
+
+
+def test_too_many_calls_are_rejected(monkeypatch):
+    monkeypatch.setattr(tool_batch, "BATCH_MAX_CALLS", 2)
+    calls = [ToolCall(tool="echo", arguments={"text": "x"})] * 3
+
+    with pytest.raises(ValueError, match="最多批量调用 2 个工具"):
+        asyncio.run(run_batch(server.mcp, calls))
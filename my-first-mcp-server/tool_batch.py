@@ -0,0 +1,68 @@
+"""
+批量调用：在一次 tools/call 中执行多个工具调用
+
+- 每个调用都经过服务器正常的工具调用流程（参数校验、中间件）
+- 同步工具由 FastMCP 放到线程池中执行，异步工具在事件循环上并发执行
+- 并发数受 BATCH_MAX_CONCURRENCY 限制，结果按请求顺序返回
+- 单个调用失败只影响它自己的结果项
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+
+# 单次批量调用允许的最大调用数
+BATCH_MAX_CALLS = int(os.getenv("BATCH_MAX_CALLS", "500"))
+# 同时执行的调用数上限
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# 批量工具自身的名称，不允许嵌套调用
+BATCH_TOOL_NAME = "batch"
+
+
+class ToolCall(BaseModel):
+    """批量调用中的一个工具调用"""
+
+    tool: str = Field(description="工具名称，例如 echo")
+    arguments: Dict[str, Any] = Field(default_factory=dict, description="工具参数，例如 {\"text\": \"你好\"}")
+
+
+def _result_value(result) -> Any:
+    # 优先返回结构化结果（例如 add 返回的整数），否则返回文本内容
+    structured = result.structured_content
+    if structured is not None:
+        return structured.get("result", structured) if isinstance(structured, dict) else structured
+    texts = [block.text for block in result.content if getattr(block, "text", None) is not None]
+    return texts[0] if len(texts) == 1 else texts
+
+
+async def run_batch(mcp, calls: List[ToolCall]) -> List[Dict[str, Any]]:
+    """
+    并发执行一组工具调用
+
+    参数：
+        mcp: FastMCP 服务实例
+        calls: 工具调用列表
+
+    返回：
+        与 calls 顺序一致的结果列表，每项为
+        {"tool": 名称, "ok": True, "result": 结果} 或 {"tool": 名称, "ok": False, "error": "错误：…"}
+    """
+    if len(calls) > BATCH_MAX_CALLS:
+        raise ValueError(f"一次最多批量调用 {BATCH_MAX_CALLS} 个工具，收到 {len(calls)} 个")
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def run_one(call: ToolCall) -> Dict[str, Any]:
+        if call.tool == BATCH_TOOL_NAME:
+            return {"tool": call.tool, "ok": False, "error": "错误：不支持嵌套批量调用"}
+        async with semaphore:
+            try:
+                result = await mcp.call_tool(call.tool, call.arguments)
+            except Exception as e:
+                return {"tool": call.tool, "ok": False, "error": f"错误：{str(e)}"}
+        return {"tool": call.tool, "ok": True, "result": _result_value(result)}
+
+    return list(await asyncio.gather(*(run_one(call) for call in calls)))
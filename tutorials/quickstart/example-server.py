@@ -5,17 +5,31 @@
 使用方法：
 1. 安装依赖：uv pip install fastmcp
 2. 创建测试文件：mkdir notes && echo "Hello MCP!" > notes/hello.txt
-3. 运行服务：python example-server.py
+3. 运行服务：python example-server.py（带缓存的笔记读取 note_store.py 和批量调用 tool_batch.py 与 my-first-mcp-server 共用）
 4. 配置客户端连接此服务
 
 更多信息请查看教程：tutorials/quickstart/README.md
 """
 
+import os
+import sys
+from typing import Any, Dict, List
+
 from fastmcp import FastMCP
 
+# 笔记读取器和批量调用与 my-first-mcp-server 共用同一份模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "my-first-mcp-server"))
+
+from note_store import NOTE_PAGE_BYTES, NoteStore, is_safe_filename, render_page
+from tool_batch import ToolCall, run_batch
+
 # 创建 MCP 服务实例
 mcp = FastMCP("Example MCP Server")
 
+# 笔记读取器：热点笔记从内存返回，文件被修改后自动重新读取，
+# 磁盘读取在线程池中执行，不会阻塞其他并发请求
+note_store = NoteStore("notes")
+
 
 # ============================================
 # 工具定义（Tools）
@@ -59,12 +73,31 @@ def add(a: int, b: int) -> int:
     return a + b
 
 
+@mcp.tool()
+async def batch(calls: List[ToolCall]) -> List[Dict[str, Any]]:
+    """
+    批量调用：一次请求执行多个工具调用，减少往返次数
+
+    同步工具在线程池中执行，异步工具并发执行，结果按请求顺序返回。
+    单个调用出错不影响其他调用；不支持在 batch 中再调用 batch。
+
+    参数：
+        calls: 工具调用列表，例如
+            [{"tool": "echo", "arguments": {"text": "你好"}},
+             {"tool": "add", "arguments": {"a": 1, "b": 2}}]
+
+    返回：
+        与 calls 顺序一致的结果列表，每项包含 tool、ok，以及 result 或 error
+    """
+    return await run_batch(mcp, calls)
+
+
 # ============================================
 # 资源定义（Resources）
 # ============================================
 
 @mcp.resource("file://notes/hello.txt")
-def read_hello() -> str:
+async def read_hello() -> str:
     """
     读取欢迎文件（静态资源示例）
 
@@ -77,9 +110,7 @@ def read_hello() -> str:
     来源：基于 MCP Resource 规范实现
     """
     try:
-        with open("notes/hello.txt", "r", encoding="utf-8") as f:
-            content = f.read()
-        return content
+        return await note_store.read("hello.txt")
     except FileNotFoundError:
         return "错误：文件不存在，请确保 notes/hello.txt 存在"
     except Exception as e:
@@ -87,7 +118,7 @@ def read_hello() -> str:
 
 
 @mcp.resource("file://notes/{filename}")
-def read_note(filename: str) -> str:
+async def read_note(filename: str) -> str:
     """
     读取指定的笔记文件（动态资源示例）
 
@@ -104,17 +135,20 @@ def read_note(filename: str) -> str:
     安全提示：
         生产环境中必须进行严格的路径验证，防止路径遍历攻击
 
+    大文件提示：
+        超过一页（NOTE_PAGE_BYTES）的文件只返回第一页，
+        末尾附有继续读取的 file://notes/{filename}/page/{cursor} 地址
+
     来源：基于 MCP Resource 规范的动态资源实现
     """
     # 安全检查：防止路径遍历攻击（如 ../../etc/passwd）
-    if ".." in filename or "/" in filename or "\\" in filename:
+    if not is_safe_filename(filename):
         return "错误：非法文件名，不允许包含 '..' 或路径分隔符"
 
-    filepath = f"notes/{filename}"
-
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
+        if await note_store.size(filename) > NOTE_PAGE_BYTES:
+            return render_page(filename, await note_store.read_page(filename))
+        content = await note_store.read(filename)
         return f"文件：{filename}\n\n{content}"
     except FileNotFoundError:
         return f"错误：文件 {filename} 不存在"
@@ -122,6 +156,33 @@ def read_note(filename: str) -> str:
         return f"错误：读取失败 - {str(e)}"
 
 
+@mcp.resource("file://notes/{filename}/page/{cursor}")
+async def read_note_page(filename: str, cursor: str) -> str:
+    """
+    分页读取笔记文件（大文件示例）
+
+    通过 mmap 每次只读取一页内容，无论文件多大，内存占用都保持不变。
+
+    参数：
+        filename: 文件名
+        cursor: 起始字节偏移，第一页为 0，之后使用上一页末尾给出的游标
+
+    URI 示例：
+        - file://notes/app.log/page/0
+    """
+    if not is_safe_filename(filename):
+        return "错误：非法文件名，不允许包含 '..' 或路径分隔符"
+    if not cursor.isdigit():
+        return f"错误：游标必须是非负整数，收到 {cursor}"
+
+    try:
+        return render_page(filename, await note_store.read_page(filename, int(cursor)))
+    except FileNotFoundError:
+        return f"错误：文件 {filename} 不存在"
+    except Exception as e:
+        return f"错误：读取失败 - {str(e)}"
+
+
 # ============================================
 # 启动服务
 # ============================================
@@ -137,8 +198,8 @@ if __name__ == "__main__":
 
     print("正在启动 MCP Server...")
     print("服务名称: Example MCP Server")
-    print("可用工具: echo, add")
-    print("可用资源: file://notes/hello.txt, file://notes/{filename}")
+    print("可用工具: echo, add, batch")
+    print("可用资源: file://notes/hello.txt, file://notes/{filename}, file://notes/{filename}/page/{cursor}")
     print("\n等待客户端连接...")
     print("按 Ctrl+C 停止服务\n")
 